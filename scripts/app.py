@@ -4,43 +4,105 @@ Handles UI, user input, retrieval, and LLM interaction.
 """
 
 import streamlit as st
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-import requests
 import os
 import json
 from dotenv import load_dotenv  # NEW: load environment variables from .env
 
-from prompt_protection import enthält_prompt_injection, ollama_guard_check, chunk_sicher, logge_verdacht
+# === Load environment variables from .env (vor den Modul-Imports, die Konstanten aus der Umgebung lesen) ===
+load_dotenv()
+
+from prompt_protection import enthält_prompt_injection, standard_guard, chunk_sicher, logge_verdacht
 from utils import speichere_chatverlauf  # moved from local definition
 from logging_utils import setup_logging, log_event
-
-# === Load environment variables from .env ===
-load_dotenv()
+from rag_service import service_aus_umgebung, sprach_filter
+from query_cache import QueryCache, verlauf_schluessel
+from ollama_client import standard_client
+from prompt_builder import OLLAMA_NUM_CTX, SYSTEM_TEXT, TokenZaehler, Verlaufszusammenfassung, baue_prompt
 
 # === Konfiguration ===
-CHROMA_PATH = os.getenv("CHROMA_PATH", "./output/chroma_db")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "chunks_semantic")
-EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+# Retrieval (CHROMA_PATH, COLLECTION_NAME, EMBED_*, HYBRID_*) wird in rag_service.service_aus_umgebung gelesen
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
-SPRACHE_FILTER = os.getenv("SPRACHE_FILTER", "de")
+# OLLAMA_URL, Timeouts und Begrenzung (OLLAMA_*) liest ollama_client.standard_client
+SPRACHE_FILTER = os.getenv("SPRACHE_FILTER", "de")  # mehrere Sprachen z. B. "de,en"
+
+# === Logging initialisieren ===
+setup_logging()
+
+# === Retrieval-Stack (einmal pro Prozess, von allen Sessions und Reruns geteilt)
+@st.cache_resource(show_spinner="Lade Retrieval-Modell...")
+def lade_retrieval_service():
+    service = service_aus_umgebung()
+    log_event(f"Retrieval-Service bereit (Warmup {service.warmup():.0f} ms)")
+    return service
 
-# === Setup ChromaDB + Embedding
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_collection(name=COLLECTION_NAME)
-embed_fn = SentenceTransformerEmbeddingFunction(model_name=EMBED_MODEL)
+
+@st.cache_resource(show_spinner="Lade Sprachmodell...")
+def lade_sprachmodell():
+    # gleiche num_ctx wie die Anfragen, Systemtext vorverarbeitet (KV-Cache des Präfixes)
+    try:
+        zeiten = standard_client().vorladen(OLLAMA_MODEL, {"num_ctx": OLLAMA_NUM_CTX}, system=SYSTEM_TEXT.rstrip())
+        log_event(f"Sprachmodell '{OLLAMA_MODEL}' vorgeladen: {zeiten}")
+    except Exception as e:
+        log_event(f"Sprachmodell konnte nicht vorgeladen werden: {e}", level="warning")
+    return True
+
+
+@st.cache_resource
+def lade_antwort_cache():
+    return QueryCache()
+
+
+@st.cache_resource
+def lade_token_zaehler():
+    return TokenZaehler()
+
+
+retrieval = lade_retrieval_service()
+antwort_cache = lade_antwort_cache()  # prozessweit, von allen Sessions geteilt
+lade_sprachmodell()
+token_zaehler = lade_token_zaehler()
 
 # === Session-State initialisieren
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-
-# === Logging initialisieren ===
-setup_logging()
+if "verlauf_zusammenfassung" not in st.session_state:
+    st.session_state.verlauf_zusammenfassung = Verlaufszusammenfassung()
 
 # === UI ===
 st.title("⚽ Football Manager Chatbot")
 
+with st.sidebar.expander("Systemstatus"):
+    status = retrieval.health()
+    if status["ok"]:
+        st.success(f"Retrieval bereit: {status['collection']} ({status['chunks']} Chunks)")
+    else:
+        st.error(f"Retrieval nicht bereit: {status.get('fehler')}")
+    st.caption(f"Warmup: {status['warmup_ms'] or 0:.0f} ms | Embedding: {status['embed_ms'] or 0:.1f} ms")
+    if status.get("rerank_p95_ms") is not None:
+        st.caption(f"Reranking: p50 {status['rerank_p50_ms']:.0f} ms, p95 {status['rerank_p95_ms']:.0f} ms, umgangen {status['rerank_umgangen']}")
+    generierung = st.session_state.get("letzte_generierung")
+    if generierung and generierung["ttft_ms"] is not None:
+        st.caption(
+            f"Letzte Antwort: erstes Token nach {generierung['ttft_ms']:.0f} ms, gesamt {generierung['gesamt_ms'] / 1000:.1f} s | "
+            f"Prefill {generierung['prefill_ms'] or 0:.0f} ms für {generierung['prompt_tokens'] or 0} neue Prompt-Tokens"
+        )
+    guard_stats = standard_guard().zusammenfassung()
+    if guard_stats["p50_ms"] is not None:
+        st.caption(
+            f"Guard: p50 {guard_stats['p50_ms']:.0f} ms, p95 {guard_stats['p95_ms']:.0f} ms | "
+            f"Cache {guard_stats['trefferquote']:.0%} | riskant {guard_stats['riskant']}"
+        )
+    ollama_stats = standard_client().stats
+    st.caption(
+        f"Ollama: {ollama_stats['aktiv']} aktiv, {ollama_stats['wartend']} wartend | "
+        f"Wiederholungen {ollama_stats['wiederholungen']} | Fehler {ollama_stats['fehler']} | überlastet {ollama_stats['ueberlastet']}"
+    )
+    cache_stats = antwort_cache.zusammenfassung()
+    st.caption(
+        f"Antwort-Cache: L1 {cache_stats['l1_treffer']} | L2 {cache_stats['l2_treffer']} | "
+        f"verfehlt {cache_stats['fehlend']} | {cache_stats['eintraege']} Einträge"
+    )
+
 # === Formular: Eingabe + Button zusammen ===
 with st.form(key="frage_formular", clear_on_submit=True):
     frage = st.text_input("Deine Frage:")
@@ -53,53 +115,75 @@ if abschicken and frage.strip() != "":
         st.error("⚠️ Deine Eingabe enthält potenziell schädliche Anweisungen.")
         st.stop()
 
-    # optional:
-    if ollama_guard_check(frage):
-        logge_verdacht(frage, typ="user_input_llm_check")
-        st.error("⚠️ Diese Eingabe wurde vom KI-Filter als riskant eingestuft.")
-        st.stop()
-    # === Embedding + Chunk-Suche
-    frage_embedding = embed_fn([frage])[0]
-    results = collection.query(
-        query_embeddings=[frage_embedding],
-        n_results=5,
-        where={"sprache": SPRACHE_FILTER}
+    # === L1: exakt gleiche Frage im gleichen Gesprächskontext → Guard, Retrieval und Generierung überspringen
+    version = retrieval.version()
+    gespraech = verlauf_schluessel(
+        st.session_state.chat_history, "\n".join(st.session_state.verlauf_zusammenfassung.zeilen)
     )
-    relevante_texte = [
-        chunk for chunk in results.get("documents", [[]])[0] if chunk is not None
-    ]
-
-    if not relevante_texte:
-        st.warning("⚠️ Keine relevanten Chunks gefunden.")
-    else:
-        # === Prompt zusammenbauen
-        verlauf = ""
-        for i, (q, a) in enumerate(st.session_state.chat_history):
-            verlauf += f"Frage {i+1}: {q}\nAntwort {i+1}: {a}\n\n"
-
-        prompt = (
-            "Du bist ein hilfreicher Fußball-Experte für Football Manager.\n"
-            "Nutze den folgenden Kontext, um die Frage zu beantworten.\n"
-            "Wenn der Kontext nicht ausreicht, gib dein Bestes anhand deines Wissens.\n\n"
-            "Beziehe deine Antworten wenn möglich auf den FM 24.\n\n"
-            f"CHATVERLAUF:\n{verlauf}"
-            + "KONTEXT:\n"
-            + "\n---\n".join(relevante_texte)
-            + f"\n\nFRAGE: {frage}\n\nANTWORT:"
-        )
-
-        # === Anfrage an Ollama
-        try:
-            response = requests.post(
-                OLLAMA_URL,
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
+    antwort = antwort_cache.get_exakt(frage, version, gespraech)
+
+    if antwort is None:
+        # === LLM-Guard im Hintergrund; das Urteil wird erst vor der Antwort abgefragt
+        guard_urteil = standard_guard().starte(frage)
+
+        # === Embedding + Chunk-Suche
+        results = retrieval.suche(frage, n_results=5, where=sprach_filter(SPRACHE_FILTER))  # Vektor + BM25, Reranking
+        relevante_texte = [
+            chunk for chunk in results.get("documents", [[]])[0] if chunk is not None
+        ]
+        chunk_ids = results.get("ids", [[]])[0]
+
+        if not relevante_texte:
+            guard_urteil.cancel()
+            st.warning("⚠️ Keine relevanten Chunks gefunden.")
+        else:
+            # === L2: ähnliche Frage mit denselben Chunks → Generierung überspringen
+            frage_embedding = retrieval.embed([frage])[0]  # aus dem Embedding-Cache
+            antwort = antwort_cache.get_semantisch(frage_embedding, chunk_ids, version, gespraech)
+
+        if relevante_texte and antwort is None:
+            # === Prompt im Token-Budget zusammenbauen (ältere Runden werden verdichtet)
+            prompt = baue_prompt(
+                frage, relevante_texte, st.session_state.chat_history,
+                st.session_state.verlauf_zusammenfassung, token_zaehler,
+            )
+            log_event(
+                f"Prompt: {prompt.tokens['gesamt']} Tokens{' (geschätzt)' if token_zaehler.geschaetzt else ''} "
+                f"{prompt.tokens} | Chunks {len(prompt.chunks)} "
+                f"(verworfen {prompt.chunks_verworfen}) | Runden im Wortlaut {prompt.runden_wortlaut}"
             )
-            antwort = response.json()["response"]
-        except Exception as e:
-            log_event(f"Fehler bei der Kommunikation mit Ollama: {e}", level="error")
-            st.error(f"Fehler bei der Kommunikation mit Ollama: {e}")
-            antwort = "⚠️ Es gab ein Problem mit dem Modell."
 
+        # === Guard-Urteil: gesperrt wird nur die Antwort (Generierung oder L2-Treffer)
+        if relevante_texte and guard_urteil.result():
+            logge_verdacht(frage, typ="user_input_llm_check")
+            st.error("⚠️ Diese Eingabe wurde vom KI-Filter als riskant eingestuft.")
+            st.stop()
+
+        if relevante_texte and antwort is None:
+            # === Anfrage an Ollama: Tokens live anzeigen, erst nach vollständigem Stream in den Verlauf
+            # Chat-API: stabiler Präfix (System, Zusammenfassung, Verlauf) vor Kontext und Frage → KV-Cache-Wiederverwendung
+            stream = standard_client().stream(
+                {"model": OLLAMA_MODEL, "messages": prompt.nachrichten, "options": {"num_ctx": OLLAMA_NUM_CTX}},
+                url=standard_client().endpunkt("chat"),
+            )
+            live = st.empty()
+            try:
+                with live.container():
+                    st.markdown(f"**🧑 Du:** {frage}")
+                    st.write_stream(stream)
+                antwort = stream.text
+                antwort_cache.put(frage, frage_embedding, chunk_ids, antwort, version, gespraech)
+            except Exception as e:
+                log_event(f"Fehler bei der Kommunikation mit Ollama: {e}", level="error")
+                st.error(f"Fehler bei der Kommunikation mit Ollama: {e}")
+                antwort = "⚠️ Es gab ein Problem mit dem Modell."
+            finally:
+                stream.schliessen()  # bei Rerun/Stopp mitten im Stream: Verbindung schließen, Generierung endet
+                st.session_state.letzte_generierung = stream.zusammenfassung()
+                log_event(f"Generierung: {stream.zusammenfassung()} | Prompt gesamt ~{prompt.tokens['gesamt']} Tokens")
+            live.empty()  # die Antwort steht jetzt im Verlauf
+
+    if antwort is not None:
         # === Verlauf aktualisieren
         st.session_state.chat_history.append((frage, antwort))
         speichere_chatverlauf(st.session_state.chat_history)
@@ -0,0 +1,114 @@
+"""
+Benchmark for FMGPT query embedding backends (PyTorch vs. int8 ONNX).
+Measures per-query latency, peak memory of a fresh process and retrieval overlap on the chunk embeddings.
+"""
+
+import os
+import json
+import time
+import multiprocessing as mp
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# === Konfiguration ===
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_FILE = "./output/embeddings/embeddings.npy"   # mit PyTorch erzeugter Index (embed_chunks.py)
+CHUNK_FILE = "./output/chunks/chunked_sources.jsonl"
+TOP_K = 5
+N_CHUNK_QUERIES = 200
+FRAGEN = [
+    "Wie funktioniert Pressing im Football Manager?",
+    "Welche Rolle passt zu einem spielstarken Innenverteidiger?",
+    "Wie plane ich die Vorbereitung vor der Saison?",
+    "Was bedeutet die Teamanweisung Gegenpressing?",
+    "Wie verbessere ich die Moral meiner Spieler?",
+    "How do I train young players efficiently?",
+    "What is the difference between a regista and a deep-lying playmaker?",
+]
+
+
+def lade_fragen():
+    fragen = list(FRAGEN)
+    if os.path.exists(CHUNK_FILE):
+        with open(CHUNK_FILE, "r", encoding="utf-8") as f:
+            for line, _ in zip(f, range(N_CHUNK_QUERIES)):
+                fragen.append(" ".join(json.loads(line)["text"].split()[:20]))
+    return fragen
+
+
+def _messe(backend, fragen, queue):
+    # Läuft in einem frischen Prozess, damit Import- und Modellspeicher getrennt gemessen werden
+    start = time.perf_counter()
+    if backend == "onnx":
+        from onnx_embedding import OnnxEmbedder, standard_onnx_dir
+        model = OnnxEmbedder.laden(standard_onnx_dir(EMBED_MODEL))
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(EMBED_MODEL, device="cpu")
+    ladezeit = time.perf_counter() - start
+
+    model.encode(["Aufwärmen"], convert_to_numpy=True)
+    latenzen = []
+    vektoren = []
+    for frage in fragen:
+        t0 = time.perf_counter()
+        vektoren.append(model.encode([frage], convert_to_numpy=True)[0])
+        latenzen.append((time.perf_counter() - t0) * 1000)
+
+    try:
+        import resource
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:  # Windows
+        peak_mb = float("nan")
+    queue.put({
+        "ladezeit_s": ladezeit,
+        "p50_ms": float(np.percentile(latenzen, 50)),
+        "p95_ms": float(np.percentile(latenzen, 95)),
+        "peak_mb": peak_mb,
+        "vektoren": np.array(vektoren, dtype=np.float32),
+    })
+
+
+def messe_backend(backend, fragen):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_messe, args=(backend, fragen, queue))
+    proc.start()
+    ergebnis = queue.get()
+    proc.join()
+    return ergebnis
+
+
+def normiere(x):
+    return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+
+def main():
+    fragen = lade_fragen()
+    print(f"Benchmark mit {len(fragen)} Anfragen, Modell {EMBED_MODEL}\n")
+    ergebnisse = {backend: messe_backend(backend, fragen) for backend in ("torch", "onnx")}
+
+    print(f"{'Backend':<8}{'Laden (s)':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{'Peak RSS (MB)':>15}")
+    for backend, e in ergebnisse.items():
+        print(f"{backend:<8}{e['ladezeit_s']:>11.2f}{e['p50_ms']:>10.2f}{e['p95_ms']:>10.2f}{e['peak_mb']:>15.0f}")
+
+    torch_vecs = normiere(ergebnisse["torch"]["vektoren"])
+    onnx_vecs = normiere(ergebnisse["onnx"]["vektoren"])
+    cos = np.sum(torch_vecs * onnx_vecs, axis=1)
+    print(f"\nCosinus torch/onnx: min {cos.min():.4f}, Mittel {cos.mean():.4f}")
+
+    if os.path.exists(EMBEDDING_FILE):
+        index = normiere(np.load(EMBEDDING_FILE, mmap_mode="r").astype(np.float32))
+        top_torch = np.argsort(-(torch_vecs @ index.T), axis=1)[:, :TOP_K]
+        top_onnx = np.argsort(-(onnx_vecs @ index.T), axis=1)[:, :TOP_K]
+        overlap = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(top_torch, top_onnx)])
+        print(f"Retrieval-Überlappung@{TOP_K} gegen {len(index)} Chunks: {overlap:.1%}")
+    else:
+        print(f"Keine Embeddings unter {EMBEDDING_FILE} – Überlappung übersprungen.")
+
+
+# === Einstiegspunkt
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for the FMGPT index build: sequential embed-then-write vs. the pipelined build in build_index.py.
+Builds the current chunk set into temporary Chroma directories with a cold embedding cache per run.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+from dotenv import load_dotenv
+from build_index import (
+    BATCH_SIZE, CHUNK_DIR, EMBEDDING_FILE, EMBED_MODEL, INDEX_QUEUE_SIZE, INDEX_SOURCE, METADATA_FILE,
+    hnsw_metadaten, lade_chunk_set, schreibe_batches, waehle_quelle,
+)
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+from utils import aktuelle_chunk_datei
+
+load_dotenv()
+
+
+def messe(quelle, chunk_file, queue_size):
+    tmp = tempfile.mkdtemp(prefix="fmgpt_bench_")
+    try:
+        cache = EmbeddingCache(os.path.join(tmp, "cache.sqlite"))  # kalt, damit beide Läufe gleich viel rechnen
+        metadaten, texte, embed = lade_chunk_set(quelle, chunk_file, CachedEmbeddingFunction(EMBED_MODEL, cache=cache))
+        collection = chromadb.PersistentClient(path=os.path.join(tmp, "db")).create_collection(
+            name="bench_chunks", metadata=hnsw_metadaten()
+        )
+        start = time.perf_counter()
+        schreibe_batches(collection, list(metadaten), metadaten, texte, embed, BATCH_SIZE, queue_size)
+        dauer = time.perf_counter() - start
+        cache.close()
+        return len(metadaten), dauer
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    chunk_file = aktuelle_chunk_datei(CHUNK_DIR)
+    quelle = waehle_quelle(INDEX_SOURCE, chunk_file, EMBEDDING_FILE, METADATA_FILE)
+    print(f"Indexaufbau-Benchmark (Quelle: {quelle}, Batchgröße {BATCH_SIZE}, HNSW {hnsw_metadaten()})\n")
+    print(f"{'Variante':<28}{'Chunks':>8}{'Dauer (s)':>11}{'Chunks/s':>10}")
+    ergebnisse = {}
+    for name, queue_size in (("sequenziell", 0), (f"pipelined (Queue {INDEX_QUEUE_SIZE})", max(INDEX_QUEUE_SIZE, 1))):
+        anzahl, dauer = messe(quelle, chunk_file, queue_size)
+        ergebnisse[name] = anzahl / max(dauer, 1e-9)
+        print(f"{name:<28}{anzahl:>8}{dauer:>11.2f}{ergebnisse[name]:>10.1f}")
+    seq, pipe = ergebnisse.values()
+    print(f"\nBeschleunigung: {pipe / max(seq, 1e-9):.2f}x")
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
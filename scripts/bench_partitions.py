@@ -0,0 +1,91 @@
+"""
+Benchmark for FMGPT language partitions: filtered query on the mixed collection vs. routing to a per-language
+partition (and parallel fan-out over several languages). Measures p50/p95 latency and recall@k against exact
+search, for several shares of the filtered language.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from build_index import synchronisiere, synchronisiere_partitionen
+from rag_service import RetrievalService
+
+# === Konfiguration ===
+EMBEDDING_FILE = "./output/embeddings/embeddings.npy"
+N_CHUNKS = int(os.getenv("BENCH_SIZE", "20000"))
+ANTEILE = [float(x) for x in os.getenv("BENCH_SHARES", "0.05,0.2,0.5").split(",")]  # Anteil "de" am Korpus
+N_QUERIES = 200
+TOP_K = 5
+
+
+def basis_vektoren(rng):
+    if os.path.exists(EMBEDDING_FILE):
+        basis = np.load(EMBEDDING_FILE).astype(np.float32)
+    else:
+        basis = rng.normal(size=(2000, 384)).astype(np.float32)
+    return basis / np.linalg.norm(basis, axis=1, keepdims=True)
+
+
+def stichprobe(n, basis, rng):
+    vecs = basis[rng.integers(0, len(basis), n)] + rng.normal(0, 0.05, (n, basis.shape[1])).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def messe(service, fragen, where, wahr):
+    latenzen, recall = [], []
+    for frage, w in zip(fragen, wahr):
+        t0 = time.perf_counter()
+        ids = service.query(frage, n_results=TOP_K, where=where)["ids"][0]
+        latenzen.append((time.perf_counter() - t0) * 1000)
+        recall.append(len(set(ids) & w) / len(w))
+    return np.percentile(latenzen, 50), np.percentile(latenzen, 95), float(np.mean(recall))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    basis = basis_vektoren(rng)
+    print(f"{'Anteil de':>10}  {'Abfrage':<28}{'p50 (ms)':>10}{'p95 (ms)':>10}{f'Recall@{TOP_K}':>11}")
+    for anteil in ANTEILE:
+        vecs = stichprobe(N_CHUNKS, basis, rng)
+        ids = [f"c{i}" for i in range(N_CHUNKS)]
+        sprachen = np.where(rng.random(N_CHUNKS) < anteil, "de", "en")
+        metadaten = {id_: {"chunk_id": id_, "sprache": str(s)} for id_, s in zip(ids, sprachen)}
+        zeile = {id_: i for i, id_ in enumerate(ids)}
+        queries = stichprobe(N_QUERIES, basis, rng)
+        fragen = [f"q{i}" for i in range(N_QUERIES)]
+        embed_fn = lambda texte: [queries[int(t[1:])] for t in texte]
+
+        def exakt(maske):
+            kandidaten = np.flatnonzero(maske)
+            return [set(ids[j] for j in kandidaten[np.argsort(-(vecs[kandidaten] @ q))[:TOP_K]]) for q in queries]
+
+        tmp = tempfile.mkdtemp(prefix="fmgpt_part_")
+        try:
+            client = chromadb.PersistentClient(path=tmp)
+            collection = client.get_or_create_collection("bench_part")
+            synchronisiere(collection, metadaten, {}, lambda batch: vecs[[zeile[i] for i in batch]])
+            synchronisiere_partitionen(client, collection, metadaten, {}, ["de", "en"])
+            gefiltert = RetrievalService(tmp, "bench_part", client=client, embed_fn=embed_fn, partitionen=[])
+            partitioniert = RetrievalService(tmp, "bench_part", client=client, embed_fn=embed_fn, partitionen=["de", "en"])
+            wahr_de, wahr_alle = exakt(sprachen == "de"), exakt(np.ones(N_CHUNKS, dtype=bool))
+            beide = {"sprache": {"$in": ["de", "en"]}}
+            for name, service, where, wahr in (
+                ("gefiltert (de)", gefiltert, {"sprache": "de"}, wahr_de),
+                ("Partition (de)", partitioniert, {"sprache": "de"}, wahr_de),
+                ("gefiltert (de+en)", gefiltert, beide, wahr_alle),
+                ("Fan-out (de+en)", partitioniert, beide, wahr_alle),
+            ):
+                service.query(fragen[0], n_results=TOP_K, where=where)  # Store öffnen, Index laden
+                p50, p95, recall = messe(service, fragen, where, wahr)
+                print(f"{anteil:>10.0%}  {name:<28}{p50:>10.2f}{p95:>10.2f}{recall:>11.3f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark for FMGPT prompt-prefix reuse against a running Ollama.
+Replays a multi-turn conversation twice, after unloading the model each time:
+  alt: /api/generate with the full history as one text prompt, no preload
+  neu: /api/chat with a stable prefix (baue_prompt), keep_alive and preloading
+  neu+guard: like neu, with the LLM guard running alongside every turn (GUARD_MODEL)
+  neu+guard=antwortmodell: like neu+guard, but the guard uses OLLAMA_MODEL and competes for its KV cache
+Reports per turn the prefill time and the number of prompt tokens Ollama actually evaluated.
+"""
+
+import json
+import os
+
+from ollama_client import OllamaClient
+from prompt_protection import GUARD_MODEL, LlmGuard
+from prompt_builder import OLLAMA_NUM_CTX, SYSTEM_TEXT, TokenZaehler, Verlaufszusammenfassung, baue_prompt
+from utils import aktuelle_chunk_datei
+
+# === Konfiguration ===
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+NUM_PREDICT = int(os.getenv("BENCH_NUM_PREDICT", "64"))  # kurze Antworten, gemessen wird das Prefill
+FRAGEN = [
+    "Wie funktioniert Gegenpressing im FM 24?",
+    "Welche Spielerrollen passen dazu im Mittelfeld?",
+    "Wie stelle ich das Training darauf ein?",
+    "Was mache ich, wenn die Ausdauer nicht reicht?",
+    "Welche Formation eignet sich gegen tief stehende Gegner?",
+    "Wie wichtig ist die Mannschaftsbesprechung vor dem Spiel?",
+]
+CHUNKS_PRO_FRAGE = 4
+
+
+def lade_kontext():
+    pfad = aktuelle_chunk_datei("./output/chunks")
+    if os.path.exists(pfad):
+        with open(pfad, "r", encoding="utf-8") as f:
+            texte = [json.loads(line)["text"] for _, line in zip(range(len(FRAGEN) * CHUNKS_PRO_FRAGE), f)]
+        if len(texte) >= len(FRAGEN) * CHUNKS_PRO_FRAGE:
+            return texte
+    return [f"Abschnitt {i}: " + "Pressing, Umschaltspiel und Trainingssteuerung im Football Manager. " * 20 for i in range(len(FRAGEN) * CHUNKS_PRO_FRAGE)]
+
+
+def entlade(client, model=OLLAMA_MODEL):
+    client.generate({"model": model, "prompt": "", "keep_alive": 0})
+
+
+def alter_prompt(frage, chunks, verlauf):
+    historie = "".join(f"Frage {i + 1}: {q}\nAntwort {i + 1}: {a}\n\n" for i, (q, a) in enumerate(verlauf))
+    return SYSTEM_TEXT + f"CHATVERLAUF:\n{historie}" + "KONTEXT:\n" + "\n---\n".join(chunks) + f"\n\nFRAGE: {frage}\n\nANTWORT:"
+
+
+def lauf(client, modus, kontext, zaehle, guard_model=None):
+    verlauf, zusammenfassung, zeilen = [], Verlaufszusammenfassung(), []
+    optionen = {"num_ctx": OLLAMA_NUM_CTX, "num_predict": NUM_PREDICT, "temperature": 0}
+    entlade(client)
+    guard = None
+    if guard_model is not None:
+        entlade(client, guard_model)
+        guard = LlmGuard(guard_model, cache_size=0, client=client)  # ohne Cache: jede Runde fragt das Modell
+    if modus != "alt":
+        client.vorladen(OLLAMA_MODEL, {"num_ctx": OLLAMA_NUM_CTX}, system=SYSTEM_TEXT.rstrip())
+    for n, frage in enumerate(FRAGEN):
+        chunks = kontext[n * CHUNKS_PRO_FRAGE:(n + 1) * CHUNKS_PRO_FRAGE]
+        if modus == "alt":
+            stream = client.stream({"model": OLLAMA_MODEL, "prompt": alter_prompt(frage, chunks, verlauf), "options": optionen, "keep_alive": "5m"})
+        else:
+            urteil = guard.starte(frage) if guard is not None else None  # wie in app.py: parallel zum Prompt-Aufbau
+            prompt = baue_prompt(frage, chunks, verlauf, zusammenfassung, zaehle)
+            if urteil is not None:
+                urteil.result()
+            stream = client.stream({"model": OLLAMA_MODEL, "messages": prompt.nachrichten, "options": optionen}, url=client.endpunkt("chat"))
+        for _ in stream:
+            pass
+        verlauf.append((frage, stream.text))
+        zeilen.append(stream.zusammenfassung())
+    return zeilen
+
+
+def main():
+    client = OllamaClient()
+    kontext = lade_kontext()
+    zaehle = TokenZaehler()
+    laeufe = {"alt": None, "neu": None, "neu+guard": GUARD_MODEL}
+    if GUARD_MODEL != OLLAMA_MODEL:
+        laeufe["neu+guard=antwortmodell"] = OLLAMA_MODEL
+    ergebnisse = {modus: lauf(client, modus, kontext, zaehle, guard_model) for modus, guard_model in laeufe.items()}
+    print(f"{'Runde':>5}" + "".join(f"  {modus[:24]:>24} Prefill ms{'Tokens':>8}{'TTFT ms':>9}" for modus in ergebnisse))
+    for i in range(len(FRAGEN)):
+        print(f"{i + 1:>5}" + "".join(
+            f"  {z['prefill_ms'] or 0:>35.0f}{z['prompt_tokens'] or 0:>8}{z['ttft_ms'] or 0:>9.0f}"
+            for z in (zeilen[i] for zeilen in ergebnisse.values())
+        ))
+    for modus, zeilen in ergebnisse.items():
+        prefill = sum(z["prefill_ms"] or 0 for z in zeilen)
+        laden = sum(z["load_ms"] or 0 for z in zeilen)
+        print(f"{modus}: Prefill gesamt {prefill / 1000:.1f} s, Laden {laden / 1000:.1f} s, Prompt-Tokens {sum(z['prompt_tokens'] or 0 for z in zeilen)}")
+    print(f"Guard-Modell: {GUARD_MODEL} (Antwortmodell: {OLLAMA_MODEL})")
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
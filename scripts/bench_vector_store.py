@@ -0,0 +1,95 @@
+"""
+Benchmark for FMGPT vector store backends: Chroma (HNSW) vs. NumpyStore (exact, float32/float16).
+Measures recall@k against exact search, per-query latency and load time across corpus sizes.
+Uses the real chunk embeddings when available and pads larger sizes with perturbed copies.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from vector_store import NumpyStore, schreibe_numpy_store
+
+# === Konfiguration ===
+EMBEDDING_FILE = "./output/embeddings/embeddings.npy"
+GROESSEN = [int(x) for x in os.getenv("BENCH_SIZES", "1000,10000,50000").split(",")]
+N_QUERIES = 200
+TOP_K = 5
+SPRACHEN = ("de", "en")
+
+
+def korpus(n, basis, rng):
+    wiederholt = basis[rng.integers(0, len(basis), n)]
+    vecs = wiederholt + rng.normal(0, 0.05, wiederholt.shape).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def exakt(vecs, queries, k):
+    return [set(np.argsort(-(vecs @ q))[:k]) for q in queries]
+
+
+def messe(fn, queries):
+    latenzen, ergebnisse = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        ergebnisse.append(fn(q))
+        latenzen.append((time.perf_counter() - t0) * 1000)
+    return ergebnisse, np.percentile(latenzen, 50), np.percentile(latenzen, 95)
+
+
+def recall(treffer, wahr):
+    return float(np.mean([len(set(t) & w) / len(w) for t, w in zip(treffer, wahr)]))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    if os.path.exists(EMBEDDING_FILE):
+        basis = np.load(EMBEDDING_FILE).astype(np.float32)
+    else:
+        basis = rng.normal(size=(2000, 384)).astype(np.float32)
+    basis /= np.linalg.norm(basis, axis=1, keepdims=True)
+
+    print(f"{'Backend':<16}{'Chunks':>8}{'Laden (ms)':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}{f'Recall@{TOP_K}':>11}")
+    for n in GROESSEN:
+        vecs = korpus(n, basis, rng)
+        queries = korpus(N_QUERIES, basis, rng)
+        wahr = exakt(vecs, queries, TOP_K)
+        ids = [str(i) for i in range(n)]
+        metas = [{"sprache": SPRACHEN[i % 2]} for i in range(n)]
+        tmp = tempfile.mkdtemp(prefix="fmgpt_vs_")
+        try:
+            # Chroma (HNSW)
+            client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+            collection = client.create_collection("bench_vs", metadata={"hnsw:space": "cosine"})
+            for i in range(0, n, 5000):
+                collection.add(ids=ids[i:i + 5000], embeddings=vecs[i:i + 5000], metadatas=metas[i:i + 5000])
+            t0 = time.perf_counter()
+            collection = chromadb.PersistentClient(path=os.path.join(tmp, "chroma")).get_collection("bench_vs")
+            collection.query(query_embeddings=[queries[0]], n_results=1)
+            laden = (time.perf_counter() - t0) * 1000
+            treffer, p50, p95 = messe(
+                lambda q: [int(i) for i in collection.query(query_embeddings=[q], n_results=TOP_K)["ids"][0]], queries
+            )
+            print(f"{'chroma':<16}{n:>8}{laden:>12.0f}{p50:>10.2f}{p95:>10.2f}{recall(treffer, wahr):>11.3f}")
+
+            # NumPy (exakt)
+            for dtype in ("float32", "float16"):
+                pfad = os.path.join(tmp, f"numpy_{dtype}")
+                schreibe_numpy_store(pfad, ids, vecs, [None] * n, metas, dtype)
+                t0 = time.perf_counter()
+                store = NumpyStore.laden(pfad)
+                laden = (time.perf_counter() - t0) * 1000
+                treffer, p50, p95 = messe(lambda q: [int(i) for i in store.query(q, TOP_K)["ids"][0]], queries)
+                print(f"{'numpy ' + dtype:<16}{n:>8}{laden:>12.0f}{p50:>10.2f}{p95:>10.2f}{recall(treffer, wahr):>11.3f}")
+                _, p50, _ = messe(lambda q: store.query(q, TOP_K, where={"sprache": "de"}), queries)
+                print(f"{'  + Filter':<16}{n:>8}{'':>12}{p50:>10.2f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+"""
+Unified index builder for FMGPT.
+Syncs a Chroma collection in place from precomputed embeddings (embeddings.npy + metadata.jsonl)
+or from the chunk file, then removes segment directories no longer referenced by any collection.
+Full rebuilds go into a new collection version that replaces the active one via the alias (collection_alias.py).
+Replaces build_chroma_db.py, build_chroma_db_2.py and chunks.py.
+"""
+
+import os
+import json
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from tqdm import tqdm
+from collection_alias import (
+    SMOKE_QUERIES, SPRACH_PARTITIONEN, aktive_collection, erhoehe_revision, partitionen_von, partitions_name,
+    pruefe_collection, setze_alias, vergiss_versionen, versions_name, zu_loeschende_versionen,
+)
+from index_sync import batches, lade_vorhandene, plan_sync
+from lexical_index import LEXICAL_INDEX_PATH, lade_oder_baue
+from vector_store import VECTOR_STORE_DIR, VECTOR_STORE_DTYPE, exportiere_aus_chroma, veraltete_stores
+from utils import aktuelle_chunk_datei
+
+load_dotenv()
+
+# === Konfiguration ===
+CHROMA_DIR = os.getenv("CHROMA_PATH", "./output/chroma_db")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "chunks_semantic")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+CHUNK_DIR = "./output/chunks"
+EMBEDDING_FILE = "./output/embeddings/embeddings.npy"
+METADATA_FILE = "./output/embeddings/metadata.jsonl"
+BATCH_SIZE = 200
+INDEX_SOURCE = os.getenv("INDEX_SOURCE", "auto")      # "auto", "embeddings" (npy + metadata) oder "chunks"
+INDEX_MODE = os.getenv("INDEX_MODE", "incremental")   # "incremental" (aktive Version in place) oder "full" (neue Version + Umschalten)
+INDEX_GC = os.getenv("INDEX_GC", "1") == "1"          # verwaiste Segmentverzeichnisse löschen
+INDEX_LEXICAL = os.getenv("HYBRID_SEARCH", "1") == "1"  # BM25-Index für die hybride Suche mitbauen
+INDEX_NUMPY_STORE = os.getenv("VECTOR_BACKEND", "chroma") == "numpy"  # NumPy-Store der Version mit exportieren
+INDEX_QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", "4"))  # fertig eingebettete Batches in der Warteschlange (0 = sequenziell)
+# HNSW-Parameter gelten nur beim Anlegen einer Collection (also für neue Versionen mit INDEX_MODE=full)
+HNSW_SPACE = os.getenv("HNSW_SPACE", "l2")                    # "l2", "cosine" oder "ip"
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+
+
+# === Zeichen bereinigen (z. B. ü → u / ungültig → entfernt)
+def clean_text(s):
+    if isinstance(s, str):
+        return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return s
+
+
+def clean_metadata(meta):
+    return {k: clean_text(v) for k, v in meta.items()}
+
+
+def metadaten_fuer(e: Dict[str, Any]) -> Dict[str, Any]:
+    return clean_metadata({
+        "chunk_id": e["chunk_id"],
+        "quelle": e.get("quelle", "unbekannt"),
+        "typ": e.get("typ", "unspezifiziert"),
+        "thema": e.get("thema", ""),
+        "sprache": e.get("sprache", "unbekannt")
+    })
+
+
+def verzeichnis_groesse(path: str) -> int:
+    """Summe aller Dateigrößen unter path in Bytes."""
+    gesamt = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                gesamt += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return gesamt
+
+
+def format_mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def waehle_quelle(source: str, chunk_file: str, embedding_file: str, metadata_file: str) -> str:
+    """
+    Bestimmt die Quelle. "auto" nimmt die Embeddings, wenn sie mindestens so neu sind wie die Chunk-Datei.
+    :return: "embeddings" oder "chunks"
+    """
+    if source != "auto":
+        return source
+    if os.path.exists(embedding_file) and os.path.exists(metadata_file):
+        if not os.path.exists(chunk_file) or os.path.getmtime(embedding_file) >= os.path.getmtime(chunk_file):
+            return "embeddings"
+    return "chunks"
+
+
+def lade_chunks(chunk_file: str) -> Dict[str, Dict[str, Any]]:
+    """Liest die Chunk-Datei; doppelte IDs (= identischer Inhalt) werden nur einmal übernommen."""
+    entries = {}
+    if os.path.exists(chunk_file):
+        with open(chunk_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    entries.setdefault(e["chunk_id"], e)
+    return entries
+
+
+def lade_embeddings(embedding_file: str, metadata_file: str) -> Tuple[np.ndarray, Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Lädt vorberechnete Embeddings als Memmap samt Metadaten.
+    :return: (Embeddings, Dict ID -> Metadatenzeile, Dict ID -> Zeile in der Matrix)
+    """
+    embeddings = np.load(embedding_file, mmap_mode="r")
+    metadaten, zeilen = {}, {}
+    anzahl = 0
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        for line in f:
+            meta = json.loads(line)
+            if meta["chunk_id"] not in zeilen:
+                metadaten[meta["chunk_id"]] = meta
+                zeilen[meta["chunk_id"]] = anzahl
+            anzahl += 1
+    if len(embeddings) != anzahl:
+        raise ValueError(f"Anzahl Embeddings ({len(embeddings)}) passt nicht zu {metadata_file}")
+    return embeddings, metadaten, zeilen
+
+
+def hnsw_metadaten() -> Dict[str, Any]:
+    return {"hnsw:space": HNSW_SPACE, "hnsw:construction_ef": HNSW_CONSTRUCTION_EF, "hnsw:M": HNSW_M}
+
+
+def lade_chunk_set(quelle: str, chunk_file: str, embed_fn: Callable[[List[str]], Any]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str], Callable[[List[str]], Any]]:
+    """
+    Lädt das Chunk-Set aus der gewählten Quelle.
+    :param quelle: "embeddings" oder "chunks"
+    :param chunk_file: Chunk-Datei (liefert die Texte)
+    :param embed_fn: Embedding-Funktion für Texte (nur für Quelle "chunks")
+    :return: (Dict ID -> Metadaten, Dict ID -> Text, Funktion IDs -> Embeddings)
+    """
+    chunks = lade_chunks(chunk_file)
+    if quelle == "embeddings":
+        embeddings, roh, zeilen = lade_embeddings(EMBEDDING_FILE, METADATA_FILE)
+        metadaten = {id_: metadaten_fuer(m) for id_, m in roh.items()}
+        texte = {id_: chunks[id_]["text"] for id_ in metadaten if id_ in chunks}
+        return metadaten, texte, lambda ids: embeddings[[zeilen[i] for i in ids]]
+    metadaten = {id_: metadaten_fuer(e) for id_, e in chunks.items()}
+    texte = {id_: e["text"] for id_, e in chunks.items()}
+    return metadaten, texte, lambda ids: embed_fn([texte[i] for i in ids])
+
+
+def _bette_ein(embed: Callable[[List[str]], Any], batch_ids: List[str]) -> np.ndarray:
+    embeddings = np.asarray(embed(batch_ids), dtype=np.float32)
+    if np.isnan(embeddings).any():
+        raise ValueError(f"NaN im Embedding-Batch ab {batch_ids[0]}")
+    return embeddings
+
+
+def _schreibe(collection: Any, batch_ids: List[str], embeddings: np.ndarray, metadaten: Dict[str, Dict[str, Any]], texte: Dict[str, str]) -> None:
+    docs = [texte.get(i) for i in batch_ids]
+    collection.upsert(
+        ids=batch_ids,
+        embeddings=embeddings,
+        metadatas=[metadaten[i] for i in batch_ids],
+        documents=docs if all(d is not None for d in docs) else None,
+    )
+
+
+def schreibe_batches(
+    collection: Any,
+    ids: List[str],
+    metadaten: Dict[str, Dict[str, Any]],
+    texte: Dict[str, str],
+    embed: Callable[[List[str]], Any],
+    batch_size: int = BATCH_SIZE,
+    queue_size: int = INDEX_QUEUE_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+) -> None:
+    """
+    Bettet IDs batchweise ein und schreibt sie in die Collection. Mit queue_size > 0 bettet ein
+    Hintergrund-Thread Batch N+1 ein, während Batch N geschrieben wird; die Warteschlange
+    begrenzt, wie viele fertige Batches im Speicher liegen.
+    :param collection: Chroma-Collection
+    :param ids: Einzufügende IDs
+    :param metadaten: Dict ID -> Metadaten
+    :param texte: Dict ID -> Chunk-Text
+    :param embed: Liefert die Embeddings zu einer Liste von IDs
+    :param batch_size: IDs pro Batch
+    :param queue_size: Maximale Anzahl wartender Batches (0 = sequenziell)
+    :param progress: Optionaler Callback mit der Anzahl geschriebener IDs
+    """
+    if queue_size <= 0:
+        for batch_ids in batches(ids, batch_size):
+            _schreibe(collection, batch_ids, _bette_ein(embed, batch_ids), metadaten, texte)
+            if progress is not None:
+                progress(len(batch_ids))
+        return
+
+    fertig = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def produzent():
+        try:
+            for batch_ids in batches(ids, batch_size):
+                if stop.is_set():
+                    return
+                fertig.put((batch_ids, _bette_ein(embed, batch_ids)))
+        except BaseException as e:
+            fertig.put(e)
+            return
+        fertig.put(None)
+
+    thread = threading.Thread(target=produzent, name="index-embed", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = fertig.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            batch_ids, embeddings = item
+            _schreibe(collection, batch_ids, embeddings, metadaten, texte)
+            if progress is not None:
+                progress(len(batch_ids))
+    finally:
+        # Bei Abbruch den Produzenten stoppen und die Warteschlange leeren, damit er nicht blockiert
+        stop.set()
+        while thread.is_alive():
+            try:
+                fertig.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+def synchronisiere(
+    collection: Any,
+    metadaten: Dict[str, Dict[str, Any]],
+    texte: Dict[str, str],
+    embed: Callable[[List[str]], Any],
+    batch_size: int = BATCH_SIZE,
+    queue_size: int = INDEX_QUEUE_SIZE,
+) -> Dict[str, int]:
+    """
+    Gleicht eine Collection mit dem neuen Chunk-Set ab: löscht entfernte IDs, aktualisiert
+    geänderte Metadaten und bettet nur neue IDs ein.
+    :param collection: Chroma-Collection
+    :param metadaten: Dict ID -> bereinigte Metadaten
+    :param texte: Dict ID -> Chunk-Text (fehlende Texte werden ohne Dokument gespeichert)
+    :param embed: Liefert die Embeddings zu einer Liste von IDs
+    :param batch_size: IDs pro Chroma-Aufruf
+    :param queue_size: Wartende Batches zwischen Einbetten und Schreiben (0 = sequenziell)
+    :return: Anzahl hinzugefügt/aktualisiert/gelöscht/unverändert
+    """
+    plan = plan_sync(metadaten, lade_vorhandene(collection))
+    for batch_ids in batches(plan.delete, batch_size):
+        collection.delete(ids=batch_ids)
+    for batch_ids in batches(plan.update, batch_size):
+        collection.update(ids=batch_ids, metadatas=[metadaten[i] for i in batch_ids])
+    with tqdm(total=len(plan.add), desc=" Hinzufügen", disable=not plan.add) as bar:
+        schreibe_batches(collection, plan.add, metadaten, texte, embed, batch_size, queue_size, bar.update)
+    return {
+        "hinzugefuegt": len(plan.add),
+        "aktualisiert": len(plan.update),
+        "geloescht": len(plan.delete),
+        "unveraendert": len(plan.unchanged),
+    }
+
+
+def embeddings_aus(collection: Any) -> Callable[[List[str]], np.ndarray]:
+    """Liefert gespeicherte Embeddings einer Collection in der Reihenfolge der angefragten IDs."""
+    def embed(ids: List[str]) -> np.ndarray:
+        ergebnis = collection.get(ids=list(ids), include=["embeddings"])
+        zeile = {id_: i for i, id_ in enumerate(ergebnis["ids"])}
+        return np.asarray(ergebnis["embeddings"], dtype=np.float32)[[zeile[i] for i in ids]]
+    return embed
+
+
+def synchronisiere_partitionen(
+    client: Any,
+    collection: Any,
+    metadaten: Dict[str, Dict[str, Any]],
+    texte: Dict[str, str],
+    sprachen: List[str],
+    queue_size: int = INDEX_QUEUE_SIZE,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Gleicht je Sprache eine eigene Collection mit den Chunks dieser Sprache ab. Die Embeddings werden
+    aus der Haupt-Collection kopiert, nicht neu berechnet.
+    :param client: Chroma-Client
+    :param collection: Bereits abgeglichene Haupt-Collection (alle Sprachen)
+    :param metadaten: Dict ID -> bereinigte Metadaten
+    :param texte: Dict ID -> Chunk-Text
+    :param sprachen: Sprachen, z. B. ["de", "en"]
+    :param queue_size: Wartende Batches zwischen Lesen und Schreiben
+    :return: Dict Sprache -> Statistik wie bei synchronisiere
+    """
+    ergebnis = {}
+    for sprache in sprachen:
+        teil = {id_: m for id_, m in metadaten.items() if m.get("sprache") == sprache}
+        partition = client.get_or_create_collection(name=partitions_name(collection.name, sprache), metadata=hnsw_metadaten())
+        ergebnis[sprache] = synchronisiere(partition, teil, texte, embeddings_aus(collection), queue_size=queue_size)
+    return ergebnis
+
+
+def verwaiste_segmente(chroma_dir: str) -> Optional[List[str]]:
+    """
+    Findet Segmentverzeichnisse, die in chroma.sqlite3 keiner Collection mehr zugeordnet sind
+    (z. B. nach delete_collection).
+    :param chroma_dir: Chroma-Verzeichnis
+    :return: Pfade der verwaisten Verzeichnisse, None wenn chroma.sqlite3 fehlt (dann nichts löschen)
+    """
+    db_path = os.path.join(chroma_dir, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        aktiv = {str(row[0]) for row in conn.execute("SELECT id FROM segments")}
+    finally:
+        conn.close()
+    verwaist = []
+    for name in sorted(os.listdir(chroma_dir)):
+        pfad = os.path.join(chroma_dir, name)
+        try:
+            uuid.UUID(name)
+        except ValueError:
+            continue
+        if os.path.isdir(pfad) and name not in aktiv:
+            verwaist.append(pfad)
+    return verwaist
+
+
+def entferne_verwaiste_segmente(chroma_dir: str) -> Tuple[int, int]:
+    """
+    Löscht verwaiste Segmentverzeichnisse.
+    :return: (Anzahl Verzeichnisse, freigegebene Bytes)
+    """
+    verwaist = verwaiste_segmente(chroma_dir)
+    if not verwaist:
+        return 0, 0
+    frei = 0
+    for pfad in verwaist:
+        frei += verzeichnis_groesse(pfad)
+        shutil.rmtree(pfad, ignore_errors=True)
+    return len(verwaist), frei
+
+
+def main():
+    import chromadb
+    from embedding_cache import CachedEmbeddingFunction
+
+    chunk_file = aktuelle_chunk_datei(CHUNK_DIR)  # dedupliziert, falls vorhanden
+    quelle = waehle_quelle(INDEX_SOURCE, chunk_file, EMBEDDING_FILE, METADATA_FILE)
+    groesse_vorher = verzeichnis_groesse(CHROMA_DIR)
+
+    # === Chunk-Set laden
+    print(f"\nLese {EMBEDDING_FILE if quelle == 'embeddings' else chunk_file}...")
+    embed_fn = CachedEmbeddingFunction(EMBED_MODEL)
+    metadaten, texte, embed = lade_chunk_set(quelle, chunk_file, embed_fn)
+    print(f" Gelesen: {len(metadaten)} Chunks (Quelle: {quelle})")
+
+    # === Chroma abgleichen
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    vorhanden = {c.name for c in client.list_collections()}
+    aktiv = aktive_collection(CHROMA_DIR, COLLECTION_NAME)
+    if INDEX_MODE == "full":
+        # Neue Version neben der aktiven aufbauen; die App liest bis zum Umschalten weiter die alte
+        ziel = versions_name(COLLECTION_NAME)
+        print(f" Baue neue Version '{ziel}' (aktiv bleibt '{aktiv}')")
+    else:
+        ziel = aktiv
+    collection = client.get_or_create_collection(name=ziel, metadata=hnsw_metadaten())
+    abweichend = {k: v for k, v in (collection.metadata or {}).items() if k in hnsw_metadaten() and v != hnsw_metadaten()[k]}
+    if abweichend:
+        print(f" Hinweis: '{ziel}' wurde mit {abweichend} angelegt; neue HNSW-Parameter greifen erst mit INDEX_MODE=full")
+    start = time.perf_counter()
+    stats = synchronisiere(collection, metadaten, texte, embed)
+    dauer = time.perf_counter() - start
+    print(
+        f" Neu: {stats['hinzugefuegt']} | Metadaten geändert: {stats['aktualisiert']} | "
+        f"Entfernt: {stats['geloescht']} | Unverändert: {stats['unveraendert']}"
+    )
+    print(f" Dauer: {dauer:.1f} s ({stats['hinzugefuegt'] / max(dauer, 1e-9):.1f} neue Chunks/s, Warteschlange {INDEX_QUEUE_SIZE})")
+    if SPRACH_PARTITIONEN:
+        for sprache, p in synchronisiere_partitionen(client, collection, metadaten, texte, SPRACH_PARTITIONEN).items():
+            anzahl = p["hinzugefuegt"] + p["aktualisiert"] + p["unveraendert"]
+            print(f" Partition '{sprache}': {anzahl} Chunks (neu {p['hinzugefuegt']}, entfernt {p['geloescht']})")
+
+    if INDEX_MODE == "full":
+        fehler = pruefe_collection(collection, embed_fn(SMOKE_QUERIES), len(metadaten))
+        for sprache in SPRACH_PARTITIONEN:
+            erwartet = sum(1 for m in metadaten.values() if m.get("sprache") == sprache)
+            partition = client.get_collection(name=partitions_name(ziel, sprache))
+            fehler += [f"Partition '{sprache}': {f}" for f in pruefe_collection(partition, embed_fn(SMOKE_QUERIES), erwartet)]
+        if fehler:
+            for name in [ziel] + partitionen_von(ziel, [c.name for c in client.list_collections()]):
+                client.delete_collection(name=name)
+            for f in fehler:
+                print(f" Validierung fehlgeschlagen: {f}")
+            raise SystemExit(f"Neue Version verworfen, '{aktiv}' bleibt aktiv.")
+        setze_alias(CHROMA_DIR, COLLECTION_NAME, ziel, vorher=aktiv if aktiv in vorhanden else None)
+        print(f" Alias '{COLLECTION_NAME}' zeigt jetzt auf '{ziel}' (Rollback: python scripts/collection_alias.py rollback)")
+        alt = zu_loeschende_versionen(CHROMA_DIR, COLLECTION_NAME)
+        for name in alt:
+            for teil in [name] + partitionen_von(name, vorhanden):
+                if teil in vorhanden:
+                    client.delete_collection(name=teil)
+        vergiss_versionen(CHROMA_DIR, COLLECTION_NAME, alt)
+        if alt:
+            print(f" Alte Versionen entfernt: {', '.join(alt)}")
+
+    # === Verwaiste Segmente entfernen
+    if INDEX_GC and not os.path.exists(os.path.join(CHROMA_DIR, "chroma.sqlite3")):
+        print(" chroma.sqlite3 fehlt – Bereinigung verwaister Segmente übersprungen.")
+    elif INDEX_GC:
+        anzahl, frei = entferne_verwaiste_segmente(CHROMA_DIR)
+        print(f" Verwaiste Segmente entfernt: {anzahl} ({format_mb(frei)})")
+    if INDEX_NUMPY_STORE:
+        anzahl = exportiere_aus_chroma(collection, os.path.join(VECTOR_STORE_DIR, ziel))
+        for sprache in SPRACH_PARTITIONEN:
+            name = partitions_name(ziel, sprache)
+            exportiere_aus_chroma(client.get_collection(name=name), os.path.join(VECTOR_STORE_DIR, name))
+        for pfad in veraltete_stores(VECTOR_STORE_DIR, [c.name for c in client.list_collections()]):
+            shutil.rmtree(pfad, ignore_errors=True)
+        print(f" NumPy-Store: {anzahl} Chunks ({VECTOR_STORE_DTYPE}) unter {os.path.join(VECTOR_STORE_DIR, ziel)}")
+    if INDEX_LEXICAL and os.path.exists(chunk_file):
+        lexical = lade_oder_baue(chunk_file)
+        print(f" BM25-Index: {len(lexical)} Chunks, {len(lexical.terme)} Terme ({LEXICAL_INDEX_PATH})")
+    # Nach jedem Sync (auch inkrementell in place, wo der Name gleich bleibt) und erst nach den Exporten:
+    # die neue Revision invalidiert Antwort-Cache und geöffnete Stores der App
+    print(f" Revision von '{COLLECTION_NAME}': {erhoehe_revision(CHROMA_DIR, COLLECTION_NAME)}")
+    print(f" Indexgröße: {format_mb(groesse_vorher)} → {format_mb(verzeichnis_groesse(CHROMA_DIR))}")
+    print(f"\nChroma-DB gespeichert unter: {CHROMA_DIR} als Collection '{ziel}' ({collection.count()} Chunks)")
+
+    # === Testabfrage
+    test_query = "Wie funktioniert Pressing im Football Manager?"
+    print(f"\nTestabfrage: '{test_query}'")
+    query_emb = embed_fn([test_query])[0]
+    results = collection.query(query_embeddings=[query_emb], n_results=3)
+    if results["ids"] and results["ids"][0]:
+        print("\nTop 3 ähnliche Chunks:")
+        for i, (id_, meta) in enumerate(zip(results["ids"][0], results["metadatas"][0])):
+            print(f"{i+1}. {id_} | Thema: {meta['thema']} | Typ: {meta['typ']} | Sprache: {meta['sprache']}")
+    else:
+        print(" Keine passenden Chunks gefunden.")
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import os
 import json
 import re
 from tqdm import tqdm
+from utils import chunk_id
 
 # === Konfiguration ===
 INPUT_FILE = "./output/extracted_sources.jsonl"
@@ -41,10 +42,11 @@ def main():
         for line in tqdm(f, desc="🔪 Chunking"):
             entry = json.loads(line)
             chunks = chunk_text(entry["text"])
+            vergeben = {}
 
-            for i, chunk in enumerate(chunks):
+            for chunk in chunks:
                 chunked_data.append({
-                    "chunk_id": f"{entry['id']}_{entry['typ']}_{i+1:03}",
+                    "chunk_id": chunk_id(entry["id"], entry["typ"], chunk, vergeben),
                     "quelle": entry["quelle"],
                     "typ": entry["typ"],
                     "thema": entry["thema"],
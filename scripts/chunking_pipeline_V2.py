@@ -4,8 +4,10 @@ Script for advanced chunking pipeline (V2) for FMGPT.
 
 import os
 import json
+import time
 from tqdm import tqdm
 import spacy
+from utils import chunk_id
 
 # === Konfiguration ===
 INPUT_FILES = [
@@ -13,27 +15,93 @@ INPUT_FILES = [
     "output/translated_sources.jsonl"     # enthält nur deutsch
 ]
 OUTPUT_DIR = "./output/chunks"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "chunked_sources.jsonl")
 MAX_WORDS_PER_CHUNK = 120  # Ziel: semantisch sinnvolle Chunk-Größe (~120 Wörter)
 
-# === spaCy-Modelle vorbereiten (einmal laden)
-print("Lade spaCy-Modelle...")
-spacy_models = {
-    "de": spacy.load("de_core_news_sm"),
-    "en": spacy.load("en_core_web_sm")
+# === Segmentierung ===
+# "fast":   nur tok2vec + parser (gleiche Satzgrenzen wie "full", ohne Tagger/NER/Lemmatizer)
+# "senter": statistischer Satzsegmentierer statt Parser (am schnellsten, Grenzen können abweichen)
+# "full":   komplette Pipeline wie bisher
+SEGMENTATION_MODE = os.getenv("SEGMENTATION_MODE", "fast")
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "32"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))  # >1 = mehrere Prozesse über nlp.pipe
+# Längere Texte werden fensterweise segmentiert (deutlich unter spaCys max_length von 1.000.000 Zeichen)
+WINDOW_CHARS = int(os.getenv("SEGMENT_WINDOW_CHARS", "100000"))
+SPACY_MODELLE = {
+    "de": "de_core_news_sm",
+    "en": "en_core_web_sm"
 }
+NICHT_BENOETIGT = ["tagger", "morphologizer", "attribute_ruler", "lemmatizer", "ner"]
+
+# === spaCy-Modelle (lazy, einmal pro Sprache geladen)
+spacy_models = {}
+
+def modell_sprache(lang_code):
+    lang_code = (lang_code or "").lower()
+    return lang_code if lang_code in SPACY_MODELLE else "en"  # fallback: englisch
+
+def lade_spacy_modell(lang_code, mode=SEGMENTATION_MODE):
+    key = modell_sprache(lang_code)
+    if key not in spacy_models:
+        print(f"Lade spaCy-Modell {SPACY_MODELLE[key]} (Modus: {mode})...")
+        if mode == "full":
+            nlp = spacy.load(SPACY_MODELLE[key])
+        elif mode == "senter":
+            nlp = spacy.load(SPACY_MODELLE[key], exclude=NICHT_BENOETIGT + ["parser"])
+            nlp.enable_pipe("senter")
+        else:
+            nlp = spacy.load(SPACY_MODELLE[key], exclude=NICHT_BENOETIGT)
+        spacy_models[key] = nlp
+    return spacy_models[key]
 
 # === Sprachspezifisches Satz-Tokenizing mit spaCy
-def tokenize_sentences(text, lang_code):
-    nlp = spacy_models.get(lang_code.lower(), spacy_models["en"])  # fallback: englisch
-    doc = nlp(text)
+def sentences_from_doc(doc):
     return [sent.text.strip() for sent in doc.sents]
 
+def tokenize_sentences(text, lang_code):
+    nlp = lade_spacy_modell(lang_code)
+    return list(iter_sentences_streaming(text, nlp, WINDOW_CHARS))
+
+# === Lange Texte: Fenster an Absatz-/Wortgrenzen schneiden
+def iter_windows(text, window_chars=WINDOW_CHARS):
+    start = 0
+    while start < len(text):
+        end = start + window_chars
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(" ", start, end)
+            end = cut + 1 if cut > start else end
+        yield text[start:end]
+        start = end
+
+# === Satz-Streaming über Fenster; der letzte (evtl. abgeschnittene) Satz wird ins nächste Fenster übernommen
+def iter_sentences_streaming(text, nlp, window_chars=WINDOW_CHARS):
+    if len(text) <= window_chars:
+        yield from sentences_from_doc(nlp(text))
+        return
+    rest = ""
+    for window in iter_windows(text, window_chars):
+        doc = nlp(rest + window)
+        sents = list(doc.sents)
+        for sent in sents[:-1]:
+            yield sent.text.strip()
+        rest = doc.text[sents[-1].start_char:] if sents else doc.text
+        if len(rest) > window_chars:
+            # Kein Satzende im ganzen Fenster: Rest als eigenen "Satz" abgeben
+            yield rest.strip()
+            rest = ""
+    if rest.strip():
+        yield from sentences_from_doc(nlp(rest))
+
 # === Chunking-Funktion (semantisch sinnvoll, satzbasiert)
 def chunk_text_semantic(text, lang_code, max_words=MAX_WORDS_PER_CHUNK):
-    sentences = tokenize_sentences(text, lang_code)
-    chunks = []
+    return chunk_sentences(tokenize_sentences(text, lang_code), max_words)
+
+def chunk_sentences(sentences, max_words=MAX_WORDS_PER_CHUNK):
+    return list(iter_chunks(sentences, max_words))
+
+def iter_chunks(sentences, max_words=MAX_WORDS_PER_CHUNK):
     current_chunk = []
     current_len = 0
 
@@ -43,11 +111,11 @@ def chunk_text_semantic(text, lang_code, max_words=MAX_WORDS_PER_CHUNK):
 
         if current_len + sentence_len > max_words:
             if current_chunk:
-                chunks.append(" ".join(current_chunk))
+                yield " ".join(current_chunk)
                 current_chunk = sentence_words
                 current_len = sentence_len
             else:
-                chunks.append(sentence)
+                yield sentence
                 current_chunk = []
                 current_len = 0
         else:
@@ -55,46 +123,80 @@ def chunk_text_semantic(text, lang_code, max_words=MAX_WORDS_PER_CHUNK):
             current_len += sentence_len
 
     if current_chunk:
-        chunks.append(" ".join(current_chunk))
+        yield " ".join(current_chunk)
 
-    return chunks
-
-# === Hauptfunktion zur Verarbeitung aller Dateien
-def main():
-    chunked_data = []
-
-    for input_file in INPUT_FILES:
+# === Einträge mit Text aus allen Eingabedateien lesen
+def iter_eintraege(input_files=INPUT_FILES, sprache=None, laenge=None):
+    for input_file in input_files:
         if not os.path.exists(input_file):
-            print(f"Datei nicht gefunden: {input_file}")
             continue
-
         with open(input_file, "r", encoding="utf-8") as f:
-            for line in tqdm(f, desc=f"🔪 Chunking {os.path.basename(input_file)}"):
+            for line in f:
                 entry = json.loads(line)
                 text = entry.get("text", "")
-                sprache = entry.get("sprache", "en")  # fallback: englisch
-
                 if not text.strip():
                     continue  # Leere Texte überspringen
+                if sprache is not None and modell_sprache(entry.get("sprache", "en")) != sprache:
+                    continue
+                if laenge == "kurz" and len(text) > WINDOW_CHARS or laenge == "lang" and len(text) <= WINDOW_CHARS:
+                    continue
+                yield entry
+
+# === Batchweise Segmentierung: pro Sprache ein nlp.pipe-Strom über alle Dateien
+def iter_chunked_docs(input_files=INPUT_FILES, batch_size=SPACY_BATCH_SIZE, n_process=SPACY_N_PROCESS):
+    for sprache in SPACY_MODELLE:
+        if not any(True for _ in iter_eintraege(input_files, sprache)):
+            continue
+        nlp = lade_spacy_modell(sprache)
+        docs = nlp.pipe(
+            ((entry["text"], entry) for entry in iter_eintraege(input_files, sprache, laenge="kurz")),
+            as_tuples=True,
+            batch_size=batch_size,
+            n_process=n_process,
+        )
+        for doc, entry in docs:
+            yield entry, chunk_sentences(sentences_from_doc(doc))
+
+        # Sehr lange Texte fensterweise; Chunks werden als Generator durchgereicht
+        for entry in iter_eintraege(input_files, sprache, laenge="lang"):
+            yield entry, iter_chunks(iter_sentences_streaming(entry["text"], nlp, WINDOW_CHARS))
+
+def chunk_records(entry, chunks):
+    sprache = entry.get("sprache", "en")  # fallback: englisch
+    vergeben = {}
+    for chunk in chunks:
+        yield {
+            "chunk_id": chunk_id(entry.get("id", "unk"), entry.get("typ", "undef"), chunk, vergeben),
+            "quelle": entry.get("quelle", "unbekannt"),
+            "typ": entry.get("typ", "unspezifiziert"),
+            "thema": entry.get("thema", ""),
+            "sprache": sprache,
+            "text": chunk
+        }
 
-                chunks = chunk_text_semantic(text, sprache)
+# === Hauptfunktion zur Verarbeitung aller Dateien
+def main():
+    for input_file in INPUT_FILES:
+        if not os.path.exists(input_file):
+            print(f"Datei nicht gefunden: {input_file}")
 
-                for i, chunk in enumerate(chunks):
-                    chunked_data.append({
-                        "chunk_id": f"{entry.get('id', 'unk')}_{entry.get('typ', 'undef')}_{i+1:03}",
-                        "quelle": entry.get("quelle", "unbekannt"),
-                        "typ": entry.get("typ", "unspezifiziert"),
-                        "thema": entry.get("thema", ""),
-                        "sprache": sprache,
-                        "text": chunk
-                    })
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    anzahl_docs = 0
+    anzahl_chunks = 0
+    start = time.perf_counter()
 
+    # Chunks werden direkt geschrieben; Reihenfolge: nach Sprache gruppiert
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        for item in chunked_data:
-            json.dump(item, f, ensure_ascii=False)
-            f.write("\n")
-
-    print(f"\n{len(chunked_data)} Chunks aus {len(INPUT_FILES)} Datei(en) gespeichert unter: {OUTPUT_FILE}")
+        for entry, chunks in tqdm(iter_chunked_docs(), desc="🔪 Chunking"):
+            anzahl_docs += 1
+            for item in chunk_records(entry, chunks):
+                json.dump(item, f, ensure_ascii=False)
+                f.write("\n")
+                anzahl_chunks += 1
+
+    dauer = time.perf_counter() - start
+    print(f"\n{anzahl_chunks} Chunks aus {len(INPUT_FILES)} Datei(en) gespeichert unter: {OUTPUT_FILE}")
+    print(f"{anzahl_docs} Dokumente in {dauer:.1f} s ({anzahl_docs / max(dauer, 1e-9):.1f} Dokumente/s, Modus: {SEGMENTATION_MODE})")
 
 # === Einstiegspunkt
 if __name__ == "__main__":
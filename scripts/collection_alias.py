@@ -0,0 +1,184 @@
+"""
+Versioned Chroma collections behind an alias for FMGPT.
+A rebuild writes a new collection version, validates it with smoke queries and then switches the
+alias atomically; readers resolve the alias and never see a half-built collection.
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+ALIAS_FILE = "aliases.json"   # liegt im Chroma-Verzeichnis
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))  # aktive + Vorgänger für schnellen Rollback
+SPRACH_PARTITIONEN = [s.strip() for s in os.getenv("LANGUAGE_PARTITIONS", "").split(",") if s.strip()]  # z. B. "de,en"
+SMOKE_QUERIES = [
+    "Wie funktioniert Pressing im Football Manager?",
+    "Welche Trainingseinheiten verbessern die Ausdauer?",
+    "How do I set up a counter-attacking tactic?",
+]
+
+
+def alias_pfad(chroma_dir: str) -> str:
+    return os.path.join(chroma_dir, ALIAS_FILE)
+
+
+def versions_name(alias: str, zeitpunkt: Optional[float] = None) -> str:
+    """Name einer neuen Version, z. B. chunks_semantic__v20250101T120000."""
+    return f"{alias}__v{time.strftime('%Y%m%dT%H%M%S', time.localtime(zeitpunkt))}"
+
+
+def partitions_name(collection: str, sprache: str) -> str:
+    """Name der Sprach-Partition einer Collection-Version, z. B. chunks_semantic__v20250101T120000__de."""
+    return f"{collection}__{sprache}"
+
+
+def partitionen_von(collection: str, vorhandene: Sequence[str]) -> List[str]:
+    """Vorhandene Sprach-Partitionen einer Collection-Version (auch nicht mehr konfigurierte)."""
+    muster = re.compile(re.escape(collection) + r"__[a-z]{2,3}")
+    return [n for n in vorhandene if muster.fullmatch(n)]
+
+
+def lade_aliase(chroma_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Liest die Alias-Datei.
+    :return: Dict Alias -> {"aktiv": Name, "versionen": [älteste ... neueste], "revision": Zähler}
+    """
+    try:
+        with open(alias_pfad(chroma_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _speichere_aliase(chroma_dir: str, aliase: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(chroma_dir, exist_ok=True)
+    tmp = alias_pfad(chroma_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(aliase, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, alias_pfad(chroma_dir))
+
+
+def aktive_collection(chroma_dir: str, alias: str) -> str:
+    """
+    Löst einen Alias auf. Ohne Eintrag ist der Alias selbst der Collection-Name (unversionierter Bestand).
+    :param chroma_dir: Chroma-Verzeichnis
+    :param alias: Alias, z. B. COLLECTION_NAME
+    :return: Name der aktiven Collection
+    """
+    return lade_aliase(chroma_dir).get(alias, {}).get("aktiv", alias)
+
+
+def aktive_revision(chroma_dir: str, alias: str) -> int:
+    """Revision des Alias; steigt mit jedem Sync, der Chunks ändert (auch inkrementell in place)."""
+    return int(lade_aliase(chroma_dir).get(alias, {}).get("revision", 0))
+
+
+def erhoehe_revision(chroma_dir: str, alias: str) -> int:
+    """
+    Markiert den Inhalt der aktiven Collection als geändert (Caches über der Collection werden ungültig).
+    :param chroma_dir: Chroma-Verzeichnis
+    :param alias: Alias
+    :return: Neue Revision
+    """
+    aliase = lade_aliase(chroma_dir)
+    eintrag = aliase.setdefault(alias, {"aktiv": alias, "versionen": []})
+    eintrag["revision"] = int(eintrag.get("revision", 0)) + 1
+    _speichere_aliase(chroma_dir, aliase)
+    return eintrag["revision"]
+
+
+def setze_alias(chroma_dir: str, alias: str, name: str, vorher: Optional[str] = None) -> None:
+    """
+    Schaltet den Alias atomar auf eine Collection um und merkt sich die Version.
+    :param chroma_dir: Chroma-Verzeichnis
+    :param alias: Alias
+    :param name: Neue aktive Collection
+    :param vorher: Bisher aktive Collection (wird als Version übernommen, falls noch nicht bekannt)
+    """
+    aliase = lade_aliase(chroma_dir)
+    eintrag = aliase.setdefault(alias, {"aktiv": None, "versionen": []})
+    for version in (vorher, name):
+        if version and version not in eintrag["versionen"]:
+            eintrag["versionen"].append(version)
+    eintrag["aktiv"] = name
+    _speichere_aliase(chroma_dir, aliase)
+
+
+def rollback(chroma_dir: str, alias: str) -> str:
+    """
+    Schaltet auf die Version vor der aktiven zurück.
+    :return: Name der nun aktiven Collection
+    """
+    eintrag = lade_aliase(chroma_dir).get(alias)
+    if not eintrag or eintrag["aktiv"] not in eintrag["versionen"]:
+        raise ValueError(f"Keine Versionen für Alias '{alias}' bekannt")
+    pos = eintrag["versionen"].index(eintrag["aktiv"])
+    if pos == 0:
+        raise ValueError(f"Keine ältere Version für Alias '{alias}' vorhanden")
+    ziel = eintrag["versionen"][pos - 1]
+    setze_alias(chroma_dir, alias, ziel)
+    return ziel
+
+
+def zu_loeschende_versionen(chroma_dir: str, alias: str, behalten: int = KEEP_VERSIONS) -> List[str]:
+    """
+    Versionen außerhalb der Aufbewahrung: alles außer den neuesten `behalten` Versionen;
+    die aktive Version wird nie gelöscht.
+    """
+    eintrag = lade_aliase(chroma_dir).get(alias)
+    if not eintrag:
+        return []
+    alt = eintrag["versionen"][:-behalten] if behalten > 0 else list(eintrag["versionen"])
+    return [v for v in alt if v != eintrag["aktiv"]]
+
+
+def vergiss_versionen(chroma_dir: str, alias: str, namen: Sequence[str]) -> None:
+    """Entfernt gelöschte Versionen aus der Alias-Datei."""
+    aliase = lade_aliase(chroma_dir)
+    if alias in aliase:
+        aliase[alias]["versionen"] = [v for v in aliase[alias]["versionen"] if v not in set(namen)]
+        _speichere_aliase(chroma_dir, aliase)
+
+
+def pruefe_collection(collection: Any, query_embeddings: Sequence[Any], erwartete_anzahl: int, n_results: int = 3) -> List[str]:
+    """
+    Smoke-Test einer neuen Version vor dem Umschalten.
+    :param collection: Chroma-Collection
+    :param query_embeddings: Embeddings der Testfragen
+    :param erwartete_anzahl: Anzahl Chunks, die die Collection enthalten soll
+    :param n_results: Treffer pro Testfrage
+    :return: Liste der Fehler (leer = in Ordnung)
+    """
+    fehler = []
+    anzahl = collection.count()
+    if anzahl != erwartete_anzahl:
+        fehler.append(f"Collection enthält {anzahl} statt {erwartete_anzahl} Chunks")
+    if erwartete_anzahl == 0:
+        return fehler
+    try:
+        ergebnis = collection.query(query_embeddings=list(query_embeddings), n_results=n_results)
+        for i, ids in enumerate(ergebnis.get("ids") or []):
+            if len(ids) < min(n_results, erwartete_anzahl):
+                fehler.append(f"Testfrage {i + 1} liefert nur {len(ids)} Treffer")
+    except Exception as e:
+        fehler.append(f"Testabfrage fehlgeschlagen: {e}")
+    return fehler
+
+
+# === Einstiegspunkt: Versionen anzeigen / Rollback ===
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    chroma_dir = os.getenv("CHROMA_PATH", "./output/chroma_db")
+    alias = sys.argv[2] if len(sys.argv) > 2 else os.getenv("COLLECTION_NAME", "chunks_semantic")
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        print(f"Alias '{alias}' zeigt jetzt auf {rollback(chroma_dir, alias)}")
+    else:
+        eintrag = lade_aliase(chroma_dir).get(alias, {"aktiv": alias, "versionen": []})
+        print(f"Alias '{alias}' → {eintrag['aktiv']}")
+        for version in eintrag["versionen"]:
+            print(f" {'*' if version == eintrag['aktiv'] else ' '} {version}")
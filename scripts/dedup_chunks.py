@@ -0,0 +1,150 @@
+"""
+Script to remove exact and near-duplicate chunks before embedding for FMGPT.
+"""
+
+import os
+import re
+import json
+import zlib
+import hashlib
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from tqdm import tqdm
+
+# === Konfiguration ===
+INPUT_FILE = "./output/chunks/chunked_sources.jsonl"
+OUTPUT_FILE = "./output/chunks/chunked_sources_dedup.jsonl"
+MAPPING_FILE = "./output/chunks/dedup_map.json"
+NUM_PERM = 64          # Länge der MinHash-Signatur
+BANDS = 8              # LSH: 8 Bänder à 8 Zeilen -> Kandidaten ab ca. 0.77 Jaccard
+SHINGLE_WORDS = 3      # Wort-Shingles
+THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # geschätzte Jaccard-Ähnlichkeit für Near-Duplicates
+
+_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(42)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.int64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.int64)
+
+
+def normalisiere(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    woerter = re.findall(r"\w+", text.lower())
+    if len(woerter) <= k:
+        grams = {" ".join(woerter)}
+    else:
+        grams = {" ".join(woerter[i:i + k]) for i in range(len(woerter) - k + 1)}
+    return np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.int64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    Berechnet die MinHash-Signatur eines Textes über Wort-Shingles.
+    :param text: Chunk-Text
+    :return: Signatur (NUM_PERM Werte)
+    """
+    h = shingles(text)
+    # (a*x + b) mod p für alle Permutationen; x < 2^32, a < 2^31 -> kein Überlauf in int64
+    return ((np.outer(_A, h) + _B[:, None]) % _PRIME).min(axis=1)
+
+
+class Deduplicator:
+    """
+    Entfernt exakte Duplikate (normalisierter Text-Hash) und Near-Duplicates (MinHash + LSH).
+    Der jeweils erste Chunk bleibt als Stellvertreter erhalten.
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, bands: int = BANDS) -> None:
+        """
+        :param threshold: Mindest-Ähnlichkeit (geschätzte Jaccard) für Near-Duplicates
+        :param bands: Anzahl LSH-Bänder (NUM_PERM muss durch bands teilbar sein)
+        """
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.exakt: Dict[str, str] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+        self.signaturen: Dict[str, np.ndarray] = {}
+        self.mapping: Dict[str, str] = {}
+        self.stats = {"gesamt": 0, "exakt": 0, "aehnlich": 0, "zeichen_entfernt": 0}
+
+    def stellvertreter(self, chunk_id: str, text: str) -> Tuple[Optional[str], str]:
+        """
+        Prüft einen Chunk und merkt ihn sich, falls er neu ist.
+        :param chunk_id: ID des Chunks
+        :param text: Text des Chunks
+        :return: (ID des Stellvertreters oder None, Art: "neu", "exakt" oder "aehnlich")
+        """
+        key = hashlib.sha1(normalisiere(text).encode("utf-8")).hexdigest()
+        if key in self.exakt:
+            return self.exakt[key], "exakt"
+
+        signatur = minhash(text)
+        bandkeys = [signatur[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        kandidaten = {c for b, bk in enumerate(bandkeys) for c in self.buckets[b].get(bk, ())}
+        for kandidat in kandidaten:
+            if float(np.mean(self.signaturen[kandidat] == signatur)) >= self.threshold:
+                return kandidat, "aehnlich"
+
+        self.exakt[key] = chunk_id
+        self.signaturen[chunk_id] = signatur
+        for b, bk in enumerate(bandkeys):
+            self.buckets[b][bk].append(chunk_id)
+        return None, "neu"
+
+    def filter(self, chunks: Iterable[dict]) -> Iterator[dict]:
+        """
+        Liefert nur die Stellvertreter-Chunks und füllt mapping (entfernte ID -> Stellvertreter).
+        :param chunks: Chunk-Einträge mit chunk_id und text
+        :return: Iterator über die behaltenen Chunks
+        """
+        for chunk in chunks:
+            self.stats["gesamt"] += 1
+            ziel, art = self.stellvertreter(chunk["chunk_id"], chunk["text"])
+            if ziel is None:
+                yield chunk
+            else:
+                if ziel != chunk["chunk_id"]:
+                    self.mapping[chunk["chunk_id"]] = ziel
+                self.stats[art] += 1
+                self.stats["zeichen_entfernt"] += len(chunk["text"])
+
+
+def main():
+    dedup = Deduplicator()
+    behalten = 0
+    zeichen_gesamt = 0
+
+    def lese_chunks():
+        nonlocal zeichen_gesamt
+        with open(INPUT_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    chunk = json.loads(line)
+                    zeichen_gesamt += len(chunk["text"])
+                    yield chunk
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
+        for chunk in tqdm(dedup.filter(lese_chunks()), desc="🧹 Deduplizieren"):
+            json.dump(chunk, out, ensure_ascii=False)
+            out.write("\n")
+            behalten += 1
+
+    with open(MAPPING_FILE, "w", encoding="utf-8") as f:
+        json.dump(dedup.mapping, f, ensure_ascii=False, indent=2)
+
+    stats = dedup.stats
+    entfernt = stats["exakt"] + stats["aehnlich"]
+    print(f"\n{stats['gesamt']} Chunks geprüft, {behalten} behalten, {entfernt} entfernt "
+          f"({entfernt / max(stats['gesamt'], 1):.1%}; exakt: {stats['exakt']}, ähnlich: {stats['aehnlich']})")
+    print(f"Entfernter Text: {stats['zeichen_entfernt'] / max(zeichen_gesamt, 1):.1%} der Zeichen")
+    print(f"Gespeichert unter: {OUTPUT_FILE}")
+    print(f"Zuordnung entfernt -> Stellvertreter: {MAPPING_FILE}")
+
+
+# === Einstiegspunkt
+if __name__ == "__main__":
+    main()
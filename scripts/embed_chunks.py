@@ -4,46 +4,64 @@ Script to create embeddings for text chunks for FMGPT.
 
 import os
 import json
-import numpy as np
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
+from utils import aktuelle_chunk_datei
+from embedding_engine import embed_to_memmap
+from embedding_cache import standard_cache
 
 # === Konfiguration ===
-CHUNK_FILE = "./output/chunks/chunked_sources.jsonl"
+CHUNK_FILE = aktuelle_chunk_datei("./output/chunks")  # dedupliziert, falls vorhanden
 EMBEDDING_DIR = "./output/embeddings"
-os.makedirs(EMBEDDING_DIR, exist_ok=True)
-
-# === Modell laden ===
-print(" Lade Embedding-Modell...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# === Embedding erstellen ===
-embeddings = []
-metadaten = []
-
-print(" Embedding der Chunks läuft...")
-with open(CHUNK_FILE, "r", encoding="utf-8") as f:
-    for line in tqdm(f):
-        chunk = json.loads(line)
-        vector = model.encode(chunk["text"], show_progress_bar=False)
-        embeddings.append(vector)
-        metadaten.append({
-            "chunk_id": chunk["chunk_id"],
-            "quelle": chunk["quelle"],
-            "typ": chunk["typ"],
-            "thema": chunk["thema"],
-            "sprache": chunk["sprache"]
-        })
-
-# === Speicherung ===
-embedding_array = np.array(embeddings)
-np.save(os.path.join(EMBEDDING_DIR, "embeddings.npy"), embedding_array)
-
-with open(os.path.join(EMBEDDING_DIR, "metadata.jsonl"), "w", encoding="utf-8") as f:
-    for item in metadaten:
-        json.dump(item, f, ensure_ascii=False)
-        f.write("\n")
-
-print(f" Fertig! {len(embeddings)} Embeddings gespeichert unter:")
-print(f" {EMBEDDING_DIR}/embeddings.npy")
-print(f" {EMBEDDING_DIR}/metadata.jsonl")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))      # >1 = CPU-Prozesspool
+EMBED_DTYPE = os.getenv("EMBED_DTYPE", "float32")         # "float32" oder "float16"
+
+
+def main():
+    os.makedirs(EMBEDDING_DIR, exist_ok=True)
+
+    # === Modell laden ===
+    print(" Lade Embedding-Modell...")
+    model = SentenceTransformer(EMBED_MODEL)
+
+    # === Chunks lesen, Metadaten direkt schreiben ===
+    texte = []
+    with open(CHUNK_FILE, "r", encoding="utf-8") as f, \
+            open(os.path.join(EMBEDDING_DIR, "metadata.jsonl"), "w", encoding="utf-8") as meta_out:
+        for line in f:
+            chunk = json.loads(line)
+            texte.append(chunk["text"])
+            json.dump({
+                "chunk_id": chunk["chunk_id"],
+                "quelle": chunk["quelle"],
+                "typ": chunk["typ"],
+                "thema": chunk["thema"],
+                "sprache": chunk["sprache"]
+            }, meta_out, ensure_ascii=False)
+            meta_out.write("\n")
+
+    # === Embedding erstellen (längensortiert, direkt in die Memmap) ===
+    print(f" Embedding der Chunks läuft (Batchgröße {EMBED_BATCH_SIZE}, {EMBED_WORKERS} Prozess(e), {EMBED_DTYPE})...")
+    with tqdm(total=len(texte)) as bar:
+        stats = embed_to_memmap(
+            model,
+            texte,
+            os.path.join(EMBEDDING_DIR, "embeddings.npy"),
+            dtype=EMBED_DTYPE,
+            batch_size=EMBED_BATCH_SIZE,
+            workers=EMBED_WORKERS,
+            progress=bar.update,
+            cache=standard_cache(),
+            model_name=EMBED_MODEL,
+        )
+
+    print(f" Fertig! {stats['anzahl']} Embeddings ({stats['aus_cache']} aus Cache) in {stats['sekunden']:.1f} s ({stats['chunks_pro_sekunde']:.1f} Chunks/s) gespeichert unter:")
+    print(f" {EMBEDDING_DIR}/embeddings.npy")
+    print(f" {EMBEDDING_DIR}/metadata.jsonl")
+
+
+# === Einstiegspunkt ===
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Persistent embedding cache for FMGPT.
+Stores vectors in SQLite keyed by model name plus a normalized text hash, shared by all scripts that embed text.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, List, Optional, Sequence, Union
+
+import numpy as np
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./output/embedding_cache.sqlite")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+_SQL_VARS = 500  # Platzhalter pro IN-Abfrage
+
+
+def normalisiere_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Größenbegrenzter Embedding-Cache (SQLite). Beim Überschreiten von max_entries werden die
+    am längsten nicht genutzten Einträge entfernt.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES) -> None:
+        """
+        :param path: Pfad zur SQLite-Datei
+        :param max_entries: Maximale Anzahl Einträge
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._anzahl = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.stats = {"treffer": 0, "fehlend": 0}
+
+    @staticmethod
+    def schluessel(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{normalisiere_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Sucht die Embeddings mehrerer Texte in einem Durchgang.
+        :param model_name: Name des Embedding-Modells
+        :param texts: Texte
+        :return: Liste mit Vektor (float32) oder None je Text
+        """
+        keys = [self.schluessel(model_name, t) for t in texts]
+        gefunden = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_VARS):
+                teil = list(set(keys[i:i + _SQL_VARS]))
+                platzhalter = ",".join("?" * len(teil))
+                for key, vec in self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({platzhalter})", teil
+                ):
+                    gefunden[key] = np.frombuffer(vec, dtype=np.float32)
+            if gefunden:
+                jetzt = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(jetzt, k) for k in gefunden])
+                self._conn.commit()
+        ergebnis = [gefunden.get(k) for k in keys]
+        treffer = sum(v is not None for v in ergebnis)
+        self.stats["treffer"] += treffer
+        self.stats["fehlend"] += len(keys) - treffer
+        return ergebnis
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Any) -> None:
+        """
+        Speichert mehrere Embeddings und entfernt bei Bedarf die ältesten Einträge.
+        :param model_name: Name des Embedding-Modells
+        :param texts: Texte
+        :param vectors: Vektoren in gleicher Reihenfolge
+        """
+        jetzt = time.time()
+        zeilen = []
+        for text, vec in zip(texts, vectors):
+            vec = np.asarray(vec, dtype=np.float32)
+            zeilen.append((self.schluessel(model_name, text), vec.shape[0], vec.tobytes(), jetzt))
+        if not zeilen:
+            return
+        with self._lock:
+            vorher = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", zeilen)
+            self._anzahl += self._conn.total_changes - vorher
+            if self._anzahl > self.max_entries:
+                zu_viel = self._anzahl - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (zu_viel,),
+                )
+                self._anzahl -= zu_viel
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._anzahl
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_standard_cache: Optional[EmbeddingCache] = None
+
+
+def standard_cache() -> EmbeddingCache:
+    """Gemeinsamer Cache-Pfad aus EMBED_CACHE_PATH, einmal pro Prozess geöffnet."""
+    global _standard_cache
+    if _standard_cache is None:
+        _standard_cache = EmbeddingCache()
+    return _standard_cache
+
+
+def encode_cached(model: Any, model_name: str, texts: Sequence[str], cache: Optional[EmbeddingCache] = None, **encode_kwargs: Any) -> np.ndarray:
+    """
+    Wie SentenceTransformer.encode, aber nur für Texte, die noch nicht im Cache liegen.
+    :param model: SentenceTransformer-Modell (oder Callable, das es liefert, für lazy Laden)
+    :param model_name: Name des Modells (Teil des Cache-Schlüssels)
+    :param texts: Texte
+    :param cache: Cache (Standard: standard_cache())
+    :param encode_kwargs: Weitere Argumente für encode
+    :return: Array der Embeddings in Eingabereihenfolge
+    """
+    cache = cache if cache is not None else standard_cache()
+    vecs = cache.get_many(model_name, texts)
+    fehlend = [i for i, v in enumerate(vecs) if v is None]
+    if fehlend:
+        model = model() if callable(model) and not hasattr(model, "encode") else model
+        neu = model.encode([texts[i] for i in fehlend], convert_to_numpy=True, **encode_kwargs)
+        cache.put_many(model_name, [texts[i] for i in fehlend], neu)
+        for i, v in zip(fehlend, neu):
+            vecs[i] = np.asarray(v, dtype=np.float32)
+    if not vecs:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vecs)
+
+
+class CachedEmbeddingFunction:
+    """
+    Ersatz für chromadb's SentenceTransformerEmbeddingFunction mit persistentem Cache.
+    Das Modell wird erst geladen, wenn ein Text nicht im Cache liegt.
+    Backend "torch" nutzt SentenceTransformer, "onnx" das int8-quantisierte ONNX-Modell
+    aus onnx_embedding.py (ohne torch-Import).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        cache: Optional[EmbeddingCache] = None,
+        backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+    ) -> None:
+        """
+        :param model_name: Name des SentenceTransformer-Modells
+        :param cache: Cache (Standard: standard_cache())
+        :param backend: "torch" oder "onnx"
+        :param onnx_dir: Verzeichnis des exportierten ONNX-Modells (nur für backend="onnx")
+        """
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unbekanntes Embedding-Backend: {backend}")
+        if backend == "onnx":
+            from onnx_embedding import pruefe_pakete
+            pruefe_pakete()  # beim Start mit klarer Meldung scheitern, nicht erst bei der ersten Frage
+        self.model_name = model_name
+        self.cache = cache
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        # ONNX-Vektoren weichen minimal ab und bekommen eigene Cache-Schlüssel
+        self.cache_name = model_name if backend == "torch" else f"{model_name}@onnx-int8"
+        self._model = None
+
+    def _lade_modell(self) -> Any:
+        if self._model is None:
+            if self.backend == "onnx":
+                from onnx_embedding import OnnxEmbedder, standard_onnx_dir
+                self._model = OnnxEmbedder.laden(self.onnx_dir or standard_onnx_dir(self.model_name))
+            else:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def vorladen(self, text: str) -> float:
+        """
+        Lädt das Modell und kodiert text am Cache vorbei (ein Cache-Treffer würde das Laden
+        sonst auf die erste echte Anfrage verschieben).
+        :param text: Beispieltext
+        :return: Dauer der Kodierung (ohne Laden) in Millisekunden
+        """
+        model = self._lade_modell()
+        start = time.perf_counter()
+        model.encode([text], convert_to_numpy=True)
+        return (time.perf_counter() - start) * 1000
+
+    def __call__(self, input: Union[str, Sequence[str]]) -> List[np.ndarray]:
+        texts = [input] if isinstance(input, str) else list(input)
+        return list(encode_cached(self._lade_modell, self.cache_name, texts, self.cache))
@@ -0,0 +1,102 @@
+"""
+Batched embedding engine for FMGPT.
+Sorts texts by token length, encodes them in batches (optionally in a CPU process pool)
+and writes the vectors straight into a preallocated memory-mapped .npy file.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BLOCK_BATCHES = 16  # Batches pro Block, der auf einmal in die Memmap geschrieben wird
+
+
+def token_laengen(model: Any, texts: List[str]) -> np.ndarray:
+    """
+    Bestimmt die Tokenlänge jedes Textes mit dem Tokenizer des Modells (Fallback: Wortanzahl).
+    :param model: SentenceTransformer-Modell
+    :param texts: Texte
+    :return: Array der Längen
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None:
+        try:
+            max_len = getattr(model, "max_seq_length", None)
+            encoded = tokenizer(texts, add_special_tokens=True, truncation=max_len is not None, max_length=max_len)
+            return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+        except Exception:
+            pass
+    return np.array([len(t.split()) for t in texts], dtype=np.int64)
+
+
+def embed_to_memmap(
+    model: Any,
+    texts: List[str],
+    out_path: str,
+    dtype: str = "float32",
+    batch_size: int = 64,
+    workers: int = 1,
+    progress: Optional[Callable[[int], None]] = None,
+    cache: Any = None,
+    model_name: str = "",
+) -> Dict[str, float]:
+    """
+    Berechnet Embeddings längensortiert und schreibt sie in Eingabereihenfolge in eine .npy-Memmap.
+    Texte ähnlicher Länge landen im selben Batch, dadurch wird kaum gepaddet.
+    :param model: SentenceTransformer-Modell
+    :param texts: Texte in Ausgabereihenfolge
+    :param out_path: Zielpfad der .npy-Datei
+    :param dtype: "float32" oder "float16"
+    :param batch_size: Texte pro Modell-Batch
+    :param workers: Anzahl CPU-Prozesse (1 = im aktuellen Prozess)
+    :param progress: Optionaler Callback mit der Anzahl fertiger Texte pro Block
+    :param cache: Optionaler EmbeddingCache; nur fehlende Texte werden berechnet
+    :param model_name: Modellname als Cache-Schlüssel
+    :return: Statistik (anzahl, aus_cache, sekunden, chunks_pro_sekunde)
+    """
+    start = time.perf_counter()
+    n = len(texts)
+    dim = model.get_sentence_embedding_dimension()
+    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.dtype(dtype), shape=(n, dim))
+
+    # Cache-Treffer direkt schreiben, nur der Rest geht ans Modell
+    offen = np.arange(n)
+    if cache is not None:
+        fehlend = []
+        block = batch_size * BLOCK_BATCHES
+        for i in range(0, n, block):
+            for j, vec in enumerate(cache.get_many(model_name, texts[i:i + block]), start=i):
+                if vec is None:
+                    fehlend.append(j)
+                else:
+                    out[j] = vec
+        offen = np.array(fehlend, dtype=np.int64)
+        if progress is not None:
+            progress(n - len(offen))
+
+    laengen = token_laengen(model, [texts[j] for j in offen])
+    order = offen[np.argsort(-laengen, kind="stable")]
+    pool = model.start_multi_process_pool(target_devices=["cpu"] * workers) if workers > 1 and len(order) else None
+    try:
+        block = batch_size * BLOCK_BATCHES
+        for i in range(0, len(order), block):
+            idx = order[i:i + block]
+            block_texts = [texts[j] for j in idx]
+            if pool is not None:
+                vecs = model.encode_multi_process(block_texts, pool, batch_size=batch_size)
+            else:
+                vecs = model.encode(block_texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+            out[idx] = np.asarray(vecs, dtype=out.dtype)
+            if cache is not None:
+                cache.put_many(model_name, block_texts, vecs)
+            if progress is not None:
+                progress(len(idx))
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    out.flush()
+    del out
+    dauer = time.perf_counter() - start
+    return {"anzahl": n, "aus_cache": n - len(order), "sekunden": dauer, "chunks_pro_sekunde": n / max(dauer, 1e-9)}
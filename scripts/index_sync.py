@@ -0,0 +1,57 @@
+"""
+Incremental index synchronisation for FMGPT.
+Compares a new chunk set against an existing Chroma collection and plans which chunks to add, update or delete.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+
+class SyncPlan(NamedTuple):
+    add: List[str]        # neue IDs: einbetten + upsert
+    update: List[str]     # gleiche ID (= gleicher Text), andere Metadaten: nur Metadaten aktualisieren
+    delete: List[str]     # nicht mehr vorhandene IDs
+    unchanged: List[str]  # nichts zu tun
+
+
+def lade_vorhandene(collection: Any, page_size: int = 5000) -> Dict[str, Dict[str, Any]]:
+    """
+    Liest alle IDs und Metadaten einer Collection seitenweise (ohne Embeddings).
+    :param collection: Chroma-Collection
+    :param page_size: Einträge pro Abfrage
+    :return: Dict ID -> Metadaten
+    """
+    vorhanden = {}
+    offset = 0
+    while True:
+        seite = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = seite.get("ids") or []
+        metas = seite.get("metadatas") or [None] * len(ids)
+        for id_, meta in zip(ids, metas):
+            vorhanden[id_] = meta or {}
+        if len(ids) < page_size:
+            return vorhanden
+        offset += page_size
+
+
+def plan_sync(neue: Dict[str, Dict[str, Any]], vorhandene: Dict[str, Dict[str, Any]]) -> SyncPlan:
+    """
+    Plant die Synchronisation anhand inhaltsbasierter Chunk-IDs.
+    :param neue: Dict ID -> Metadaten des neuen Chunk-Sets
+    :param vorhandene: Dict ID -> Metadaten der Collection
+    :return: SyncPlan
+    """
+    add, update, unchanged = [], [], []
+    for id_, meta in neue.items():
+        if id_ not in vorhandene:
+            add.append(id_)
+        elif vorhandene[id_] != meta:
+            update.append(id_)
+        else:
+            unchanged.append(id_)
+    delete = [id_ for id_ in vorhandene if id_ not in neue]
+    return SyncPlan(add, update, delete, unchanged)
+
+
+def batches(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
@@ -0,0 +1,193 @@
+"""
+Incremental ingestion manifest for FMGPT.
+Remembers file fingerprints and HTTP validators per source so unchanged sources are reused instead of re-extracted.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+NEU = "new"
+GEAENDERT = "changed"
+WIEDERVERWENDET = "reused"
+
+
+def datei_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Berechnet den SHA-256-Hash einer Datei blockweise.
+    :param path: Pfad zur Datei
+    :param block_size: Blockgröße in Bytes
+    :return: Hex-Digest
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Persistentes Manifest der eingelesenen Quellen, Schlüssel ist "<typ>:<id>".
+    Für PDFs werden Größe, mtime und Inhalts-Hash gespeichert, für Webquellen ETag und
+    Last-Modified. Der extrahierte Text liegt als Datei im Cache-Verzeichnis.
+    """
+
+    def __init__(self, path: str = "./output/ingest_manifest.json", cache_dir: str = "./output/ingest_cache", force: bool = False) -> None:
+        """
+        :param path: Pfad zur Manifest-Datei
+        :param cache_dir: Verzeichnis für zwischengespeicherte Texte
+        :param force: True, um alle Quellen neu einzulesen
+        """
+        self.path = path
+        self.cache_dir = cache_dir
+        self.force = force
+        self.eintraege: Dict[str, Dict[str, Any]] = {}
+        self.status: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.eintraege = json.load(f)
+
+    @staticmethod
+    def schluessel(typ: str, source_id: str) -> str:
+        return f"{typ}:{source_id}"
+
+    def _text_pfad(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".txt")
+
+    def _cache_gueltig(self, key: str, quelle: str) -> Optional[Dict[str, Any]]:
+        alt = self.eintraege.get(key)
+        if self.force or not alt or alt.get("quelle") != quelle or not os.path.exists(self._text_pfad(key)):
+            return None
+        return alt
+
+    def cached_text(self, key: str) -> str:
+        """Liest den zwischengespeicherten Text einer Quelle."""
+        with open(self._text_pfad(key), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _speichere(self, key: str, eintrag: Dict[str, Any], text: str) -> None:
+        eintrag["text_sha256"] = text_hash(text)
+        with self._lock:
+            alt = self.eintraege.get(key)
+            if alt is None:
+                self.status[key] = NEU
+            elif alt.get("text_sha256") == eintrag["text_sha256"] and alt.get("quelle") == eintrag["quelle"]:
+                self.status[key] = WIEDERVERWENDET
+            else:
+                self.status[key] = GEAENDERT
+            self.eintraege[key] = eintrag
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._text_pfad(key), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def reuse(self, key: str) -> str:
+        """
+        Markiert eine Quelle als wiederverwendet und liefert ihren Text aus dem Cache.
+        :param key: Manifest-Schlüssel
+        :return: Zwischengespeicherter Text
+        """
+        with self._lock:
+            self.status[key] = WIEDERVERWENDET
+        return self.cached_text(key)
+
+    # === PDFs ===
+    def pdf_unveraendert(self, key: str, path: str) -> bool:
+        """
+        Prüft über Größe, mtime und notfalls Inhalts-Hash, ob ein PDF unverändert ist.
+        :param key: Manifest-Schlüssel
+        :param path: Pfad zur PDF-Datei
+        :return: True, wenn der zwischengespeicherte Text wiederverwendet werden kann
+        """
+        alt = self._cache_gueltig(key, path)
+        if alt is None or not os.path.exists(path):
+            return False
+        stat = os.stat(path)
+        if alt.get("size") == stat.st_size and alt.get("mtime_ns") == stat.st_mtime_ns:
+            return True
+        # Nur bei geänderter Größe/mtime den Inhalt hashen (z.B. nach erneutem Kopieren)
+        if alt.get("size") == stat.st_size and alt.get("sha256") == datei_hash(path):
+            with self._lock:
+                alt["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def record_pdf(self, key: str, path: str, text: str) -> None:
+        """
+        Speichert Fingerprint und Text eines frisch extrahierten PDFs.
+        :param key: Manifest-Schlüssel
+        :param path: Pfad zur PDF-Datei
+        :param text: Extrahierter Text
+        """
+        stat = os.stat(path)
+        self._speichere(key, {
+            "quelle": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": datei_hash(path),
+        }, text)
+
+    # === Webquellen ===
+    def conditional_headers(self, key: str, url: str) -> Dict[str, str]:
+        """
+        Liefert If-None-Match/If-Modified-Since-Header für eine bereits geladene URL.
+        :param key: Manifest-Schlüssel
+        :param url: Ziel-URL
+        :return: Header-Dict (leer, wenn nichts zwischengespeichert ist)
+        """
+        alt = self._cache_gueltig(key, url)
+        headers = {}
+        if alt is not None:
+            if alt.get("etag"):
+                headers["If-None-Match"] = alt["etag"]
+            if alt.get("last_modified"):
+                headers["If-Modified-Since"] = alt["last_modified"]
+        return headers
+
+    def record_url(self, key: str, url: str, headers: Any, text: str) -> None:
+        """
+        Speichert ETag, Last-Modified und Text einer geladenen URL.
+        :param key: Manifest-Schlüssel
+        :param url: Ziel-URL
+        :param headers: Antwort-Header
+        :param text: Extrahierter Text
+        """
+        self._speichere(key, {
+            "quelle": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }, text)
+
+    # === Abschluss ===
+    def save(self, aktive: Optional[Iterable[str]] = None) -> None:
+        """
+        Schreibt das Manifest atomar.
+        :param aktive: Optional alle Schlüssel der aktuellen Quelllisten; andere Einträge werden entfernt
+        """
+        aktive = set(aktive) if aktive is not None else set(self.eintraege)
+        for key in [k for k in self.eintraege if k not in aktive]:
+            del self.eintraege[key]
+            if os.path.exists(self._text_pfad(key)):
+                os.remove(self._text_pfad(key))
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.eintraege, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def zusammenfassung(self) -> Dict[str, int]:
+        """
+        Zählt die Quellen dieses Laufs nach Status.
+        :return: Dict mit den Schlüsseln new, changed, reused
+        """
+        counts = {NEU: 0, GEAENDERT: 0, WIEDERVERWENDET: 0}
+        for status in self.status.values():
+            counts[status] += 1
+        return counts
@@ -0,0 +1,212 @@
+"""
+Lexical BM25 index over the FMGPT chunk texts.
+Catches exact terms (role, attribute and training module names) that the vector search misses.
+Postings are stored compactly (CSR layout: doc ids as uint32, term frequencies as uint16) in one .npz file.
+"""
+
+import os
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./output/lexical/bm25.npz")
+BM25_K1 = 1.2
+BM25_B = 0.75
+FILTER_FELDER = ("sprache", "typ")  # Metadaten, nach denen gefiltert werden kann
+
+STOPWOERTER = {
+    # Deutsch
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer", "eines",
+    "und", "oder", "aber", "ist", "sind", "war", "wird", "werden", "wie", "was", "wer", "wo",
+    "mit", "von", "für", "auf", "aus", "bei", "nach", "zu", "zum", "zur", "im", "in", "an", "am",
+    "ich", "du", "er", "sie", "es", "wir", "ihr", "man", "mein", "dein", "sein", "nicht", "auch",
+    "noch", "nur", "so", "dass", "wenn", "als", "um", "welche", "welcher", "welches", "kann",
+    # Englisch
+    "the", "a", "an", "and", "or", "but", "is", "are", "was", "be", "been", "of", "to", "in",
+    "on", "for", "with", "at", "by", "from", "as", "it", "this", "that", "how", "what", "which",
+    "who", "do", "does", "can", "i", "you", "my", "your", "not", "if", "into",
+}
+_UMLAUTE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_ENDUNGEN = ("ungen", "ung", "ern", "en", "er", "es", "ing", "ed", "e", "s", "n")
+
+
+def stamm(token: str) -> str:
+    """Leichtes Stemming für Deutsch und Englisch: bis zu zwei Endungen abschneiden, Stamm mind. 4 Zeichen."""
+    for _ in range(2):
+        for endung in _ENDUNGEN:
+            if token.endswith(endung) and len(token) - len(endung) >= 4:
+                token = token[: -len(endung)]
+                break
+    return token
+
+
+def tokenisiere(text: str) -> List[str]:
+    """
+    Zerlegt Text in normalisierte Terme (Kleinschreibung, Umlaute ausgeschrieben, Stoppwörter entfernt).
+    :param text: Text
+    :return: Liste der Terme
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return [
+        stamm(t.translate(_UMLAUTE))
+        for t in re.findall(r"[^\W_]+", text)
+        if len(t) > 1 and t not in STOPWOERTER
+    ]
+
+
+def datei_fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class LexicalIndex:
+    """BM25-Index im Speicher; Aufbau mit bauen(), Persistenz mit speichern()/laden()."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        terme: List[str],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        felder: Dict[str, np.ndarray],
+        fingerprint: str = "",
+    ) -> None:
+        self.ids = ids
+        self.vocab = {t: i for i, t in enumerate(terme)}
+        self.terme = terme
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.felder = felder
+        self.fingerprint = fingerprint
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    @classmethod
+    def bauen(cls, eintraege: Iterable[Dict[str, Any]], fingerprint: str = "") -> "LexicalIndex":
+        """
+        Baut den Index aus Chunk-Einträgen (chunk_id, text, sprache, typ); doppelte IDs zählen einmal.
+        :param eintraege: Chunk-Einträge
+        :param fingerprint: Kennung der Quelldatei
+        :return: LexicalIndex
+        """
+        ids, doc_len = [], []
+        felder = {f: [] for f in FILTER_FELDER}
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        gesehen = set()
+        for e in eintraege:
+            if e["chunk_id"] in gesehen:
+                continue
+            gesehen.add(e["chunk_id"])
+            doc = len(ids)
+            ids.append(e["chunk_id"])
+            for f in FILTER_FELDER:
+                felder[f].append(str(e.get(f, "")))
+            terme = tokenisiere(e["text"])
+            doc_len.append(len(terme))
+            for term, tf in Counter(terme).items():
+                postings.setdefault(term, []).append((doc, min(tf, 65535)))
+
+        terme = sorted(postings)
+        offsets = np.zeros(len(terme) + 1, dtype=np.int64)
+        for i, term in enumerate(terme):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        docs = np.empty(offsets[-1], dtype=np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terme):
+            paare = np.array(postings[term], dtype=np.int64)
+            docs[offsets[i]:offsets[i + 1]] = paare[:, 0]
+            tfs[offsets[i]:offsets[i + 1]] = paare[:, 1]
+        return cls(
+            ids, terme, offsets, docs, tfs, np.array(doc_len, dtype=np.uint32),
+            {f: np.array(v) for f, v in felder.items()}, fingerprint,
+        )
+
+    def speichern(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            ids=np.array(self.ids), terme=np.array(self.terme), offsets=self.offsets, docs=self.docs,
+            tfs=self.tfs, doc_len=self.doc_len, fingerprint=np.array(self.fingerprint),
+            **{f"feld_{f}": v for f, v in self.felder.items()},
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def laden(cls, path: str) -> "LexicalIndex":
+        with np.load(path, allow_pickle=False) as z:
+            felder = {k[len("feld_"):]: z[k] for k in z.files if k.startswith("feld_")}
+            return cls(
+                z["ids"].tolist(), z["terme"].tolist(), z["offsets"], z["docs"], z["tfs"],
+                z["doc_len"], felder, str(z["fingerprint"]),
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def suche(self, frage: str, k: int = 20, where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """
+        BM25-Suche.
+        :param frage: Suchanfrage
+        :param k: Anzahl Treffer
+        :param where: Optionaler Filter auf FILTER_FELDER, z. B. {"sprache": "de"} oder {"sprache": {"$in": ["de", "en"]}}
+        :return: Liste (chunk_id, Score), absteigend
+        """
+        n = len(self.ids)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenisiere(frage)):
+            i = self.vocab.get(term)
+            if i is None:
+                continue
+            docs = self.docs[self.offsets[i]:self.offsets[i + 1]]
+            tf = self.tfs[self.offsets[i]:self.offsets[i + 1]].astype(np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / max(self.avgdl, 1e-9))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        for feld, wert in (where or {}).items():
+            if feld in self.felder:
+                werte = [str(w) for w in wert["$in"]] if isinstance(wert, dict) else [str(wert)]
+                scores[~np.isin(self.felder[feld], werte)] = 0
+        kandidaten = np.flatnonzero(scores)
+        if len(kandidaten) > k:
+            kandidaten = kandidaten[np.argpartition(-scores[kandidaten], k)[:k]]
+        kandidaten = kandidaten[np.argsort(-scores[kandidaten], kind="stable")]
+        return [(self.ids[j], float(scores[j])) for j in kandidaten]
+
+
+def lade_oder_baue(chunk_file: str, path: str = LEXICAL_INDEX_PATH) -> LexicalIndex:
+    """
+    Lädt den gespeicherten Index oder baut ihn neu, wenn sich die Chunk-Datei geändert hat.
+    :param chunk_file: Chunk-Datei (JSONL)
+    :param path: Pfad der .npz-Datei
+    :return: LexicalIndex
+    """
+    fingerprint = datei_fingerprint(chunk_file)
+    if os.path.exists(path):
+        index = LexicalIndex.laden(path)
+        if index.fingerprint == fingerprint:
+            return index
+    with open(chunk_file, "r", encoding="utf-8") as f:
+        index = LexicalIndex.bauen((json.loads(line) for line in f if line.strip()), fingerprint)
+    index.speichern(path)
+    return index
+
+
+# === Einstiegspunkt: Index bauen ===
+if __name__ == "__main__":
+    from utils import aktuelle_chunk_datei
+
+    chunk_file = aktuelle_chunk_datei("./output/chunks")
+    index = lade_oder_baue(chunk_file)
+    groesse = os.path.getsize(LEXICAL_INDEX_PATH) / (1024 * 1024)
+    print(f"BM25-Index: {len(index)} Chunks, {len(index.terme)} Terme, {groesse:.1f} MB unter {LEXICAL_INDEX_PATH}")
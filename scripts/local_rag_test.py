@@ -2,37 +2,30 @@
 Local RAG logic for FMGPT without GUI. Used for testing and development.
 """
 
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-import numpy as np
-import requests
+import os
+from rag_service import RetrievalService, sprach_filter
+from prompt_builder import OLLAMA_NUM_CTX, TokenZaehler, Verlaufszusammenfassung, baue_prompt
+from ollama_client import standard_client
 
 # === Konfiguration ===
 CHROMA_PATH = "./output/chroma_db"
 COLLECTION_NAME = "chunks_semantic"  # Neue Collection mit semantischen Chunks
 EMBED_MODEL = "all-MiniLM-L6-v2"
 OLLAMA_MODEL = "mistral"
-OLLAMA_URL = "http://localhost:11434/api/generate"
-SPRACHE_FILTER = "de"  # Deutsch bevorzugt
+SPRACHE_FILTER = os.getenv("SPRACHE_FILTER", "de")  # Deutsch bevorzugt; mehrere Sprachen z. B. "de,en"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma" oder "numpy"
 
-# === Chroma-Client starten
-print("🔗 Verbinde mit Chroma...")
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_collection(name=COLLECTION_NAME)
-embed_fn = SentenceTransformerEmbeddingFunction(model_name=EMBED_MODEL)
+# === Vektor-Store öffnen
+print(f"🔗 Öffne Vektor-Store ({VECTOR_BACKEND})...")
+retrieval = RetrievalService(CHROMA_PATH, COLLECTION_NAME, EMBED_MODEL, vector_backend=VECTOR_BACKEND)
 
 # === Eingabe vom Nutzer
 frage = input("Deine Frage: ")
-frage_embedding = embed_fn([frage])[0]  # einzelne Liste, dann [0] für Vektor
 
 # === Abfrage der relevantesten Chunks
 print("🔍 Suche nach passenden Chunks...")
 try:
-    results = collection.query(
-        query_embeddings=[frage_embedding],
-        n_results=5,
-        where={"sprache": SPRACHE_FILTER}
-    )
+    results = retrieval.query(frage, n_results=5, where=sprach_filter(SPRACHE_FILTER))
 except Exception as e:
     print(f" Fehler bei der Abfrage: {e}")
     exit(1)
@@ -46,32 +39,36 @@ if not relevante_texte:
     print(" Keine relevanten Chunks gefunden.")
     exit(0)
 
-# === Prompt für Ollama aufbauen
-prompt = (
-    "Du bist ein hilfreicher Fußball-Experte für Football Manager.\n"
-    "Nutze den folgenden Kontext, um die Frage zu beantworten.\n"
-    "Wenn der Kontext nicht ausreicht, gib dein Bestes anhand deines Wissens.\n\n"
-    "Beziehe deine Antworten wenn möglich auf den FM 24.\n\n"
-    "KONTEXT:\n"
-    + "\n---\n".join(relevante_texte)
-    + f"\n\nFRAGE: {frage}\n\nANTWORT:"
-)
+# === Prompt für Ollama aufbauen (im Token-Budget)
+aufbau = baue_prompt(frage, relevante_texte, [], Verlaufszusammenfassung(), TokenZaehler())
+print(f" Prompt: {aufbau.tokens['gesamt']} Tokens, {len(aufbau.chunks)} Chunks")
+nachrichten = aufbau.nachrichten
 
-# === Anfrage an Ollama senden
-def ollama_chat(prompt, model=OLLAMA_MODEL):
-    response = requests.post(
-        OLLAMA_URL,
-        json={
+# === Anfrage an Ollama senden (Tokens werden direkt ausgegeben, Ctrl+C bricht ab)
+def ollama_chat(nachrichten, model=OLLAMA_MODEL):
+    client = standard_client()  # OLLAMA_URL aus der Umgebung, Chat-Endpunkt daraus abgeleitet
+    stream = client.stream(
+        {
             "model": model,
-            "prompt": prompt,
-            "stream": False
-        }
+            "messages": nachrichten,
+            "options": {"num_ctx": OLLAMA_NUM_CTX}
+        },
+        url=client.endpunkt("chat")
     )
-    return response.json()["response"]
+    try:
+        for teil in stream:
+            print(teil, end="", flush=True)
+    except KeyboardInterrupt:
+        stream.schliessen()
+        print("\n [abgebrochen]")
+    return stream
 
 print(" Frage an Ollama wird verarbeitet...")
-antwort = ollama_chat(prompt)
-
-# === Ausgabe der Antwort
 print("\n Antwort von Mistral:\n")
-print(antwort)
+stream = ollama_chat(nachrichten)
+
+# === Zeitmessung
+if stream.ttft_ms is not None:
+    zeiten = stream.zusammenfassung()
+    print(f"\n\n Erstes Token nach {stream.ttft_ms:.0f} ms, gesamt {stream.gesamt_ms / 1000:.1f} s")
+    print(f" Prefill: {zeiten['prefill_ms'] or 0:.0f} ms für {zeiten['prompt_tokens']} Prompt-Tokens, Laden: {zeiten['load_ms'] or 0:.0f} ms")
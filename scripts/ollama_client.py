@@ -0,0 +1,326 @@
+"""
+Ollama access for FMGPT.
+One pooled client per process: keep-alive connections, explicit connect/read timeouts, retries with backoff
+for failures before any output, and a cap on concurrent generations. Streams generations as NDJSON
+(one JSON object per line) so the UI can render tokens as they arrive, and records time-to-first-token
+and total generation time.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))    # max. Pause zwischen zwei Antwort-Bytes
+OLLAMA_MAX_INFLIGHT = int(os.getenv("OLLAMA_MAX_INFLIGHT", "2"))        # gleichzeitige Generierungen
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))   # max. Wartezeit auf einen freien Platz
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+OLLAMA_BACKOFF_S = float(os.getenv("OLLAMA_BACKOFF_S", "0.5"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")               # Modell (und KV-Cache) so lange geladen halten
+WIEDERHOLBARE_STATUS = {429, 502, 503, 504}
+METRIK_FELDER = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration", "total_duration")
+
+
+class OllamaFehler(RuntimeError):
+    """Fehlermeldung von Ollama (auch mitten im Stream)."""
+
+
+class OllamaUeberlastet(OllamaFehler):
+    """Kein freier Generierungsplatz innerhalb der Wartezeit."""
+
+
+class OllamaClient:
+    """
+    Gemeinsamer Ollama-Client. Wiederholt werden nur Fehler, bevor Ollama etwas geliefert hat
+    (Verbindungsfehler, 429/502/503/504); Lese-Timeouts nicht, weil die Generierung dann schon lief.
+    Sync- und Async-API teilen Pool und Begrenzung.
+    """
+
+    def __init__(
+        self,
+        url: str = OLLAMA_URL,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        max_inflight: int = OLLAMA_MAX_INFLIGHT,
+        queue_timeout: float = OLLAMA_QUEUE_TIMEOUT,
+        retries: int = OLLAMA_RETRIES,
+        backoff_s: float = OLLAMA_BACKOFF_S,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        keep_alive: str = OLLAMA_KEEP_ALIVE,
+    ) -> None:
+        """
+        :param url: Generate-Endpunkt, z. B. http://localhost:11434/api/generate (Basis für /api/chat usw.)
+        :param connect_timeout: Timeout für den Verbindungsaufbau (s)
+        :param read_timeout: Timeout zwischen zwei empfangenen Bytes (s)
+        :param max_inflight: Maximale Anzahl gleichzeitiger Anfragen
+        :param queue_timeout: Maximale Wartezeit auf einen freien Platz (s)
+        :param retries: Wiederholungen nach wiederholbaren Fehlern
+        :param backoff_s: Basis des exponentiellen Backoffs (s)
+        :param pool_size: Keep-Alive-Verbindungen im Pool
+        :param keep_alive: Standard für Ollamas keep_alive (wie lange das Modell nach einer Anfrage geladen bleibt)
+        """
+        self.url = url
+        self.basis = url.split("/api/")[0].rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._plaetze = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self.stats = {"anfragen": 0, "wiederholungen": 0, "fehler": 0, "ueberlastet": 0, "aktiv": 0, "wartend": 0}
+
+    def endpunkt(self, name: str) -> str:
+        """URL eines API-Endpunkts, z. B. endpunkt("chat")."""
+        return f"{self.basis}/api/{name}"
+
+    def _zaehle(self, feld: str, delta: int = 1) -> None:
+        with self._lock:
+            self.stats[feld] += delta
+
+    @contextlib.contextmanager
+    def platz(self) -> Iterator[None]:
+        """Belegt einen Generierungsplatz; OllamaUeberlastet, wenn keiner frei wird."""
+        self._zaehle("wartend")
+        frei = self._plaetze.acquire(timeout=self.queue_timeout)
+        self._zaehle("wartend", -1)
+        if not frei:
+            self._zaehle("ueberlastet")
+            raise OllamaUeberlastet(f"Kein freier Platz nach {self.queue_timeout:.0f} s")
+        self._zaehle("aktiv")
+        try:
+            yield
+        finally:
+            self._zaehle("aktiv", -1)
+            self._plaetze.release()
+
+    def post(self, url: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """
+        POST mit Timeouts und Wiederholung wiederholbarer Fehler (ohne Platzbelegung).
+        :param url: Endpunkt
+        :param payload: Request-Body
+        :param stream: Antwort streamen
+        :return: Response mit Status < 400
+        """
+        self._zaehle("anfragen")
+        for versuch in range(self.retries + 1):
+            letzter_versuch = versuch == self.retries
+            try:
+                response = self.session.post(url, json=payload, stream=stream, timeout=self.timeout)
+            except requests.ConnectionError as e:  # inkl. ConnectTimeout; ReadTimeout ist keine ConnectionError
+                if letzter_versuch:
+                    self._zaehle("fehler")
+                    raise OllamaFehler(f"Ollama nicht erreichbar: {e}") from e
+            else:
+                if response.status_code < 400:
+                    return response
+                if letzter_versuch or response.status_code not in WIEDERHOLBARE_STATUS:
+                    self._zaehle("fehler")
+                    text = _fehlertext(response)
+                    response.close()
+                    raise OllamaFehler(text)
+                response.close()
+            self._zaehle("wiederholungen")
+            time.sleep(self.backoff_s * 2 ** versuch * (0.5 + random.random() / 2))
+        raise AssertionError("unerreichbar")
+
+    def generate(self, payload: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generierung ohne Streaming.
+        :param payload: Request-Body für /api/generate (bzw. url)
+        :param url: Optional anderer Endpunkt, z. B. endpunkt("chat")
+        :return: Antwort-JSON
+        """
+        with self.platz():
+            try:
+                response = self.post(url or self.url, {"keep_alive": self.keep_alive, **payload, "stream": False})
+            except requests.Timeout as e:
+                self._zaehle("fehler")
+                raise OllamaFehler(f"Zeitüberschreitung: {e}") from e
+            with response:
+                return response.json()
+
+    def stream(self, payload: Dict[str, Any], url: Optional[str] = None, abbruch: Optional[threading.Event] = None) -> "OllamaStream":
+        """Streamende Generierung; der Platz bleibt bis zum Ende des Streams belegt."""
+        return OllamaStream(url or self.url, {"keep_alive": self.keep_alive, **payload}, abbruch=abbruch, client=self)
+
+    def vorladen(self, model: str, options: Optional[Dict[str, Any]] = None, system: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """
+        Lädt das Modell beim Start. Mit system wird zusätzlich der Systemtext einmal verarbeitet, sodass
+        die erste Anfrage dessen KV-Cache wiederverwenden kann. options (v. a. num_ctx) müssen denen der
+        späteren Anfragen entsprechen, sonst lädt Ollama das Modell neu.
+        :param model: Modellname
+        :param options: Ollama-Optionen der späteren Anfragen
+        :param system: Optionaler Systemtext
+        :return: Dauer gesamt, Ladezeit und Prefill in ms
+        """
+        start = time.perf_counter()
+        nachrichten = [{"role": "system", "content": system}] if system else []
+        daten = self.generate(
+            {"model": model, "messages": nachrichten, "options": {**(options or {}), "num_predict": 1}},
+            url=self.endpunkt("chat"),
+        )
+        return {
+            "gesamt_ms": (time.perf_counter() - start) * 1000,
+            "load_ms": _ms(daten.get("load_duration")),
+            "prefill_ms": _ms(daten.get("prompt_eval_duration")),
+        }
+
+    async def agenerate(self, payload: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+        """Async-Variante von generate (läuft in einem Worker-Thread)."""
+        return await asyncio.to_thread(self.generate, payload, url)
+
+    async def astream(self, payload: Dict[str, Any], url: Optional[str] = None) -> AsyncIterator[str]:
+        """Async-Variante von stream: liefert die Tokens, jedes Weiterlesen läuft in einem Worker-Thread."""
+        stream = self.stream(payload, url)
+        tokens = iter(stream)
+        try:
+            while True:
+                teil = await asyncio.to_thread(next, tokens, None)
+                if teil is None:
+                    break
+                yield teil
+        finally:
+            await asyncio.to_thread(stream.schliessen)
+
+
+_standard_client: Optional[OllamaClient] = None
+
+
+def standard_client() -> OllamaClient:
+    """Gemeinsamer Client aus den Umgebungsvariablen, einmal pro Prozess angelegt."""
+    global _standard_client
+    if _standard_client is None:
+        _standard_client = OllamaClient()
+    return _standard_client
+
+
+class OllamaStream:
+    """
+    Iterierbarer Token-Stream einer Generierung (/api/generate oder /api/chat).
+    Nach dem Durchlauf stehen Text, TTFT, Gesamtdauer und die Ollama-Metriken bereit. Wird der Stream
+    vorzeitig verlassen (Abbruch, Rerun, Exception beim Konsumenten), schließt schliessen() die
+    Verbindung, woraufhin Ollama die Generierung beendet.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        abbruch: Optional[threading.Event] = None,
+        client: Optional[OllamaClient] = None,
+    ) -> None:
+        """
+        :param url: Ollama-Endpunkt, z. B. http://localhost:11434/api/generate
+        :param payload: Request-Body (stream wird auf True gesetzt)
+        :param abbruch: Optionales Event; ist es gesetzt, endet der Stream nach dem nächsten Token
+        :param client: Client für Pool, Timeouts und Begrenzung (Standard: standard_client())
+        """
+        self.url = url
+        self.payload = {**payload, "stream": True}
+        self.abbruch = abbruch
+        self.client = client if client is not None else standard_client()
+        self.teile: List[str] = []
+        self.ttft_ms: Optional[float] = None
+        self.gesamt_ms: Optional[float] = None
+        self.metriken: Dict[str, Any] = {}
+        self.fertig = False
+        self.abgebrochen = False
+        self.fehler: Optional[str] = None
+        self._response: Optional[requests.Response] = None
+        self._lauf: Optional[Iterator[str]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.teile)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._lauf is None:
+            self._lauf = self._streame()
+        return self._lauf
+
+    def _streame(self) -> Iterator[str]:
+        start = time.perf_counter()
+        try:
+            with self.client.platz():
+                yield from self._lies(start)
+        except requests.RequestException as e:  # z. B. Lese-Timeout mitten im Stream
+            self.fehler = str(e)
+            raise OllamaFehler(f"Stream unterbrochen: {e}") from e
+        except Exception as e:
+            self.fehler = str(e)
+            raise
+        finally:
+            if not self.fertig and self.fehler is None:
+                self.abgebrochen = True  # vom Konsumenten verlassen (Rerun, Stopp, Ctrl+C)
+            self.gesamt_ms = (time.perf_counter() - start) * 1000
+            if self._response is not None:
+                self._response.close()
+                self._response = None
+
+    def _lies(self, start: float) -> Iterator[str]:
+        self._response = self.client.post(self.url, self.payload, stream=True)
+        for zeile in self._response.iter_lines():
+            if not zeile:
+                continue
+            daten = json.loads(zeile)
+            if "error" in daten:
+                raise OllamaFehler(daten["error"])
+            teil = daten.get("response") or (daten.get("message") or {}).get("content") or ""
+            if teil:
+                if self.ttft_ms is None:
+                    self.ttft_ms = (time.perf_counter() - start) * 1000
+                self.teile.append(teil)
+                yield teil
+            if daten.get("done"):
+                self.fertig = True
+                self.metriken = {k: daten[k] for k in METRIK_FELDER if k in daten}
+                return
+            if self.abbruch is not None and self.abbruch.is_set():
+                self.abgebrochen = True
+                return
+        raise OllamaFehler("Stream endete ohne Abschluss (Verbindung getrennt?)")
+
+    def schliessen(self) -> None:
+        """Beendet den Stream (idempotent); die Verbindung wird geschlossen, Ollama bricht die Generierung ab."""
+        if self._lauf is not None:
+            self._lauf.close()
+
+    def zusammenfassung(self) -> Dict[str, Any]:
+        """TTFT, Gesamtdauer, Status und Token-Zahlen für Logging und UI."""
+        return {
+            "ttft_ms": self.ttft_ms,
+            "gesamt_ms": self.gesamt_ms,
+            "fertig": self.fertig,
+            "abgebrochen": self.abgebrochen,
+            "fehler": self.fehler,
+            "prompt_tokens": self.metriken.get("prompt_eval_count"),  # neu verarbeitet (ohne wiederverwendeten Präfix)
+            "prefill_ms": _ms(self.metriken.get("prompt_eval_duration")),
+            "load_ms": _ms(self.metriken.get("load_duration")),
+            "tokens": self.metriken.get("eval_count"),
+        }
+
+
+def _ms(nanosekunden: Optional[int]) -> Optional[float]:
+    return nanosekunden / 1e6 if nanosekunden is not None else None
+
+
+def _fehlertext(response: requests.Response) -> str:
+    try:
+        return f"HTTP {response.status_code}: {response.json().get('error', response.text)}"
+    except ValueError:
+        return f"HTTP {response.status_code}: {response.text[:200]}"
@@ -0,0 +1,184 @@
+"""
+Quantized ONNX embedding backend for FMGPT.
+Exports the configured SentenceTransformer model to int8 ONNX and runs it on CPU with onnxruntime,
+without importing torch at query time.
+
+Vectors match the PyTorch model within ONNX_TOLERANCE (cosine similarity >= 0.99 per text),
+so an index built with the PyTorch backend can be queried with this backend.
+"""
+
+import importlib.util
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+ONNX_TOLERANCE = 0.99
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model_int8.onnx"
+
+
+def standard_onnx_dir(model_name: str) -> str:
+    return os.getenv("ONNX_MODEL_DIR", os.path.join("./output/onnx", model_name.replace("/", "__")))
+
+
+def pruefe_pakete(export: bool = False) -> None:
+    """
+    Prüft die optionalen Abhängigkeiten des ONNX-Backends (requirements-onnx.txt).
+    :param export: Zusätzlich die Pakete für den Export prüfen (onnx für die Quantisierung)
+    :raises ImportError: mit Installationshinweis, wenn Pakete fehlen
+    """
+    pakete = ["onnxruntime", "tokenizers"] + (["onnx"] if export else [])
+    fehlend = [p for p in pakete if importlib.util.find_spec(p) is None]
+    if fehlend:
+        raise ImportError(
+            f"ONNX-Backend benötigt {', '.join(fehlend)}: pip install -r requirements-onnx.txt "
+            "(oder EMBED_BACKEND=torch setzen)"
+        )
+
+
+class OnnxEmbedder:
+    """
+    Bietet encode() wie SentenceTransformer, rechnet aber mit onnxruntime (Mean-/CLS-Pooling,
+    optional L2-Normalisierung gemäß onnx_config.json).
+    """
+
+    def __init__(self, session: Any, tokenizer: Any, config: Dict[str, Any]) -> None:
+        """
+        :param session: onnxruntime.InferenceSession
+        :param tokenizer: tokenizers.Tokenizer mit aktivem Padding/Truncation
+        :param config: Inhalt von onnx_config.json
+        """
+        self.session = session
+        self.tokenizer = tokenizer
+        self.config = config
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    @classmethod
+    def laden(cls, model_dir: str, threads: Optional[int] = None) -> "OnnxEmbedder":
+        """
+        Lädt ein mit exportiere_onnx erzeugtes Modellverzeichnis.
+        :param model_dir: Verzeichnis mit model_int8.onnx, tokenizer.json und onnx_config.json
+        :param threads: Optionale Anzahl Intra-Op-Threads
+        :return: OnnxEmbedder
+        """
+        pruefe_pakete()
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        optionen = ort.SessionOptions()
+        if threads:
+            optionen.intra_op_num_threads = threads
+        session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE), optionen, providers=["CPUExecutionProvider"]
+        )
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        tokenizer.enable_padding(pad_id=config.get("pad_token_id", 0), pad_token=config.get("pad_token", "[PAD]"))
+        return cls(session, tokenizer, config)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, convert_to_numpy: bool = True, **_: Any) -> np.ndarray:
+        """
+        Berechnet Embeddings für mehrere Texte.
+        :param texts: Texte
+        :param batch_size: Texte pro Inferenzaufruf
+        :return: Array (len(texts), dim)
+        """
+        ergebnisse = []
+        for i in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[i:i + batch_size]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            if self.config.get("pooling", "mean") == "cls":
+                pooled = hidden[:, 0]
+            else:
+                maske = feeds["attention_mask"][..., None].astype(hidden.dtype)
+                pooled = (hidden * maske).sum(axis=1) / np.clip(maske.sum(axis=1), 1e-9, None)
+            if self.config.get("normalize", False):
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            ergebnisse.append(pooled.astype(np.float32))
+        if not ergebnisse:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        return np.vstack(ergebnisse)
+
+
+def exportiere_onnx(model_name: str, model_dir: str, beispiele: Optional[List[str]] = None) -> float:
+    """
+    Exportiert ein SentenceTransformer-Modell nach ONNX und quantisiert es dynamisch auf int8.
+    Benötigt torch und sentence-transformers (nur beim Export, nicht zur Laufzeit).
+    :param model_name: Name des SentenceTransformer-Modells
+    :param model_dir: Zielverzeichnis
+    :param beispiele: Texte für den Toleranz-Check
+    :return: Minimale Cosinus-Ähnlichkeit zwischen PyTorch- und ONNX-Vektoren
+    """
+    pruefe_pakete(export=True)
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(model_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    pooling = next((m for m in model if type(m).__name__ == "Pooling"), None)
+    config = {
+        "model_name": model_name,
+        "max_seq_length": model.max_seq_length,
+        "dim": model.get_sentence_embedding_dimension(),
+        "pooling": "cls" if pooling is not None and pooling.pooling_mode_cls_token else "mean",
+        "normalize": any(type(m).__name__ == "Normalize" for m in model),
+        "pad_token_id": model.tokenizer.pad_token_id or 0,
+        "pad_token": model.tokenizer.pad_token or "[PAD]",
+    }
+
+    dummy = model.tokenizer(["Wie funktioniert Pressing?"], return_tensors="pt")
+    namen = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    fp32_pfad = os.path.join(model_dir, "model_fp32.onnx")
+    achsen = {n: {0: "batch", 1: "seq"} for n in namen + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(dummy[n] for n in namen),
+            fp32_pfad,
+            input_names=namen,
+            output_names=["last_hidden_state"],
+            dynamic_axes=achsen,
+            opset_version=17,
+        )
+    quantize_dynamic(fp32_pfad, os.path.join(model_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_pfad)
+    model.tokenizer.save_pretrained(model_dir)
+    with open(os.path.join(model_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    beispiele = beispiele or [
+        "Wie funktioniert Pressing im Football Manager?",
+        "Welche Trainingseinheiten verbessern die Ausdauer?",
+        "What does the deep-lying playmaker role do?",
+    ]
+    referenz = model.encode(beispiele, convert_to_numpy=True, normalize_embeddings=True)
+    onnx_vecs = OnnxEmbedder.laden(model_dir).encode(beispiele)
+    onnx_vecs = onnx_vecs / np.linalg.norm(onnx_vecs, axis=1, keepdims=True)
+    return float(np.min(np.sum(referenz * onnx_vecs, axis=1)))
+
+
+# === Einstiegspunkt: Export des konfigurierten Modells ===
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    model_name = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+    ziel = standard_onnx_dir(model_name)
+    print(f"Exportiere {model_name} nach {ziel} (int8)...")
+    min_cos = exportiere_onnx(model_name, ziel)
+    status = "OK" if min_cos >= ONNX_TOLERANCE else "WARNUNG: unter Toleranz"
+    print(f"Minimale Cosinus-Ähnlichkeit zu PyTorch: {min_cos:.4f} (Toleranz {ONNX_TOLERANCE}) – {status}")
@@ -9,12 +9,25 @@ import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 import json
+from web_fetcher import WebFetcher
+from pdf_extraction import iter_pdf_texts
+from ingest_manifest import IngestManifest, NEU, GEAENDERT, WIEDERVERWENDET
 
 # === Konfiguration ===
 PDF_DIR = "./data/pdf_data"
 OUTPUT_DIR = "./output"
 PDF_SOURCE_FILE = "./metadata/sources.csv"
 WEB_SOURCE_FILE = "./metadata/web_sources.csv"
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))  # Prozesse für PDF-Extraktion
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))         # große PDFs seitenweise aufteilen
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "8"))            # parallele Downloads
+WEB_PER_HOST = int(os.getenv("WEB_PER_HOST", "2"))          # gleichzeitige Anfragen pro Host
+WEB_MIN_INTERVAL = float(os.getenv("WEB_MIN_INTERVAL", "0.5"))  # Sekunden zwischen Anfragen pro Host
+WEB_RETRIES = int(os.getenv("WEB_RETRIES", "3"))
+WEB_TIMEOUT = 15
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "ingest_manifest.json")
+INGEST_CACHE_DIR = os.path.join(OUTPUT_DIR, "ingest_cache")
+INGEST_FORCE = os.getenv("INGEST_FORCE", "0") == "1"   # 1 = alle Quellen neu einlesen
 
 
 os.makedirs(PDF_DIR, exist_ok=True)
@@ -48,59 +61,100 @@ def extract_text_from_pdf(path):
         return f"Error reading PDF: {e}"
 
 # === Webseiten-Text extrahieren ===
-def extract_text_from_url(url):
+def extract_text_from_url(url, fetcher=None, manifest=None, key=None):
     try:
-        response = requests.get(url, timeout=15)
+        # Bedingter Request: bei 304 wird der zwischengespeicherte Text wiederverwendet
+        headers = manifest.conditional_headers(key, url) if manifest is not None else None
+        if fetcher is not None:
+            response = fetcher.get(url, headers=headers)
+        else:
+            response = requests.get(url, headers=headers, timeout=WEB_TIMEOUT)
+        if manifest is not None and response.status_code == 304:
+            return manifest.reuse(key)
         soup = BeautifulSoup(response.content, "html.parser")
-        return soup.get_text(separator="\n", strip=True)
+        text = soup.get_text(separator="\n", strip=True)
+        if manifest is not None and response.ok:
+            manifest.record_url(key, url, response.headers, text)
+        return text
     except Exception as e:
         return f"Error fetching URL: {e}"
 
-def main():
-    results = []
-
-    # === PDFs aus sources.csv ===
-    pdf_sources = read_csv(PDF_SOURCE_FILE)
-    print(" Verarbeite PDF-Quellen (sources.csv):")
-    for entry in tqdm(pdf_sources):
-        typ = entry["typ"].strip().lower()
-        if typ != "pdf":
+# === PDFs inkrementell: unveränderte aus dem Cache, übrige parallel extrahieren ===
+def iter_pdf_texts_incremental(keys, paths, manifest):
+    neu = [(k, p) for k, p in zip(keys, paths) if not manifest.pdf_unveraendert(k, p)]
+    neu_keys = {k for k, _ in neu}
+    extrahiert = iter_pdf_texts([p for _, p in neu], workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK)
+    for key, path in zip(keys, paths):
+        if key not in neu_keys:
+            yield manifest.reuse(key)
             continue
+        text = next(extrahiert)
+        if not text.startswith("Error reading PDF"):
+            manifest.record_pdf(key, path, text)
+        yield text
+
+def schreibe_eintrag(f, eintrag):
+    json.dump(eintrag, f, ensure_ascii=False)
+    f.write("\n")
 
-        filename = os.path.basename(entry["url/filename"].strip().replace('"', ''))
-        path = os.path.join(PDF_DIR, filename)
-
-        eintrag = {
-            "id": entry["id"],
-            "quelle": entry["quelle"],
-            "typ": typ,
-            "thema": entry["thema"],
-            "sprache": entry["sprache"],
-            "text": extract_text_from_pdf(path)
-        }
-        results.append(eintrag)
-
-    # === Webseiten aus web_sources.csv ===
-    web_sources = read_csv(WEB_SOURCE_FILE)
-    print(" Verarbeite Webquellen (web_sources.csv):")
-    for entry in tqdm(web_sources):
-        eintrag = {
-            "id": entry["id"],
-            "quelle": entry["url"],
-            "typ": "web",
-            "thema": entry["thema"],
-            "sprache": entry["sprache"],
-            "text": extract_text_from_url(entry["url"])
-        }
-        results.append(eintrag)
-
-    # === Speicherung der Ergebnisse ===
+def main():
     output_path = os.path.join(OUTPUT_DIR, "extracted_sources.jsonl")
+    manifest = IngestManifest(MANIFEST_FILE, INGEST_CACHE_DIR, force=INGEST_FORCE)
+
+    # Ergebnisse werden direkt beim Fertigstellen geschrieben, nicht gesammelt
     with open(output_path, "w", encoding="utf-8") as f:
-        for item in results:
-            json.dump(item, f, ensure_ascii=False)
-            f.write("\n")
 
+        # === PDFs aus sources.csv ===
+        pdf_sources = read_csv(PDF_SOURCE_FILE)
+        pdf_entries = [e for e in pdf_sources if e["typ"].strip().lower() == "pdf"]
+        pdf_paths = [
+            os.path.join(PDF_DIR, os.path.basename(e["url/filename"].strip().replace('"', '')))
+            for e in pdf_entries
+        ]
+        pdf_keys = [manifest.schluessel("pdf", e["id"]) for e in pdf_entries]
+        print(f" Verarbeite PDF-Quellen (sources.csv) mit {PDF_WORKERS} Prozessen:")
+        pdf_texte = iter_pdf_texts_incremental(pdf_keys, pdf_paths, manifest)
+        for entry, text in tqdm(zip(pdf_entries, pdf_texte), total=len(pdf_entries)):
+            schreibe_eintrag(f, {
+                "id": entry["id"],
+                "quelle": entry["quelle"],
+                "typ": "pdf",
+                "thema": entry["thema"],
+                "sprache": entry["sprache"],
+                "text": text
+            })
+
+        # === Webseiten aus web_sources.csv ===
+        web_sources = read_csv(WEB_SOURCE_FILE)
+        web_keys = [manifest.schluessel("web", e["id"]) for e in web_sources]
+        print(f" Verarbeite Webquellen (web_sources.csv) mit {WEB_WORKERS} Workern:")
+        with WebFetcher(
+            max_workers=WEB_WORKERS,
+            per_host_limit=WEB_PER_HOST,
+            min_interval=WEB_MIN_INTERVAL,
+            retries=WEB_RETRIES,
+            timeout=WEB_TIMEOUT,
+        ) as fetcher:
+            web_texte = fetcher.imap(
+                lambda args: extract_text_from_url(args[0], fetcher, manifest, args[1]),
+                [(entry["url"], key) for entry, key in zip(web_sources, web_keys)],
+            )
+            for entry, text in tqdm(zip(web_sources, web_texte), total=len(web_sources)):
+                schreibe_eintrag(f, {
+                    "id": entry["id"],
+                    "quelle": entry["url"],
+                    "typ": "web",
+                    "thema": entry["thema"],
+                    "sprache": entry["sprache"],
+                    "text": text
+                })
+
+    manifest.save(aktive=pdf_keys + web_keys)
+    bericht = manifest.zusammenfassung()
+    print(f"\n Neu: {bericht[NEU]} | Geändert: {bericht[GEAENDERT]} | Wiederverwendet: {bericht[WIEDERVERWENDET]}")
+    for key, status in sorted(manifest.status.items()):
+        if status != WIEDERVERWENDET:
+            print(f"   {status:>7}  {key}")
     print(f"\n Fertig! Alles gespeichert unter: {output_path}")
 
 
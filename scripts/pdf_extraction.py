@@ -0,0 +1,93 @@
+"""
+Parallel PDF text extraction for FMGPT.
+Splits PDFs into page ranges, extracts them in a process pool and yields documents in input order.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+import fitz  # PyMuPDF
+
+
+def extract_page_range(path: str, start: int, end: int) -> str:
+    """
+    Extrahiert den Text der Seiten [start, end) eines PDFs.
+    :param path: Pfad zur PDF-Datei
+    :param start: Erste Seite (inklusive)
+    :param end: Letzte Seite (exklusive)
+    :return: Seitentexte, mit Zeilenumbruch verbunden
+    """
+    with fitz.open(path) as doc:
+        return "\n".join(doc[i].get_text() for i in range(start, end))
+
+
+def page_ranges(path: str, pages_per_task: int) -> List[Tuple[int, int]]:
+    """
+    Teilt ein PDF in Seitenbereiche mit höchstens pages_per_task Seiten.
+    :param path: Pfad zur PDF-Datei
+    :param pages_per_task: Maximale Seitenzahl pro Bereich
+    :return: Liste von (start, end)-Tupeln; mindestens ein Bereich
+    """
+    with fitz.open(path) as doc:
+        anzahl = doc.page_count
+    step = max(1, pages_per_task)
+    return [(i, min(i + step, anzahl)) for i in range(0, anzahl, step)] or [(0, 0)]
+
+
+def _join(parts: List[Future]) -> str:
+    try:
+        return "\n".join(part.result() for part in parts)
+    except Exception as e:
+        return f"Error reading PDF: {e}"
+
+
+def iter_pdf_texts(paths: Iterable[str], workers: int = 1, pages_per_task: int = 50) -> Iterator[str]:
+    """
+    Extrahiert PDFs parallel und liefert die Texte in Eingabereihenfolge.
+    Es sind höchstens 2 * workers Seitenbereiche gleichzeitig in Arbeit (auch innerhalb eines großen
+    Dokuments), sodass der Speicherbedarf von der Worker-Zahl und nicht von der Korpusgröße abhängt.
+    :param paths: PDF-Pfade
+    :param workers: Anzahl Prozesse (1 = ohne Prozesspool)
+    :param pages_per_task: Seiten pro Teilauftrag bei großen Dokumenten
+    :return: Iterator über die Dokumenttexte (bei Fehlern "Error reading PDF: ...")
+    """
+    if workers <= 1:
+        for path in paths:
+            try:
+                yield "\n".join(extract_page_range(path, s, e) for s, e in page_ranges(path, pages_per_task))
+            except Exception as e:
+                yield f"Error reading PDF: {e}"
+        return
+
+    max_in_flight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Tuple[List[Future], int]] = deque()  # (Teile eines Dokuments, davon noch in Arbeit)
+        in_flight = 0
+        for path in paths:
+            try:
+                ranges = page_ranges(path, pages_per_task)
+            except Exception as e:
+                failed: Future = Future()
+                failed.set_exception(e)
+                pending.append(([failed], 0))
+                continue
+            parts: List[Future] = []
+            abgewartet = 0  # Teile dieses Dokuments, deren Ergebnis schon vorliegt
+            for start, end in ranges:
+                while in_flight >= max_in_flight:
+                    if pending:
+                        # Fertige Dokumente vom Kopf der Warteschlange abgeben, bevor neue Arbeit dazukommt
+                        done, offen = pending.popleft()
+                        in_flight -= offen
+                        yield _join(done)
+                    else:
+                        # Ein einzelnes großes Dokument: auf seinen ältesten offenen Teil warten
+                        parts[abgewartet].exception()  # blockiert bis fertig, Fehler meldet später _join
+                        abgewartet += 1
+                        in_flight -= 1
+                parts.append(executor.submit(extract_page_range, path, start, end))
+                in_flight += 1
+            pending.append((parts, len(parts) - abgewartet))
+        while pending:
+            yield _join(pending.popleft()[0])
@@ -0,0 +1,215 @@
+"""
+Token-budgeted prompt assembly for FMGPT.
+Fits system text, retrieved chunks and chat history into the model context (num_ctx minus a reserve for
+the answer). Recent turns stay verbatim; older turns are folded into a compact rolling summary per session.
+The chat messages keep a stable prefix (system text, summary, earlier turns) in front of the variable part
+(context and question), so Ollama can reuse the KV cache of the prefix across turns.
+"""
+
+import os
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from logging_utils import log_event
+
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))            # Kontextfenster des Modells (wird an Ollama übergeben)
+PROMPT_ANSWER_TOKENS = int(os.getenv("PROMPT_ANSWER_TOKENS", "768"))  # für die Antwort freigehalten
+PROMPT_HISTORY_TURNS = int(os.getenv("PROMPT_HISTORY_TURNS", "3"))    # letzte Runden im Wortlaut
+PROMPT_HISTORY_SHARE = float(os.getenv("PROMPT_HISTORY_SHARE", "0.25"))  # max. Anteil von Verlauf + Zusammenfassung
+# Tokenizer des Ollama-Modells; das Original-Repo von Mistral ist gated, dieses enthält denselben Tokenizer ohne Freigabe
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "TheBloke/Mistral-7B-Instruct-v0.2-GPTQ")
+ZEICHEN_PRO_TOKEN = 3.2  # Schätzung, falls der Tokenizer nicht geladen werden kann (deutscher Text)
+PROMPT_ESTIMATE_MARGIN = float(os.getenv("PROMPT_ESTIMATE_MARGIN", "1.25"))  # Aufschlag auf geschätzte Tokens
+
+SYSTEM_TEXT = (
+    "Du bist ein hilfreicher Fußball-Experte für Football Manager.\n"
+    "Nutze den folgenden Kontext, um die Frage zu beantworten.\n"
+    "Wenn der Kontext nicht ausreicht, gib dein Bestes anhand deines Wissens.\n\n"
+    "Beziehe deine Antworten wenn möglich auf den FM 24.\n\n"
+)
+TRENNER = "\n---\n"
+
+
+class TokenZaehler:
+    """
+    Zählt Tokens mit dem Hugging-Face-Tokenizer des Modells (lazy geladen). Ist er nicht verfügbar
+    (z. B. offline), wird über die Zeichenzahl geschätzt; `geschaetzt` zeigt das an. Geschätzte Werte
+    bekommen einen Aufschlag, damit der Prompt num_ctx nicht überschreitet (Ollama würde sonst vorne
+    abschneiden, also den Systemtext).
+    """
+
+    def __init__(self, name: str = PROMPT_TOKENIZER, tokenizer: Any = None, aufschlag: float = PROMPT_ESTIMATE_MARGIN) -> None:
+        """
+        :param name: Name oder Pfad des Tokenizers
+        :param tokenizer: Optional vorhandener Tokenizer mit encode(text)
+        :param aufschlag: Faktor auf geschätzte Tokenzahlen
+        """
+        self.name = name
+        self._tokenizer = tokenizer
+        self.aufschlag = aufschlag
+        self.geschaetzt = False
+
+    def _lade(self) -> Any:
+        if self._tokenizer is None and not self.geschaetzt:
+            try:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self.name)
+            except Exception as e:
+                log_event(f"Tokenizer '{self.name}' nicht verfügbar, Tokens werden geschätzt: {e}", level="warning")
+                self.geschaetzt = True
+        return self._tokenizer
+
+    def __call__(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self._lade()
+        if tokenizer is None:
+            return int(len(text) / ZEICHEN_PRO_TOKEN * self.aufschlag) + 1
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def dedupliziere_chunks(texte: Sequence[str]) -> List[str]:
+    """Entfernt Chunks mit gleichem Text (Whitespace und Groß-/Kleinschreibung egal); Reihenfolge bleibt."""
+    gesehen, eindeutig = set(), []
+    for text in texte:
+        key = re.sub(r"\s+", " ", text).strip().casefold()
+        if key and key not in gesehen:
+            gesehen.add(key)
+            eindeutig.append(text)
+    return eindeutig
+
+
+def kuerze(text: str, max_tokens: int, zaehle: Callable[[str], int]) -> str:
+    """Kürzt Text auf höchstens max_tokens (am Wortende, mit "…")."""
+    if zaehle(text) <= max_tokens:
+        return text
+    woerter = text.split()
+    lo, hi = 0, len(woerter)
+    while lo < hi:  # binäre Suche nach der längsten passenden Wortfolge
+        mitte = (lo + hi + 1) // 2
+        if zaehle(" ".join(woerter[:mitte]) + " …") <= max_tokens:
+            lo = mitte
+        else:
+            hi = mitte - 1
+    return " ".join(woerter[:lo]) + " …" if lo else ""
+
+
+class Verlaufszusammenfassung:
+    """
+    Rollierende Zusammenfassung älterer Chat-Runden einer Session (liegt in st.session_state).
+    Jede Runde wird genau einmal verdichtet: Frage plus Anfang der Antwort.
+    """
+
+    def __init__(self, tokens_pro_runde: int = 60) -> None:
+        """
+        :param tokens_pro_runde: Maximale Tokens je verdichteter Runde
+        """
+        self.tokens_pro_runde = tokens_pro_runde
+        self.zeilen: List[str] = []
+        self.bis = 0  # Anzahl bereits verdichteter Runden
+
+    def falte(self, verlauf: Sequence[Tuple[str, str]], bis: int, zaehle: Callable[[str], int]) -> None:
+        """
+        Verdichtet die Runden verlauf[self.bis:bis].
+        :param verlauf: Chatverlauf (Frage, Antwort)
+        :param bis: Index der ersten Runde, die im Wortlaut bleibt
+        :param zaehle: Token-Zähler
+        """
+        for i in range(self.bis, bis):
+            frage, antwort = verlauf[i]
+            erster_satz = re.split(r"(?<=[.!?])\s", antwort.strip(), maxsplit=1)[0]
+            self.zeilen.append(kuerze(f"- {frage.strip()} → {erster_satz}", self.tokens_pro_runde, zaehle))
+        self.bis = max(self.bis, bis)
+
+    def text(self, max_tokens: int, zaehle: Callable[[str], int]) -> str:
+        """Zusammenfassung mit höchstens max_tokens; bei Platzmangel fallen die ältesten Zeilen weg."""
+        zeilen, summe = [], 0
+        for zeile in reversed(self.zeilen):
+            n = zaehle(zeile) + 1
+            if summe + n > max_tokens:
+                break
+            zeilen.append(zeile)
+            summe += n
+        return "\n".join(reversed(zeilen))
+
+
+class Prompt(NamedTuple):
+    text: str                       # Gesamtprompt als Text (für /api/generate)
+    nachrichten: List[Dict[str, str]]  # dieselben Teile als Chat-Nachrichten (für /api/chat), stabiler Präfix zuerst
+    tokens: Dict[str, int]          # system, zusammenfassung, verlauf, kontext, frage, gesamt
+    chunks: List[str]               # verwendete Chunks
+    chunks_verworfen: int           # Duplikate und Chunks ohne Platz
+    runden_wortlaut: int            # Runden im Wortlaut
+
+
+def baue_prompt(
+    frage: str,
+    chunks: Sequence[str],
+    verlauf: Sequence[Tuple[str, str]],
+    zusammenfassung: Verlaufszusammenfassung,
+    zaehle: Callable[[str], int],
+    num_ctx: int = OLLAMA_NUM_CTX,
+    antwort_tokens: int = PROMPT_ANSWER_TOKENS,
+    runden: int = PROMPT_HISTORY_TURNS,
+    verlauf_anteil: float = PROMPT_HISTORY_SHARE,
+) -> Prompt:
+    """
+    Baut den Prompt innerhalb des Token-Budgets num_ctx - antwort_tokens.
+    Reihenfolge der Zuteilung: System und Frage, dann Verlauf (höchstens verlauf_anteil des Rests,
+    neueste Runden zuerst, ältere in der Zusammenfassung), dann Chunks in Ranking-Reihenfolge.
+    Gefaltet wird blockweise: Passen die ungefalteten Runden nicht mehr, bleibt nur die neueste Hälfte
+    im Wortlaut. Dazwischen wächst der Verlauf nur hinten an und der Präfix bleibt über mehrere Runden gleich.
+    :param frage: Aktuelle Frage
+    :param chunks: Abgerufene Chunk-Texte, bester zuerst
+    :param verlauf: Bisheriger Chatverlauf (Frage, Antwort)
+    :param zusammenfassung: Zusammenfassung der Session (wird fortgeschrieben)
+    :param zaehle: Token-Zähler
+    :param num_ctx: Kontextfenster des Modells
+    :param antwort_tokens: Für die Antwort reservierte Tokens
+    :param runden: Maximale Anzahl Runden im Wortlaut
+    :param verlauf_anteil: Maximaler Anteil von Verlauf und Zusammenfassung am verfügbaren Budget
+    :return: Prompt mit Token-Aufschlüsselung
+    """
+    frage_teil = f"\n\nFRAGE: {frage}\n\nANTWORT:"
+    tokens = {"system": zaehle(SYSTEM_TEXT), "frage": zaehle(frage_teil)}
+    rest = num_ctx - antwort_tokens - tokens["system"] - tokens["frage"]
+
+    # === Verlauf: neueste Runden im Wortlaut, ältere verdichten
+    verlauf_budget = int(max(rest, 0) * verlauf_anteil)
+    eintraege = {i: f"Frage {i + 1}: {q}\nAntwort {i + 1}: {a}\n\n" for i, (q, a) in enumerate(verlauf) if i >= zusammenfassung.bis}
+    kosten = {i: zaehle(e) for i, e in eintraege.items()}
+    behalten = len(eintraege)
+    if behalten > runden or sum(kosten.values()) > verlauf_budget:
+        behalten = min(runden, max(1, runden // 2))
+    wortlaut, genutzt = [], 0
+    for i in range(len(verlauf) - 1, len(verlauf) - 1 - behalten, -1):
+        if i < zusammenfassung.bis or genutzt + kosten[i] > verlauf_budget:
+            break
+        wortlaut.insert(0, i)
+        genutzt += kosten[i]
+    zusammenfassung.falte(verlauf, len(verlauf) - len(wortlaut), zaehle)
+    zusammenfassung_text = zusammenfassung.text(verlauf_budget - genutzt, zaehle)
+    zusammenfassung_teil = f"FRÜHERE FRAGEN (gekürzt):\n{zusammenfassung_text}\n\n" if zusammenfassung_text else ""
+    verlauf_teil = f"CHATVERLAUF:\n{''.join(eintraege[i] for i in wortlaut)}" if wortlaut else ""
+    tokens["zusammenfassung"] = zaehle(zusammenfassung_teil)
+    tokens["verlauf"] = zaehle(verlauf_teil)
+    rest -= tokens["zusammenfassung"] + tokens["verlauf"]
+
+    # === Kontext: Chunks in Ranking-Reihenfolge, solange Platz ist
+    eindeutig = dedupliziere_chunks(chunks)
+    kontext, genutzt = [], zaehle("KONTEXT:\n")
+    for chunk in eindeutig:
+        n = zaehle(chunk) + zaehle(TRENNER)
+        if genutzt + n <= rest:
+            kontext.append(chunk)
+            genutzt += n
+    kontext_teil = "KONTEXT:\n" + TRENNER.join(kontext)
+    tokens["kontext"] = zaehle(kontext_teil)
+
+    text = SYSTEM_TEXT + zusammenfassung_teil + verlauf_teil + kontext_teil + frage_teil
+    tokens["gesamt"] = zaehle(text)
+    nachrichten = [{"role": "system", "content": (SYSTEM_TEXT + zusammenfassung_teil).rstrip()}]
+    for i in wortlaut:
+        nachrichten += [{"role": "user", "content": verlauf[i][0]}, {"role": "assistant", "content": verlauf[i][1]}]
+    nachrichten.append({"role": "user", "content": (kontext_teil + frage_teil).rstrip()})
+    return Prompt(text, nachrichten, tokens, kontext, len(chunks) - len(kontext), len(wortlaut))
@@ -0,0 +1,173 @@
+"""
+Two-level answer cache for FMGPT.
+L1 matches the normalized question text exactly and skips guard, retrieval and generation.
+L2 reuses an answer when the question embedding is within a cosine threshold of a cached one
+and retrieval returned the same chunk ids, and skips generation.
+Both levels are scoped to the conversation: the answer depends on the earlier turns in the prompt,
+so a follow-up question only hits entries from an identical history (usually the empty one).
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "500"))
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "86400"))
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95"))  # Cosinus-Schwelle für L2
+
+
+def normalisiere_frage(frage: str) -> str:
+    """Kleinschreibung, Satzzeichen am Ende und Mehrfach-Leerzeichen entfernt."""
+    text = unicodedata.normalize("NFKC", frage).casefold()
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ")
+
+
+def verlauf_schluessel(verlauf: Sequence[Tuple[str, str]], zusammenfassung: str = "") -> str:
+    """
+    Hash des Gesprächskontexts, der in den Prompt eingeht.
+    :param verlauf: Bisheriger Chatverlauf (Frage, Antwort)
+    :param zusammenfassung: Text der Verlaufszusammenfassung
+    :return: "" ohne Verlauf, sonst SHA-256 über Runden und Zusammenfassung
+    """
+    if not verlauf and not zusammenfassung:
+        return ""
+    h = hashlib.sha256(zusammenfassung.encode("utf-8"))
+    for frage, antwort in verlauf:
+        h.update(b"\x1e" + frage.encode("utf-8") + b"\x1f" + antwort.encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Eintrag(NamedTuple):
+    antwort: str
+    embedding: np.ndarray
+    chunk_ids: Tuple[str, ...]
+    verlauf: str
+    zeit: float
+
+
+class QueryCache:
+    """
+    Antwort-Cache mit TTL und LRU-Verdrängung. Alle Einträge gehören zu einer Collection-Version;
+    wechselt die Version, wird der Cache geleert.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        ttl_s: float = QUERY_CACHE_TTL_S,
+        threshold: float = QUERY_CACHE_THRESHOLD,
+    ) -> None:
+        """
+        :param max_entries: Maximale Anzahl Antworten
+        :param ttl_s: Lebensdauer einer Antwort in Sekunden
+        :param threshold: Minimale Cosinus-Ähnlichkeit für einen L2-Treffer
+        """
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.threshold = threshold
+        self.version: Optional[str] = None
+        self._eintraege: "OrderedDict[str, _Eintrag]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"l1_treffer": 0, "l2_treffer": 0, "fehlend": 0, "invalidiert": 0, "verdraengt": 0}
+
+    def _pruefe_version(self, version: str) -> None:
+        if version != self.version:
+            if self._eintraege:
+                self.stats["invalidiert"] += len(self._eintraege)
+            self._eintraege.clear()
+            self.version = version
+
+    def _gueltig(self, key: str, eintrag: _Eintrag) -> bool:
+        if time.time() - eintrag.zeit > self.ttl_s:
+            del self._eintraege[key]
+            return False
+        return True
+
+    def get_exakt(self, frage: str, version: str, verlauf: str = "") -> Optional[str]:
+        """
+        L1: exakt gleiche (normalisierte) Frage im gleichen Gesprächskontext.
+        :param frage: Nutzerfrage
+        :param version: Aktive Collection-Version
+        :param verlauf: verlauf_schluessel() des Gesprächs
+        :return: Gecachte Antwort oder None
+        """
+        key = _schluessel(frage, verlauf)
+        with self._lock:
+            self._pruefe_version(version)
+            eintrag = self._eintraege.get(key)
+            if eintrag is not None and self._gueltig(key, eintrag):
+                self._eintraege.move_to_end(key)
+                self.stats["l1_treffer"] += 1
+                return eintrag.antwort
+        return None
+
+    def get_semantisch(self, embedding: Any, chunk_ids: Sequence[str], version: str, verlauf: str = "") -> Optional[str]:
+        """
+        L2: ähnliche Frage (Cosinus >= threshold) mit identischen Chunk-IDs im gleichen Gesprächskontext.
+        :param embedding: Embedding der Frage
+        :param chunk_ids: IDs der abgerufenen Chunks (Reihenfolge egal)
+        :param version: Aktive Collection-Version
+        :param verlauf: verlauf_schluessel() des Gesprächs
+        :return: Gecachte Antwort oder None
+        """
+        vec = _normiert(embedding)
+        ids = tuple(sorted(chunk_ids))
+        with self._lock:
+            self._pruefe_version(version)
+            kandidaten = [
+                (k, e) for k, e in list(self._eintraege.items())
+                if e.chunk_ids == ids and e.verlauf == verlauf and self._gueltig(k, e)
+            ]
+            if kandidaten:
+                aehnlichkeit = np.stack([e.embedding for _, e in kandidaten]) @ vec
+                best = int(np.argmax(aehnlichkeit))
+                if aehnlichkeit[best] >= self.threshold:
+                    key, eintrag = kandidaten[best]
+                    self._eintraege.move_to_end(key)
+                    self.stats["l2_treffer"] += 1
+                    return eintrag.antwort
+            self.stats["fehlend"] += 1
+        return None
+
+    def put(self, frage: str, embedding: Any, chunk_ids: Sequence[str], antwort: str, version: str, verlauf: str = "") -> None:
+        """
+        Speichert eine Antwort.
+        :param frage: Nutzerfrage
+        :param embedding: Embedding der Frage
+        :param chunk_ids: IDs der verwendeten Chunks
+        :param antwort: Antwort des Modells
+        :param version: Collection-Version, aus der die Chunks stammen
+        :param verlauf: verlauf_schluessel() des Gesprächs, in dem die Antwort entstand
+        """
+        key = _schluessel(frage, verlauf)
+        with self._lock:
+            self._pruefe_version(version)
+            self._eintraege[key] = _Eintrag(antwort, _normiert(embedding), tuple(sorted(chunk_ids)), verlauf, time.time())
+            self._eintraege.move_to_end(key)
+            while len(self._eintraege) > self.max_entries:
+                self._eintraege.popitem(last=False)
+                self.stats["verdraengt"] += 1
+
+    def __len__(self) -> int:
+        return len(self._eintraege)
+
+    def zusammenfassung(self) -> Dict[str, Any]:
+        anfragen = self.stats["l1_treffer"] + self.stats["l2_treffer"] + self.stats["fehlend"]
+        treffer = self.stats["l1_treffer"] + self.stats["l2_treffer"]
+        return {**self.stats, "eintraege": len(self), "trefferquote": treffer / anfragen if anfragen else 0.0}
+
+
+def _schluessel(frage: str, verlauf: str) -> str:
+    return f"{verlauf}:{normalisiere_frage(frage)}" if verlauf else normalisiere_frage(frage)
+
+
+def _normiert(embedding: Any) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    return vec / max(float(np.linalg.norm(vec)), 1e-12)
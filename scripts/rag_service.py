@@ -0,0 +1,345 @@
+"""
+Long-lived retrieval service for FMGPT.
+Holds the Chroma client, the resolved collection and the embedding model for the whole process,
+so Streamlit reruns and parallel sessions share one warmed-up retrieval stack.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()  # vor den Modul-Imports, deren Konstanten aus der Umgebung gelesen werden
+
+from collection_alias import SPRACH_PARTITIONEN, aktive_collection, aktive_revision, partitions_name
+from embedding_cache import CachedEmbeddingFunction
+from reranker import RERANK_DEPTH
+from vector_store import VECTOR_BACKEND, VECTOR_STORE_DIR, ChromaStore, NumpyStore, VectorStore
+
+WARMUP_QUERY = "Wie funktioniert Pressing im Football Manager?"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))   # Kandidaten je Verfahren vor der Fusion
+HYBRID_BUDGET_MS = float(os.getenv("HYBRID_BUDGET_MS", "250"))  # Zeitbudget für die lexikalische Suche
+RRF_K = 60
+
+
+def rrf_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Reciprocal Rank Fusion: Score = Summe 1 / (k + Rang) über alle Rankings.
+    :param rankings: Listen von IDs, jeweils bestes Ergebnis zuerst
+    :param k: Dämpfungskonstante
+    :return: Liste (ID, Score), absteigend
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rang, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rang)
+    return sorted(scores.items(), key=lambda x: -x[1])
+
+
+def sprach_filter(sprachen: str) -> Dict[str, Any]:
+    """
+    Filter für eine oder mehrere Sprachen.
+    :param sprachen: z. B. "de" oder "de,en"
+    :return: {"sprache": "de"} bzw. {"sprache": {"$in": ["de", "en"]}}
+    """
+    liste = [s.strip() for s in sprachen.split(",") if s.strip()]
+    return {"sprache": liste[0]} if len(liste) == 1 else {"sprache": {"$in": liste}}
+
+
+def nach_distanz_zusammenfuehren(ergebnisse: Sequence[Dict[str, Any]], n_results: int) -> Dict[str, Any]:
+    """
+    Führt Ergebnisse mehrerer Partitionen (gleiches Modell, gleiche Metrik) nach Distanz zusammen.
+    :param ergebnisse: Ergebnisse im Chroma-Format
+    :param n_results: Anzahl Treffer
+    :return: Ergebnis im Chroma-Format
+    """
+    treffer = sorted(
+        (
+            (d, id_, doc, meta)
+            for e in ergebnisse
+            for d, id_, doc, meta in zip(e["distances"][0], e["ids"][0], e["documents"][0], e["metadatas"][0])
+        ),
+        key=lambda t: t[0],
+    )[:n_results]
+    return {
+        "ids": [[t[1] for t in treffer]],
+        "documents": [[t[2] for t in treffer]],
+        "metadatas": [[t[3] for t in treffer]],
+        "distances": [[t[0] for t in treffer]],
+    }
+
+
+class RetrievalService:
+    """
+    Prozessweiter Retrieval-Stack. Der Alias wird bei jeder Abfrage neu aufgelöst, damit ein
+    Umschalten der Collection-Version (build_index.py) ohne Neustart greift. Die Vektorsuche läuft
+    über einen VectorStore (Chroma oder NumPy, siehe vector_store.py). Gibt es Sprach-Partitionen
+    (LANGUAGE_PARTITIONS), wird ein Sprachfilter auf die passende Partition geleitet statt gefiltert
+    zu suchen; mehrere Sprachen werden parallel abgefragt.
+    """
+
+    def __init__(
+        self,
+        chroma_path: str,
+        collection_alias: str,
+        embed_model: str = "all-MiniLM-L6-v2",
+        embed_backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+        client: Any = None,
+        embed_fn: Any = None,
+        lexical: Any = None,
+        reranker: Any = None,
+        vector_backend: str = VECTOR_BACKEND,
+        store_dir: str = VECTOR_STORE_DIR,
+        partitionen: Sequence[str] = SPRACH_PARTITIONEN,
+    ) -> None:
+        """
+        :param chroma_path: Chroma-Verzeichnis
+        :param collection_alias: Alias bzw. Name der Collection
+        :param embed_model: Name des Embedding-Modells
+        :param embed_backend: "torch" oder "onnx"
+        :param onnx_dir: Verzeichnis des ONNX-Modells
+        :param client: Optional vorhandener Chroma-Client (sonst PersistentClient)
+        :param embed_fn: Optional vorhandene Embedding-Funktion
+        :param lexical: Optionaler LexicalIndex (BM25) für hybrid_query
+        :param reranker: Optionaler Reranker (Cross-Encoder) für suche
+        :param vector_backend: "chroma" oder "numpy"
+        :param store_dir: Basisverzeichnis der NumPy-Stores (ein Unterverzeichnis je Collection-Version)
+        :param partitionen: Sprachen mit eigener Partition (von build_index.py geschrieben)
+        """
+        if vector_backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unbekanntes Vektor-Backend: {vector_backend}")
+        self.chroma_path = chroma_path
+        self.collection_alias = collection_alias
+        self.client = client
+        self.embed_fn = embed_fn or CachedEmbeddingFunction(embed_model, backend=embed_backend, onnx_dir=onnx_dir)
+        self.vector_backend = vector_backend
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self.partitionen = list(partitionen)
+        self._stores: Dict[str, VectorStore] = {}
+        self._store_name: Optional[str] = None
+        self._version: Optional[str] = None
+        self._ohne_partition: set = set()
+        self.lexical = lexical
+        self.reranker = reranker
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval") if lexical is not None else None
+        self._fanout = ThreadPoolExecutor(max_workers=len(self.partitionen), thread_name_prefix="partition") if len(self.partitionen) > 1 else None
+        self.stats = {"hybrid": 0, "budget_ueberschritten": 0, "partitioniert": 0, "partition_fallback": 0}
+        self.warmup_ms: Optional[float] = None
+        self.embed_ms: Optional[float] = None  # Embedding-Latenz beim Warmup (Modell, nicht Cache)
+        self.gestartet = time.time()
+
+    # === Vektor-Store ===
+    def store(self, sprache: Optional[str] = None) -> VectorStore:
+        """
+        Store der aktiven Version (bzw. ihrer Sprach-Partition); wird nur bei einem Versionswechsel neu geöffnet.
+        :param sprache: Optional Sprache der Partition
+        """
+        version = self.version()
+        aktiv = version.rsplit("@", 1)[0]  # Chroma-Namen enthalten kein "@"
+        name = partitions_name(aktiv, sprache) if sprache else aktiv
+        with self._lock:
+            if version != self._version:  # auch nach inkrementellem Sync: NumPy-Stores wurden neu exportiert
+                self._stores = {}
+                self._ohne_partition = set()
+                self._store_name = aktiv
+                self._version = version
+            if name not in self._stores:
+                self._stores[name] = self._oeffne(name)
+            return self._stores[name]
+
+    def _oeffne(self, name: str) -> VectorStore:
+        if self.vector_backend == "numpy":
+            return NumpyStore.laden(os.path.join(self.store_dir, name))
+        if self.client is None:
+            import chromadb
+            self.client = chromadb.PersistentClient(path=self.chroma_path)
+        return ChromaStore(self.client.get_collection(name=name))
+
+    def _partitionen_fuer(self, sprachen: Sequence[str]) -> Optional[List[VectorStore]]:
+        """Stores der Partitionen oder None, wenn nicht alle Sprachen partitioniert sind (dann gefilterte Suche)."""
+        if not sprachen or any(s not in self.partitionen or s in self._ohne_partition for s in sprachen):
+            return None
+        try:
+            return [self.store(s) for s in sprachen]
+        except Exception:
+            # Partition fehlt (z. B. Index ohne LANGUAGE_PARTITIONS gebaut) → bis zum nächsten Versionswechsel filtern
+            self._ohne_partition.update(sprachen)
+            self.stats["partition_fallback"] += 1
+            return None
+
+    def version(self) -> str:
+        """
+        Aktive Collection-Version mit Revision, z. B. chunks__v20250101T120000@3 (für Cache-Invalidierung).
+        Die Revision ändert sich auch bei inkrementellen Syncs, die die Collection in place ändern.
+        """
+        aktiv = aktive_collection(self.chroma_path, self.collection_alias)
+        return f"{aktiv}@{aktive_revision(self.chroma_path, self.collection_alias)}"
+
+    # === Abfrage ===
+    def embed(self, texts: List[str]) -> List[Any]:
+        return self.embed_fn(texts)
+
+    def query(self, frage: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Sucht die ähnlichsten Chunks zu einer Frage.
+        :param frage: Nutzerfrage
+        :param n_results: Anzahl Treffer
+        :param where: Optionaler Metadatenfilter, z. B. {"sprache": "de"} oder {"sprache": {"$in": ["de", "en"]}}
+        :return: Chroma-Ergebnis (ids, documents, metadatas, distances)
+        """
+        embedding = self.embed([frage])[0]
+        rest = dict(where or {})
+        sprache = rest.pop("sprache", None)
+        sprachen = sprache.get("$in", []) if isinstance(sprache, dict) else [sprache] if sprache is not None else []
+        stores = self._partitionen_fuer(sprachen)
+        if stores is None:
+            return self.store().query(embedding, n_results=n_results, where=where)
+        self.stats["partitioniert"] += 1
+        if len(stores) == 1:
+            return stores[0].query(embedding, n_results=n_results, where=rest or None)
+        ergebnisse = self._fanout.map(lambda s: s.query(embedding, n_results=n_results, where=rest or None), stores)
+        return nach_distanz_zusammenfuehren(list(ergebnisse), n_results)
+
+    def hybrid_query(
+        self,
+        frage: str,
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        kandidaten: int = HYBRID_CANDIDATES,
+        budget_ms: float = HYBRID_BUDGET_MS,
+    ) -> Dict[str, Any]:
+        """
+        Vektor- und BM25-Suche parallel, zusammengeführt per Reciprocal Rank Fusion.
+        Ist die BM25-Suche nach budget_ms nicht fertig, zählt nur das Vektor-Ergebnis.
+        :param frage: Nutzerfrage
+        :param n_results: Anzahl Treffer nach der Fusion
+        :param where: Optionaler Metadatenfilter
+        :param kandidaten: Treffer je Verfahren vor der Fusion
+        :param budget_ms: Zeitbudget der lexikalischen Suche ab Anfragebeginn
+        :return: Ergebnis im Chroma-Format (ids, documents, metadatas) plus scores
+        """
+        if self.lexical is None:
+            return self.query(frage, n_results=n_results, where=where)
+        start = time.perf_counter()
+        self.stats["hybrid"] += 1
+        lex_future = self._pool.submit(self.lexical.suche, frage, kandidaten, where)
+        vektor = self.query(frage, n_results=kandidaten, where=where)
+        try:
+            rest = max(0.0, budget_ms / 1000 - (time.perf_counter() - start))
+            lexikalisch = [id_ for id_, _ in lex_future.result(timeout=rest)]
+        except FutureTimeout:
+            lexikalisch = []
+            self.stats["budget_ueberschritten"] += 1
+
+        vektor_ids = (vektor.get("ids") or [[]])[0]
+        fusion = rrf_fusion([vektor_ids, lexikalisch])[:n_results]
+        docs = dict(zip(vektor_ids, (vektor.get("documents") or [[]])[0]))
+        metas = dict(zip(vektor_ids, (vektor.get("metadatas") or [[]])[0]))
+        fehlend = [id_ for id_, _ in fusion if id_ not in docs]
+        if fehlend:
+            nachgeladen = self.store().get(fehlend)
+            docs.update(zip(nachgeladen["ids"], nachgeladen["documents"]))
+            metas.update(zip(nachgeladen["ids"], nachgeladen["metadatas"]))
+        ids = [id_ for id_, _ in fusion if id_ in docs]  # nur IDs, die in der Collection existieren
+        scores = dict(fusion)
+        return {
+            "ids": [ids],
+            "documents": [[docs[i] for i in ids]],
+            "metadatas": [[metas.get(i) for i in ids]],
+            "scores": [[scores[i] for i in ids]],
+        }
+
+    def suche(self, frage: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None, tiefe: int = RERANK_DEPTH) -> Dict[str, Any]:
+        """
+        Vollständige Retrieval-Kette: hybride Kandidatensuche, Reranking der besten `tiefe` Kandidaten, Top n.
+        Ohne Reranker (oder wenn er unter Last umgangen wird) zählt die Reihenfolge der Fusion.
+        :param frage: Nutzerfrage
+        :param n_results: Anzahl Chunks für den Prompt
+        :param where: Optionaler Metadatenfilter
+        :param tiefe: Anzahl Kandidaten für das Reranking
+        :return: Ergebnis im Chroma-Format
+        """
+        if self.reranker is None:
+            return self.hybrid_query(frage, n_results=n_results, where=where)
+        kandidaten = self.hybrid_query(frage, n_results=tiefe, where=where, kandidaten=max(HYBRID_CANDIDATES, tiefe))
+        ids = kandidaten["ids"][0]
+        docs = kandidaten["documents"][0]
+        metas = kandidaten["metadatas"][0]
+        auswahl, scores = self.reranker.rerank(frage, ids, docs, n_results)
+        return {
+            "ids": [[ids[i] for i in auswahl]],
+            "documents": [[docs[i] for i in auswahl]],
+            "metadatas": [[metas[i] for i in auswahl]],
+            "rerank_scores": [[float(scores[i]) for i in auswahl]] if scores is not None else None,
+        }
+
+    # === Start & Zustand ===
+    def warmup(self) -> float:
+        """
+        Lädt Modell und Collection mit einer Testabfrage vor. Das Embedding-Modell wird explizit geladen,
+        weil die Testabfrage ab dem zweiten Start im Embedding-Cache liegt.
+        :return: Dauer in Millisekunden
+        """
+        start = time.perf_counter()
+        vorladen = getattr(self.embed_fn, "vorladen", None)
+        if vorladen is not None:
+            self.embed_ms = vorladen(WARMUP_QUERY)
+        else:
+            self.embed([WARMUP_QUERY])
+            self.embed_ms = (time.perf_counter() - start) * 1000
+        self.suche(WARMUP_QUERY, n_results=1)
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        return self.warmup_ms
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Zustand des Retrieval-Stacks (ohne eigene Abfragen; wird bei jedem Rerun aufgerufen).
+        :return: Dict mit ok, collection, chunks, warmup_ms, embed_ms (beim Warmup gemessen) und ggf. fehler
+        """
+        status = {
+            "ok": False, "collection": None, "chunks": None, "warmup_ms": self.warmup_ms, "embed_ms": self.embed_ms,
+            "bm25_chunks": len(self.lexical) if self.lexical is not None else None, **self.stats,
+        }
+        if self.reranker is not None:
+            status.update({f"rerank_{k}": v for k, v in {**self.reranker.stats, **self.reranker.latenz()}.items()})
+        try:
+            store = self.store()
+            status["collection"] = self._store_name
+            status["backend"] = self.vector_backend
+            status["partitionen"] = [s for s in self.partitionen if s not in self._ohne_partition]
+            status["chunks"] = store.count()
+            status["ok"] = status["chunks"] > 0
+            if not status["ok"]:
+                status["fehler"] = "Collection ist leer"
+        except Exception as e:
+            status["fehler"] = str(e)
+        return status
+
+
+def service_aus_umgebung() -> RetrievalService:
+    """Erzeugt den Service aus den Umgebungsvariablen (.env)."""
+    lexical = None
+    if os.getenv("HYBRID_SEARCH", "1") == "1":
+        from lexical_index import lade_oder_baue
+        from utils import aktuelle_chunk_datei
+        chunk_file = aktuelle_chunk_datei("./output/chunks")
+        if os.path.exists(chunk_file):
+            lexical = lade_oder_baue(chunk_file)
+    reranker = None
+    if os.getenv("RERANK_ENABLED", "1") == "1":
+        from reranker import Reranker
+        reranker = Reranker()
+    return RetrievalService(
+        chroma_path=os.getenv("CHROMA_PATH", "./output/chroma_db"),
+        collection_alias=os.getenv("COLLECTION_NAME", "chunks_semantic"),
+        embed_model=os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2"),
+        embed_backend=os.getenv("EMBED_BACKEND", "torch"),
+        onnx_dir=os.getenv("ONNX_MODEL_DIR"),
+        lexical=lexical,
+        reranker=reranker,
+    )
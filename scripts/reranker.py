@@ -0,0 +1,130 @@
+"""
+Cross-encoder reranking for FMGPT.
+Scores a wide candidate set against the question in one batched forward pass, so fewer but better chunks
+reach the prompt. Scores are cached per (question, chunk_id); under load the stage is bypassed.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")  # mehrsprachig (de/en)
+RERANK_DEPTH = int(os.getenv("RERANK_DEPTH", "30"))             # Kandidaten, die neu bewertet werden
+RERANK_MAX_INFLIGHT = int(os.getenv("RERANK_MAX_INFLIGHT", "2"))  # mehr parallele Reranks = Stufe umgehen
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+
+def frage_schluessel(frage: str) -> str:
+    return hashlib.sha1(" ".join(frage.lower().split()).encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """
+    Cross-Encoder mit Score-Cache (LRU) und Lastschutz. Das Modell wird beim ersten Bedarf geladen,
+    unter einem eigenen Lock, damit Cache-Treffer und Lastschutz nicht auf den Download warten.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL,
+        max_inflight: int = RERANK_MAX_INFLIGHT,
+        cache_size: int = RERANK_CACHE_SIZE,
+        model: Any = None,
+    ) -> None:
+        """
+        :param model_name: Name des CrossEncoder-Modells
+        :param max_inflight: Maximale Anzahl gleichzeitiger Reranks, darüber wird umgangen
+        :param cache_size: Maximale Anzahl gecachter Scores
+        :param model: Optional vorhandenes Modell mit predict(pairs)
+        """
+        self.model_name = model_name
+        self.max_inflight = max_inflight
+        self.cache_size = cache_size
+        self._model = model
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()       # Score-Cache, _inflight, stats
+        self._lade_lock = threading.Lock()  # nur das Laden des Modells
+        self._inflight = 0
+        self._latenzen = deque(maxlen=500)
+        self.stats = {"reranks": 0, "umgangen": 0, "paare": 0, "aus_cache": 0}
+
+    def _lade_modell(self) -> Any:
+        if self._model is None:
+            with self._lade_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def warmup(self) -> None:
+        """Lädt das Modell vor (sonst beim ersten Rerank)."""
+        self._lade_modell()
+
+    def _scores(self, frage: str, ids: Sequence[str], documents: Sequence[str]) -> np.ndarray:
+        fk = frage_schluessel(frage)
+        scores = np.empty(len(ids), dtype=np.float32)
+        fehlend = []
+        with self._lock:
+            for i, id_ in enumerate(ids):
+                if documents[i] is None:  # Chroma liefert None für fehlende Texte → ans Ende, ohne Modell
+                    scores[i] = -np.inf
+                    continue
+                wert = self._cache.get((fk, id_))
+                if wert is None:
+                    fehlend.append(i)
+                else:
+                    self._cache.move_to_end((fk, id_))
+                    scores[i] = wert
+            self.stats["paare"] += len(ids)
+            self.stats["aus_cache"] += len(ids) - len(fehlend)
+        if fehlend:
+            # Ein Forward-Pass für alle fehlenden Paare
+            neu = self._lade_modell().predict([(frage, documents[i]) for i in fehlend], batch_size=len(fehlend))
+            with self._lock:
+                for i, wert in zip(fehlend, np.asarray(neu, dtype=np.float32).reshape(-1)):
+                    scores[i] = wert
+                    self._cache[(fk, ids[i])] = float(wert)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, frage: str, ids: Sequence[str], documents: Sequence[str], top_n: int) -> Tuple[List[int], Optional[np.ndarray]]:
+        """
+        Sortiert Kandidaten nach Cross-Encoder-Score.
+        :param frage: Nutzerfrage
+        :param ids: Chunk-IDs der Kandidaten
+        :param documents: Texte der Kandidaten (None = Text fehlt, landet hinten)
+        :param top_n: Anzahl zurückgegebener Kandidaten
+        :return: (Indizes der besten Kandidaten, Scores in Eingabereihenfolge oder None bei Umgehung)
+        """
+        with self._lock:
+            umgehen = self._inflight >= self.max_inflight
+            if umgehen:
+                self.stats["umgangen"] += 1
+            elif ids:
+                self._inflight += 1
+        if umgehen or not ids:
+            return list(range(min(top_n, len(ids)))), None
+        start = time.perf_counter()
+        try:
+            scores = self._scores(frage, ids, documents)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+        with self._lock:
+            self._latenzen.append((time.perf_counter() - start) * 1000)
+            self.stats["reranks"] += 1
+        return [int(i) for i in np.argsort(-scores, kind="stable")[:top_n]], scores
+
+    def latenz(self) -> Dict[str, Optional[float]]:
+        """Zusätzliche Latenz der Rerank-Stufe (p50/p95 in ms) über die letzten Aufrufe."""
+        with self._lock:
+            werte = np.array(self._latenzen)
+        if not len(werte):
+            return {"p50_ms": None, "p95_ms": None}
+        return {"p50_ms": float(np.percentile(werte, 50)), "p95_ms": float(np.percentile(werte, 95))}
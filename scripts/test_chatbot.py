@@ -5,7 +5,7 @@ Script to test the FMGPT chatbot logic in isolation.
 import os
 import openai
 import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from embedding_cache import CachedEmbeddingFunction
 from dotenv import load_dotenv
 
 # === Lade .env oder Key manuell eintragen
@@ -16,7 +16,7 @@ openai.api_key = os.getenv("OPENAI_API_KEY") or "sk-..."
 CHROMA_DIR = "./output/chroma_db"
 COLLECTION_NAME = "chunks"
 
-embed_fn = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+embed_fn = CachedEmbeddingFunction("all-MiniLM-L6-v2")
 client = chromadb.PersistentClient(path=CHROMA_DIR)
 collection = client.get_collection(name=COLLECTION_NAME)
 
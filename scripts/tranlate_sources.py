@@ -5,26 +5,35 @@ Script for translating sources for FMGPT.
 import os
 import json
 from tqdm import tqdm
-from deep_translator import GoogleTranslator  # Wechsel von LibreTranslator
+from translation import BACKENDS, SegmentTranslator, TranslationCache
 
 # === Konfiguration ===
 INPUT_FILE = "./output/extracted_sources.jsonl"
 OUTPUT_FILE = "./output/translated_sources.jsonl"
-translator = GoogleTranslator(source="en", target="de")  # Kein API-Key nötig
+CACHE_FILE = "./output/translation_cache.jsonl"
+TRANSLATOR_BACKEND = os.getenv("TRANSLATOR_BACKEND", "google")  # "google" oder "stub" (lokal, für Tests)
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))    # parallele Backend-Aufrufe
+TRANSLATE_BATCH_SIZE = int(os.getenv("TRANSLATE_BATCH_SIZE", "16"))
+
+translator = SegmentTranslator(
+    BACKENDS[TRANSLATOR_BACKEND]("en", "de"),  # Kein API-Key nötig
+    TranslationCache(CACHE_FILE),
+    source="en",
+    target="de",
+    workers=TRANSLATE_WORKERS,
+    batch_size=TRANSLATE_BATCH_SIZE,
+)
 
 # === Übersetzungsfunktion ===
 def translate_text(text):
-    try:
-        return translator.translate(text)
-    except Exception as e:
-        print(f"⚠️ Fehler bei Übersetzung: {e}")
-        return text  # Fallback: Originaltext
+    return translator.translate(text)
 
 # === Hauptfunktion ===
 def main():
-    translated_data = []
+    anzahl = 0
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as infile:
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    with open(INPUT_FILE, "r", encoding="utf-8") as infile, open(OUTPUT_FILE, "w", encoding="utf-8") as outfile:
         for line in tqdm(infile, desc="🌍 Übersetze"):
             entry = json.loads(line)
 
@@ -32,17 +41,18 @@ def main():
                 translated_text = translate_text(entry["text"])
                 entry["text"] = translated_text
                 entry["sprache"] = "de"
-            translated_data.append(entry)
-
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as outfile:
-        for item in translated_data:
-            json.dump(item, outfile, ensure_ascii=False)
+            json.dump(entry, outfile, ensure_ascii=False)
             outfile.write("\n")
+            anzahl += 1
 
-    print(f"✅ {len(translated_data)} Einträge in {OUTPUT_FILE} gespeichert.")
+    translator.close()
+    stats = translator.stats
+    print(f"✅ {anzahl} Einträge in {OUTPUT_FILE} gespeichert.")
+    print(
+        f"   Segmente: {stats['segmente']} | aus Cache: {stats['cache_treffer']} | "
+        f"neu übersetzt: {stats['uebersetzt']} | fehlgeschlagen: {stats['fehler']}"
+    )
 
 # === Einstiegspunkt ===
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,235 @@
+"""
+Segment-level translation utilities for FMGPT.
+Splits documents into segments, translates them in parallel batches and caches every segment on disk.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# Backend: Liste von Segmenten -> Liste übersetzter Segmente (gleiche Länge, None = Segment fehlgeschlagen)
+Backend = Callable[[List[str]], List[Optional[str]]]
+
+MAX_SEGMENT_CHARS = 4500  # GoogleTranslator akzeptiert höchstens 5000 Zeichen pro Anfrage
+
+
+def _an_wortgrenze(text: str, max_chars: int) -> List[str]:
+    """Teilt zu lange Sätze am letzten Leerzeichen vor max_chars (hart nur ohne Leerzeichen)."""
+    stuecke = []
+    while len(text) > max_chars:
+        schnitt = text.rfind(" ", 0, max_chars + 1)
+        if schnitt <= 0:
+            schnitt = max_chars
+        stuecke.append(text[:schnitt].rstrip())
+        text = text[schnitt:].lstrip()
+    return stuecke + [text] if text else stuecke
+
+
+def segmentiere(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[str]:
+    """
+    Zerlegt einen Text in Absätze (getrennt durch Leerzeilen). Einfache Zeilenumbrüche innerhalb eines
+    Absatzes (bei PDF-Text fast jede Zeile) werden zu Leerzeichen, Silbentrennung am Zeilenende wird
+    aufgehoben. Zu lange Absätze werden in Sätze zerlegt und gierig bis max_chars zusammengepackt.
+    Die Absatztrenner und " " zwischen Segmenten eines Absatzes bleiben als eigene Teile erhalten.
+    :param text: Eingabetext
+    :param max_chars: Maximale Zeichen pro Segment
+    :return: Liste aus Segmenten und Trennern
+    """
+    teile = []
+    for i, absatz in enumerate(re.split(r"(\n\s*\n)", text)):
+        if i % 2:  # Absatztrenner
+            teile.append(absatz)
+            continue
+        absatz = re.sub(r"(\w)-\n(?=[a-zäöüß])", r"\1", absatz)
+        absatz = " ".join(zeile.strip() for zeile in absatz.split("\n") if zeile.strip())
+        if len(absatz) <= max_chars:
+            teile.append(absatz)
+            continue
+        segmente, aktuell = [], ""
+        for satz in re.split(r"(?<=[.!?])\s+", absatz):
+            for stueck in _an_wortgrenze(satz, max_chars):
+                if aktuell and len(aktuell) + 1 + len(stueck) > max_chars:
+                    segmente.append(aktuell)
+                    aktuell = ""
+                aktuell = f"{aktuell} {stueck}" if aktuell else stueck
+        segmente.append(aktuell)
+        for j, segment in enumerate(segmente):
+            teile.extend([" ", segment] if j else [segment])
+    return [t for t in teile if t]
+
+
+def _zu_uebersetzen(teil: str) -> bool:
+    return bool(teil.strip())
+
+
+class TranslationCache:
+    """
+    Persistenter Segment-Cache als JSONL-Datei, Schlüssel aus Segment-Hash, Quell- und Zielsprache.
+    Neue Einträge werden angehängt, die Datei wird beim Start einmal eingelesen.
+    """
+
+    def __init__(self, path: str = "./output/translation_cache.jsonl") -> None:
+        """
+        :param path: Pfad zur Cache-Datei
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._eintraege: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        eintrag = json.loads(line)
+                        self._eintraege[eintrag["key"]] = eintrag["text"]
+
+    @staticmethod
+    def schluessel(segment: str, source: str, target: str) -> str:
+        return hashlib.sha256(f"{source}\x00{target}\x00{segment}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._eintraege.get(key)
+
+    def put_many(self, eintraege: Dict[str, str]) -> None:
+        """
+        Speichert mehrere übersetzte Segmente und hängt sie an die Cache-Datei an.
+        :param eintraege: Dict Schlüssel -> Übersetzung
+        """
+        if not eintraege:
+            return
+        with self._lock:
+            self._eintraege.update(eintraege)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for key, text in eintraege.items():
+                    json.dump({"key": key, "text": text}, f, ensure_ascii=False)
+                    f.write("\n")
+
+    def __len__(self) -> int:
+        return len(self._eintraege)
+
+
+def google_backend(source: str = "en", target: str = "de") -> Backend:
+    """
+    Backend über deep_translator.GoogleTranslator (ein Translator pro Thread).
+    :param source: Quellsprache
+    :param target: Zielsprache
+    :return: Backend-Funktion
+    """
+    from deep_translator import GoogleTranslator
+
+    lokal = threading.local()
+
+    def uebersetze(segmente: List[str]) -> List[Optional[str]]:
+        if not hasattr(lokal, "translator"):
+            lokal.translator = GoogleTranslator(source=source, target=target)
+        ergebnis: List[Optional[str]] = []
+        for segment in segmente:  # einzeln abfangen: ein fehlerhaftes Segment kostet nicht den ganzen Batch
+            try:
+                ergebnis.append(lokal.translator.translate(segment) or segment)
+            except Exception as e:
+                print(f"⚠️ Fehler bei Übersetzung eines Segments: {e}")
+                ergebnis.append(None)
+        return ergebnis
+
+    return uebersetze
+
+
+def stub_backend(source: str = "en", target: str = "de") -> Backend:
+    """
+    Lokales Test-/Benchmark-Backend ohne Netzwerk: markiert Segmente nur mit der Zielsprache.
+    :param source: Quellsprache
+    :param target: Zielsprache
+    :return: Backend-Funktion
+    """
+    return lambda segmente: [f"[{target}] {s}" for s in segmente]
+
+
+BACKENDS: Dict[str, Callable[[str, str], Backend]] = {
+    "google": google_backend,
+    "stub": stub_backend,
+}
+
+
+class SegmentTranslator:
+    """
+    Übersetzt Dokumente segmentweise: bereits bekannte Segmente kommen aus dem Cache,
+    neue werden in Batches über einen begrenzten Thread-Pool an das Backend geschickt.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        cache: TranslationCache,
+        source: str = "en",
+        target: str = "de",
+        workers: int = 4,
+        batch_size: int = 16,
+        max_chars: int = MAX_SEGMENT_CHARS,
+    ) -> None:
+        """
+        :param backend: Übersetzungs-Backend
+        :param cache: Segment-Cache
+        :param source: Quellsprache
+        :param target: Zielsprache
+        :param workers: Anzahl paralleler Backend-Aufrufe
+        :param batch_size: Segmente pro Backend-Aufruf
+        :param max_chars: Maximale Zeichen pro Segment
+        """
+        self.backend = backend
+        self.cache = cache
+        self.source = source
+        self.target = target
+        self.batch_size = max(1, batch_size)
+        self.max_chars = max_chars
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.stats = {"segmente": 0, "cache_treffer": 0, "uebersetzt": 0, "fehler": 0}
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def _batch(self, segmente: List[str]) -> List[Optional[str]]:
+        try:
+            ergebnis = self.backend(segmente)
+        except Exception as e:
+            print(f"⚠️ Fehler bei Übersetzung: {e}")
+            return [None] * len(segmente)
+        return ergebnis if len(ergebnis) == len(segmente) else [None] * len(segmente)
+
+    def translate(self, text: str) -> str:
+        """
+        Übersetzt einen Text; Segmente, deren Übersetzung fehlschlägt, bleiben im Original.
+        :param text: Eingabetext
+        :return: Übersetzter Text
+        """
+        teile = segmentiere(text, self.max_chars)
+        keys = [self.cache.schluessel(t, self.source, self.target) if _zu_uebersetzen(t) else None for t in teile]
+        offen: Dict[str, str] = {}
+        for teil, key in zip(teile, keys):
+            if key is None:
+                continue
+            self.stats["segmente"] += 1
+            if self.cache.get(key) is not None:
+                self.stats["cache_treffer"] += 1
+            else:
+                offen[key] = teil
+
+        offene_keys = list(offen)
+        batches = [offene_keys[i:i + self.batch_size] for i in range(0, len(offene_keys), self.batch_size)]
+        neu: Dict[str, str] = {}
+        for batch, ergebnis in zip(batches, self.executor.map(self._batch, [[offen[k] for k in b] for b in batches])):
+            for key, uebersetzung in zip(batch, ergebnis):
+                if uebersetzung is None:
+                    self.stats["fehler"] += 1  # bleibt im Original und wird nicht gecacht
+                else:
+                    neu[key] = uebersetzung
+        self.stats["uebersetzt"] += len(neu)
+        self.cache.put_many(neu)
+
+        return "".join(
+            teil if key is None else (neu.get(key) or self.cache.get(key) or teil)
+            for teil, key in zip(teile, keys)
+        )
@@ -2,8 +2,10 @@
 Utility functions for FMGPT.
 """
 import os
+import re
 import json
-from typing import List, Tuple
+import hashlib
+from typing import Dict, List, Optional, Tuple
 
 def speichere_chatverlauf(chat_history: List[Tuple[str, str]], chatverlauf_ordner: str = "prompts/Chatverlauf") -> None:
     """
@@ -21,3 +23,35 @@ def speichere_chatverlauf(chat_history: List[Tuple[str, str]], chatverlauf_ordne
     pfad = os.path.join(chatverlauf_ordner, f"chat_{neue_nummer}.json")
     with open(pfad, "w", encoding="utf-8") as f:
         json.dump(chat_history, f, ensure_ascii=False, indent=2)
+
+def chunk_id(source_id: str, typ: str, text: str, vergeben: Optional[Dict[str, int]] = None) -> str:
+    """
+    Erzeugt eine stabile, inhaltsbasierte Chunk-ID der Form "<id>_<typ>_<hash>".
+    Der Hash hängt nur vom (whitespace-normalisierten) Text ab, sodass eine Änderung an
+    einer Stelle der Quelle die IDs der übrigen Chunks nicht verschiebt.
+    :param source_id: ID der Quelle
+    :param typ: Typ der Quelle (pdf, web, ...)
+    :param text: Chunk-Text
+    :param vergeben: Optionaler Zähler bereits vergebener IDs derselben Quelle; identische
+                     Chunks erhalten dann die Endungen _2, _3, ...
+    :return: Chunk-ID
+    """
+    normalisiert = re.sub(r"\s+", " ", text).strip()
+    basis = f"{source_id}_{typ}_{hashlib.sha1(normalisiert.encode('utf-8')).hexdigest()[:12]}"
+    if vergeben is None:
+        return basis
+    vergeben[basis] = vergeben.get(basis, 0) + 1
+    return basis if vergeben[basis] == 1 else f"{basis}_{vergeben[basis]}"
+
+def aktuelle_chunk_datei(chunk_dir: str = "./output/chunks") -> str:
+    """
+    Wählt die Chunk-Datei für Embedding und Indexaufbau: die deduplizierte Fassung, sofern sie
+    existiert und nicht älter als die Chunk-Datei ist, sonst die Chunk-Datei selbst.
+    :param chunk_dir: Verzeichnis der Chunk-Dateien
+    :return: Pfad zur Chunk-Datei
+    """
+    roh = os.path.join(chunk_dir, "chunked_sources.jsonl")
+    dedup = os.path.join(chunk_dir, "chunked_sources_dedup.jsonl")
+    if os.path.exists(dedup) and (not os.path.exists(roh) or os.path.getmtime(dedup) >= os.path.getmtime(roh)):
+        return dedup
+    return roh
@@ -0,0 +1,244 @@
+"""
+Vector store backends for FMGPT.
+ChromaStore wraps a Chroma collection; NumpyStore keeps the corpus as a memory-mapped, L2-normalized
+float32/float16 matrix with exact top-k by matrix multiplication and precomputed metadata masks.
+Both return results in Chroma's query format, so callers can switch backends via VECTOR_BACKEND.
+"""
+
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")             # "chroma" oder "numpy"
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./output/vector_store")
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")    # "float32" oder "float16"
+MASKEN_FELDER = ("sprache", "typ")  # wenige Werte: Masken beim Laden vorberechnen; andere Felder (quelle) lazy
+_BLOCK = 65536  # Zeilen pro Block bei float16 (Umrechnung nach float32 blockweise)
+
+
+class VectorStore(ABC):
+    """Gemeinsame Schnittstelle der Vektor-Backends."""
+
+    @abstractmethod
+    def query(self, embedding: Any, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Sucht die ähnlichsten Chunks.
+        :param embedding: Embedding der Anfrage
+        :param n_results: Anzahl Treffer
+        :param where: Optionaler Filter im Chroma-Format, z. B. {"sprache": "de"} oder {"sprache": {"$in": ["de", "en"]}}
+        :return: Dict im Chroma-Format (ids, documents, metadatas, distances), je eine Liste pro Anfrage
+        """
+
+    @abstractmethod
+    def get(self, ids: Sequence[str]) -> Dict[str, Any]:
+        """
+        Liest Chunks per ID; unbekannte IDs fehlen im Ergebnis.
+        :return: Dict mit ids, documents, metadatas
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Anzahl der Chunks."""
+
+
+class ChromaStore(VectorStore):
+    """VectorStore über einer Chroma-Collection."""
+
+    def __init__(self, collection: Any) -> None:
+        self.collection = collection
+
+    def query(self, embedding: Any, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.collection.query(query_embeddings=[embedding], n_results=n_results, where=where or None)
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Any]:
+        return self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+class NumpyStore(VectorStore):
+    """
+    Exakte Suche im Speicher. Verzeichnisinhalt: vectors.npy (normalisiert, Memmap) und
+    eintraege.jsonl (id, document, metadata je Zeile, gleiche Reihenfolge).
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: List[str], documents: List[Optional[str]], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        :param vectors: L2-normalisierte Vektoren (n, dim)
+        :param ids: Chunk-IDs
+        :param documents: Chunk-Texte
+        :param metadatas: Metadaten
+        """
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.zeilen = {id_: i for i, id_ in enumerate(ids)}
+        self._masken: Dict[tuple, np.ndarray] = {}
+        for feld in MASKEN_FELDER:
+            werte = np.array([str((m or {}).get(feld, "")) for m in metadatas])
+            for wert in np.unique(werte):
+                self._masken[(feld, wert)] = werte == wert
+
+    @classmethod
+    def laden(cls, store_dir: str) -> "NumpyStore":
+        vectors = np.load(os.path.join(store_dir, "vectors.npy"), mmap_mode="r")
+        ids, documents, metadatas = [], [], []
+        with open(os.path.join(store_dir, "eintraege.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                e = json.loads(line)
+                ids.append(e["id"])
+                documents.append(e.get("document"))
+                metadatas.append(e.get("metadata") or {})
+        return cls(vectors, ids, documents, metadatas)
+
+    def maske(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Kombinierte Filtermaske im Chroma-Filterformat: Gleichheit, $eq, $ne, $in, $nin sowie $and/$or.
+        Nicht vorberechnete Felder werden einmal berechnet und gemerkt.
+        :raises ValueError: bei anderen Operatoren (z. B. $gt), statt stillschweigend falsch zu filtern
+        """
+        if not where:
+            return None
+        maske = np.ones(len(self.ids), dtype=bool)
+        for feld, wert in where.items():
+            if feld in ("$and", "$or"):
+                teile = [self.maske(teil) for teil in wert]
+                teile = [t if t is not None else np.ones(len(self.ids), dtype=bool) for t in teile]
+                if teile:
+                    maske &= np.logical_and.reduce(teile) if feld == "$and" else np.logical_or.reduce(teile)
+            elif feld.startswith("$"):
+                raise ValueError(f"Nicht unterstützter Filteroperator: {feld}")
+            else:
+                maske &= self._feld_maske(feld, wert)
+        return maske
+
+    def _feld_maske(self, feld: str, bedingung: Any) -> np.ndarray:
+        if not isinstance(bedingung, dict):
+            return self._maske(feld, bedingung)
+        maske = np.ones(len(self.ids), dtype=bool)
+        for op, wert in bedingung.items():
+            if op in ("$eq", "$ne"):
+                treffer = self._maske(feld, wert)
+            elif op in ("$in", "$nin"):
+                treffer = np.zeros(len(self.ids), dtype=bool)
+                for w in wert:
+                    treffer |= self._maske(feld, w)
+            else:
+                raise ValueError(f"Nicht unterstützter Filteroperator: {op}")
+            maske &= ~treffer if op in ("$ne", "$nin") else treffer
+        return maske
+
+    def _maske(self, feld: str, wert: Any) -> np.ndarray:
+        key = (feld, str(wert))
+        if key not in self._masken:
+            self._masken[key] = np.array([str((m or {}).get(feld, "")) == str(wert) for m in self.metadatas], dtype=bool)
+        return self._masken[key]
+
+    def scores(self, embedding: Any) -> np.ndarray:
+        if not len(self.vectors):
+            return np.zeros(0, dtype=np.float32)
+        q = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ q
+        out = np.empty(len(self.vectors), dtype=np.float32)
+        for i in range(0, len(self.vectors), _BLOCK):
+            out[i:i + _BLOCK] = self.vectors[i:i + _BLOCK].astype(np.float32) @ q
+        return out
+
+    def query(self, embedding: Any, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        scores = self.scores(embedding)
+        maske = self.maske(where)
+        kandidaten = np.flatnonzero(maske) if maske is not None else np.arange(len(scores))
+        if len(kandidaten) > n_results:
+            kandidaten = kandidaten[np.argpartition(-scores[kandidaten], n_results)[:n_results]]
+        top = kandidaten[np.argsort(-scores[kandidaten], kind="stable")]
+        return {
+            "ids": [[self.ids[i] for i in top]],
+            "documents": [[self.documents[i] for i in top]],
+            "metadatas": [[self.metadatas[i] for i in top]],
+            "distances": [[float(1.0 - scores[i]) for i in top]],  # Cosinus-Distanz
+        }
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Any]:
+        zeilen = [self.zeilen[i] for i in ids if i in self.zeilen]
+        return {
+            "ids": [self.ids[i] for i in zeilen],
+            "documents": [self.documents[i] for i in zeilen],
+            "metadatas": [self.metadatas[i] for i in zeilen],
+        }
+
+    def count(self) -> int:
+        return len(self.ids)
+
+
+def schreibe_numpy_store(
+    store_dir: str,
+    ids: Sequence[str],
+    embeddings: Any,
+    documents: Sequence[Optional[str]],
+    metadatas: Sequence[Dict[str, Any]],
+    dtype: str = VECTOR_STORE_DTYPE,
+) -> None:
+    """
+    Schreibt einen NumpyStore atomar (erst in ein temporäres Verzeichnis, dann umbenannt).
+    :param store_dir: Zielverzeichnis
+    :param ids: Chunk-IDs
+    :param embeddings: Vektoren (n, dim), werden normalisiert
+    :param documents: Chunk-Texte
+    :param metadatas: Metadaten
+    :param dtype: "float32" oder "float16"
+    """
+    tmp = store_dir + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    vecs = np.asarray(embeddings, dtype=np.float32)
+    vecs = vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+    np.save(os.path.join(tmp, "vectors.npy"), vecs.astype(np.dtype(dtype)))
+    with open(os.path.join(tmp, "eintraege.jsonl"), "w", encoding="utf-8") as f:
+        for id_, doc, meta in zip(ids, documents, metadatas):
+            f.write(json.dumps({"id": id_, "document": doc, "metadata": meta}, ensure_ascii=False) + "\n")
+    alt = store_dir + ".alt"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, alt)
+    os.replace(tmp, store_dir)
+    shutil.rmtree(alt, ignore_errors=True)
+
+
+def exportiere_aus_chroma(collection: Any, store_dir: str, dtype: str = VECTOR_STORE_DTYPE, page_size: int = 5000) -> int:
+    """
+    Exportiert eine Chroma-Collection seitenweise als NumpyStore.
+    :return: Anzahl exportierter Chunks
+    """
+    ids, vecs, docs, metas = [], [], [], []
+    offset = 0
+    while True:
+        seite = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids.extend(seite["ids"])
+        vecs.extend(seite["embeddings"])
+        docs.extend(seite["documents"] if seite.get("documents") is not None else [None] * len(seite["ids"]))
+        metas.extend(seite["metadatas"] if seite.get("metadatas") is not None else [{}] * len(seite["ids"]))
+        if len(seite["ids"]) < page_size:
+            break
+        offset += page_size
+    # leere Collection (z. B. Partition ohne Chunks): leerer Store, reshape(0, -1) wäre mehrdeutig
+    matrix = np.array(vecs, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), dtype=np.float32)
+    schreibe_numpy_store(store_dir, ids, matrix, docs, metas, dtype)
+    return len(ids)
+
+
+def veraltete_stores(store_root: str, aktive: Iterable[str]) -> List[str]:
+    """Store-Verzeichnisse, deren Collection-Version nicht mehr existiert."""
+    if not os.path.isdir(store_root):
+        return []
+    aktive = set(aktive)
+    return [
+        os.path.join(store_root, name) for name in sorted(os.listdir(store_root))
+        if os.path.isdir(os.path.join(store_root, name)) and name not in aktive
+    ]
@@ -0,0 +1,131 @@
+"""
+Concurrent web fetching utilities for FMGPT.
+Provides a pooled HTTP session with per-host concurrency limits, rate limiting and retries.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuscodes, bei denen ein erneuter Versuch sinnvoll ist
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class WebFetcher:
+    """
+    Lädt Webseiten über eine gemeinsame Keep-Alive-Session mit begrenzter Parallelität.
+    Pro Host werden gleichzeitige Anfragen begrenzt und ein Mindestabstand zwischen
+    zwei Anfragen eingehalten; fehlgeschlagene Anfragen werden mit Backoff wiederholt.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        min_interval: float = 0.0,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 15,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        """
+        :param max_workers: Anzahl paralleler Worker-Threads
+        :param per_host_limit: Maximale gleichzeitige Anfragen pro Host
+        :param min_interval: Mindestabstand in Sekunden zwischen zwei Anfragen an denselben Host
+        :param retries: Anzahl Wiederholungen nach dem ersten Versuch
+        :param backoff: Basis-Wartezeit in Sekunden (verdoppelt sich pro Versuch)
+        :param timeout: Timeout pro Anfrage in Sekunden
+        :param session: Optional vorkonfigurierte Session
+        """
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self._host_next: Dict[str, float] = {}
+
+    def __enter__(self) -> "WebFetcher":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Schließt die Session und alle offenen Verbindungen."""
+        self.session.close()
+
+    def _slot(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _wait_for_turn(self, host: str) -> None:
+        # Reserviert den nächsten freien Zeitpunkt für diesen Host und wartet bis dahin
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, now))
+            self._host_next[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        Führt einen GET-Request mit Host-Limits, Rate-Limit und Wiederholungen aus.
+        :param url: Ziel-URL
+        :param headers: Optionale zusätzliche Header
+        :return: Letzte erhaltene Antwort
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            last_try = attempt == self.retries
+            with self._slot(host):
+                self._wait_for_turn(host)
+                try:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    if last_try:
+                        raise
+                    response = None
+            if response is not None and (response.status_code not in RETRY_STATUS or last_try):
+                return response
+            time.sleep(self._retry_delay(response, attempt))
+        raise RuntimeError("unreachable")
+
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt)
+
+    def imap(self, func: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        """
+        Wendet func parallel auf alle Elemente an und liefert die Ergebnisse in Eingabereihenfolge,
+        sobald sie verfügbar sind.
+        :param func: Funktion pro Element (z.B. URL -> Text)
+        :param items: Eingabeelemente
+        :return: Iterator über die Ergebnisse
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(func, items)
+
+    def map(self, func: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """
+        Wie imap, sammelt die Ergebnisse aber in einer Liste.
+        :param func: Funktion pro Element (z.B. URL -> Text)
+        :param items: Eingabeelemente
+        :return: Ergebnisse in Eingabereihenfolge
+        """
+        return list(self.imap(func, items))
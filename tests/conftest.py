@@ -0,0 +1,9 @@
+"""
+Pytest configuration for FMGPT.
+Adds the scripts directory to sys.path so sibling imports inside the scripts resolve.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
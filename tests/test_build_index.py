@@ -0,0 +1,145 @@
+"""
+Test utilities for FMGPT unified index builder.
+"""
+
+import os
+
+import chromadb
+import numpy as np
+import pytest
+from scripts.build_index import (
+    entferne_verwaiste_segmente, lade_embeddings, schreibe_batches, synchronisiere, synchronisiere_partitionen,
+    verwaiste_segmente,
+)
+
+
+def _meta(id_, thema="Taktik"):
+    return {"chunk_id": id_, "quelle": "q", "typ": "pdf", "thema": thema, "sprache": "de"}
+
+
+def test_synchronisiere_updates_in_place(tmp_path):
+    """
+    Test that a second sync only embeds new chunks and removes stale ones.
+    """
+    client = chromadb.PersistentClient(path=str(tmp_path / "db"))
+    collection = client.get_or_create_collection("chunks_test")
+    eingebettet = []
+
+    def embed(ids):
+        eingebettet.extend(ids)
+        return np.ones((len(ids), 4), dtype=np.float32)
+
+    texte = {"a": "Pressing", "b": "Training", "c": "Moral"}
+    synchronisiere(collection, {i: _meta(i) for i in "ab"}, texte, embed)
+    stats = synchronisiere(collection, {"b": _meta("b", "Neu"), "c": _meta("c")}, texte, embed)
+    assert eingebettet == ["a", "b", "c"]
+    assert stats == {"hinzugefuegt": 1, "aktualisiert": 1, "geloescht": 1, "unveraendert": 0}
+    assert sorted(collection.get()["ids"]) == ["b", "c"]
+    assert collection.get(ids=["b"])["metadatas"][0]["thema"] == "Neu"
+
+
+def test_orphaned_segments_are_removed(tmp_path):
+    """
+    Test that segment directories left by delete_collection are removed and live ones are kept.
+    """
+    pfad = str(tmp_path / "db")
+    client = chromadb.PersistentClient(path=pfad)
+    for _ in range(2):
+        if "chunks_test" in [c.name for c in client.list_collections()]:
+            client.delete_collection("chunks_test")
+        collection = client.get_or_create_collection("chunks_test")
+        collection.add(ids=["a"], embeddings=np.ones((1, 4), dtype=np.float32))
+    vorher = [d for d in os.listdir(pfad) if os.path.isdir(os.path.join(pfad, d))]
+    assert len(verwaiste_segmente(pfad)) == len(vorher) - 1
+
+    anzahl, frei = entferne_verwaiste_segmente(pfad)
+    assert anzahl == len(vorher) - 1 and frei > 0
+    assert verwaiste_segmente(pfad) == []
+    assert collection.count() == 1
+
+
+def test_gc_skipped_without_sqlite(tmp_path):
+    """
+    Test that no directory is treated as orphaned when chroma.sqlite3 is missing.
+    """
+    (tmp_path / "1453769d-680a-4c6c-be48-2bf205a5ac9f").mkdir()
+    assert verwaiste_segmente(str(tmp_path)) is None
+    assert entferne_verwaiste_segmente(str(tmp_path)) == (0, 0)
+    assert os.path.isdir(tmp_path / "1453769d-680a-4c6c-be48-2bf205a5ac9f")
+
+
+def test_lade_embeddings_maps_rows(tmp_path):
+    """
+    Test that precomputed embeddings are mapped to their chunk IDs by row.
+    """
+    np.save(tmp_path / "emb.npy", np.arange(6, dtype=np.float32).reshape(3, 2))
+    (tmp_path / "meta.jsonl").write_text(
+        "\n".join('{"chunk_id": "%s"}' % i for i in ["x", "y", "x"]) + "\n", encoding="utf-8"
+    )
+    embeddings, metadaten, zeilen = lade_embeddings(str(tmp_path / "emb.npy"), str(tmp_path / "meta.jsonl"))
+    assert list(metadaten) == ["x", "y"]
+    assert embeddings[zeilen["y"]].tolist() == [2.0, 3.0]
+
+
+class _RecordingCollection:
+    def __init__(self, fehler_bei=None):
+        self.ids = []
+        self.fehler_bei = fehler_bei
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        if ids[0] == self.fehler_bei:
+            raise RuntimeError("Schreibfehler")
+        assert isinstance(embeddings, np.ndarray)
+        self.ids.extend(ids)
+
+
+def test_schreibe_batches_pipelined_keeps_order():
+    """
+    Test that the pipelined build writes every batch in order, like the sequential build.
+    """
+    ids = [f"c{i}" for i in range(25)]
+    metadaten = {i: _meta(i) for i in ids}
+    embed = lambda batch: np.ones((len(batch), 2), dtype=np.float32)
+    for queue_size in (0, 2):
+        collection = _RecordingCollection()
+        geschrieben = []
+        schreibe_batches(collection, ids, metadaten, {}, embed, batch_size=4, queue_size=queue_size, progress=geschrieben.append)
+        assert collection.ids == ids
+        assert sum(geschrieben) == 25
+
+
+def test_schreibe_batches_propagates_errors():
+    """
+    Test that embedding and write errors surface in the caller and stop the producer.
+    """
+    ids = [f"c{i}" for i in range(20)]
+    metadaten = {i: _meta(i) for i in ids}
+
+    def kaputt(batch):
+        if "c8" in batch:
+            return np.full((len(batch), 2), np.nan, dtype=np.float32)
+        return np.ones((len(batch), 2), dtype=np.float32)
+
+    with pytest.raises(ValueError):
+        schreibe_batches(_RecordingCollection(), ids, metadaten, {}, kaputt, batch_size=4, queue_size=1)
+    with pytest.raises(RuntimeError):
+        schreibe_batches(
+            _RecordingCollection(fehler_bei="c4"), ids, metadaten, {},
+            lambda b: np.ones((len(b), 2), dtype=np.float32), batch_size=4, queue_size=1,
+        )
+
+
+def test_partitions_copy_embeddings_per_language(tmp_path):
+    """
+    Test that language partitions hold only their language and reuse the stored embeddings.
+    """
+    client = chromadb.PersistentClient(path=str(tmp_path / "db"))
+    collection = client.get_or_create_collection("chunks_test")
+    metadaten = {"a": _meta("a"), "b": {**_meta("b"), "sprache": "en"}, "c": _meta("c")}
+    vektoren = {"a": [1, 0], "b": [0, 1], "c": [1, 1]}
+    synchronisiere(collection, metadaten, {}, lambda ids: np.array([vektoren[i] for i in ids], dtype=np.float32))
+    stats = synchronisiere_partitionen(client, collection, metadaten, {"a": "Pressing"}, ["de", "en"])
+    assert stats["de"]["hinzugefuegt"] == 2 and stats["en"]["hinzugefuegt"] == 1
+    de = client.get_collection("chunks_test__de").get(ids=["c", "a"], include=["embeddings", "documents"])
+    assert dict(zip(de["ids"], [list(e) for e in de["embeddings"]])) == {"a": [1, 0], "c": [1, 1]}
+    assert sorted(client.get_collection("chunks_test__en").get()["ids"]) == ["b"]
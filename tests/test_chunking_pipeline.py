@@ -0,0 +1,71 @@
+"""
+Test utilities for FMGPT chunking pipeline (V2) module.
+"""
+
+import json
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+from scripts import chunking_pipeline_V2 as pipeline
+
+FIXTURE = [
+    {"id": "1", "typ": "pdf", "quelle": "guide.pdf", "thema": "Taktik", "sprache": "de",
+     "text": "Gegenpressing erzeugt Ballgewinne. " * 50 + "Die Viererkette bleibt kompakt."},
+    {"id": "2", "typ": "web", "quelle": "https://example.org", "thema": "Training", "sprache": "en",
+     "text": "Training affects morale. Rest days matter! " * 25},
+    {"id": "3", "typ": "web", "quelle": "https://example.org/leer", "thema": "", "sprache": "de", "text": "   "},
+    {"id": "4", "typ": "pdf", "quelle": "roles.pdf", "thema": "Rollen", "sprache": "fr",
+     "text": "Le meneur de jeu organise. Le libero couvre."},
+]
+
+
+@pytest.fixture
+def sentencizer_models(monkeypatch):
+    models = {}
+    for lang in ("de", "en"):
+        nlp = spacy.blank(lang)
+        nlp.add_pipe("sentencizer")
+        models[lang] = nlp
+    monkeypatch.setattr(pipeline, "spacy_models", models)
+    return models
+
+
+def test_batched_pipeline_matches_chunk_text_semantic(tmp_path, sentencizer_models):
+    """
+    Test that batched nlp.pipe segmentation yields the same chunks as per-document chunk_text_semantic.
+    """
+    input_file = tmp_path / "extracted_sources.jsonl"
+    input_file.write_text("\n".join(json.dumps(e) for e in FIXTURE), encoding="utf-8")
+
+    erwartet = {
+        e["id"]: pipeline.chunk_text_semantic(e["text"], e["sprache"])
+        for e in FIXTURE if e["text"].strip()
+    }
+    ergebnis = {
+        entry["id"]: chunks
+        for entry, chunks in pipeline.iter_chunked_docs([str(input_file)], batch_size=2, n_process=1)
+    }
+    assert ergebnis == erwartet
+    assert len(erwartet["1"]) > 1
+
+
+def test_streaming_windows_match_whole_document(tmp_path, monkeypatch, sentencizer_models):
+    """
+    Test that windowed segmentation of a long text yields the same chunks as segmenting it at once.
+    """
+    text = "\n".join(f"Satz Nummer {i} beschreibt die Rolle des Spielmachers im Zentrum." for i in range(200))
+    erwartet = pipeline.chunk_text_semantic(text, "de")
+
+    monkeypatch.setattr(pipeline, "WINDOW_CHARS", 500)
+    nlp = sentencizer_models["de"]
+    nlp.max_length = 1000  # längere Eingaben würden fehlschlagen
+    chunks = list(pipeline.iter_chunks(pipeline.iter_sentences_streaming(text, nlp, window_chars=500)))
+    assert chunks == erwartet
+    assert all(len(w) <= 500 for w in pipeline.iter_windows(text, 500))
+
+    input_file = tmp_path / "long.jsonl"
+    input_file.write_text(json.dumps({"id": "9", "typ": "pdf", "sprache": "de", "text": text}), encoding="utf-8")
+    ergebnis = [list(c) for _, c in pipeline.iter_chunked_docs([str(input_file)], n_process=1)]
+    assert ergebnis == [erwartet]
+
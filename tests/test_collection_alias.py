@@ -0,0 +1,71 @@
+"""
+Test utilities for FMGPT collection alias module.
+"""
+
+import os
+
+import pytest
+from scripts.collection_alias import (
+    aktive_collection, aktive_revision, alias_pfad, erhoehe_revision, partitionen_von, pruefe_collection, rollback, setze_alias,
+    vergiss_versionen, zu_loeschende_versionen,
+)
+
+
+class _FakeCollection:
+    def __init__(self, anzahl, treffer):
+        self.anzahl = anzahl
+        self.treffer = treffer
+
+    def count(self):
+        return self.anzahl
+
+    def query(self, query_embeddings, n_results):
+        return {"ids": [["x"] * min(self.treffer, n_results) for _ in query_embeddings]}
+
+
+def test_unversioned_alias_resolves_to_itself(tmp_path):
+    """
+    Test that an alias without entry resolves to the collection of the same name.
+    """
+    assert aktive_collection(str(tmp_path), "chunks_semantic") == "chunks_semantic"
+    assert aktive_revision(str(tmp_path), "chunks_semantic") == 0
+    assert erhoehe_revision(str(tmp_path), "chunks_semantic") == 1
+    assert aktive_collection(str(tmp_path), "chunks_semantic") == "chunks_semantic"
+
+
+def test_switch_rollback_and_retention(tmp_path):
+    """
+    Test that switching keeps the history, rollback returns to the predecessor and pruning spares the active version.
+    """
+    d = str(tmp_path)
+    setze_alias(d, "chunks", "chunks__v1", vorher="chunks")
+    setze_alias(d, "chunks", "chunks__v2")
+    assert aktive_collection(d, "chunks") == "chunks__v2"
+    assert not os.path.exists(alias_pfad(d) + ".tmp")
+    assert zu_loeschende_versionen(d, "chunks", behalten=2) == ["chunks"]
+
+    assert rollback(d, "chunks") == "chunks__v1"
+    assert aktive_collection(d, "chunks") == "chunks__v1"
+    assert zu_loeschende_versionen(d, "chunks", behalten=1) == ["chunks"]
+
+    vergiss_versionen(d, "chunks", ["chunks"])
+    with pytest.raises(ValueError):
+        rollback(d, "chunks")
+
+
+def test_pruefe_collection():
+    """
+    Test that the smoke check reports wrong counts and empty results.
+    """
+    assert pruefe_collection(_FakeCollection(10, 3), [[0.1], [0.2]], 10) == []
+    fehler = pruefe_collection(_FakeCollection(8, 0), [[0.1]], 10)
+    assert len(fehler) == 2
+
+
+def test_partitionen_von_matches_only_language_suffixes():
+    """
+    Test that only language partitions of the given version are matched, not other versions.
+    """
+    vorhanden = ["chunks", "chunks__de", "chunks__en", "chunks__v20250101T120000", "chunks__v20250101T120000__de"]
+    assert partitionen_von("chunks", vorhanden) == ["chunks__de", "chunks__en"]
+    assert partitionen_von("chunks__v20250101T120000", vorhanden) == ["chunks__v20250101T120000__de"]
@@ -0,0 +1,30 @@
+"""
+Test utilities for FMGPT chunk deduplication module.
+"""
+
+from scripts.dedup_chunks import Deduplicator
+
+BASIS = (
+    "Der Trainingsplan im Football Manager legt fest, wie intensiv die Spieler "
+    "an Fitness, Taktik und Standardsituationen arbeiten und wie viel Erholung sie bekommen."
+)
+
+
+def test_exact_and_near_duplicates_are_removed():
+    """
+    Test that exact and near-duplicate chunks are removed and mapped to their representative.
+    """
+    chunks = [
+        {"chunk_id": "1_pdf_a", "text": BASIS},
+        {"chunk_id": "2_web_b", "text": "  " + BASIS.upper() + " "},
+        {"chunk_id": "3_web_c", "text": BASIS.replace("Erholung", "Pause")},
+        {"chunk_id": "4_web_d", "text": "Ein Innenverteidiger mit hoher Antizipation fängt viele Pässe ab."},
+        {"chunk_id": "1_pdf_a", "text": BASIS},
+    ]
+    dedup = Deduplicator(threshold=0.8)
+    behalten = [c["chunk_id"] for c in dedup.filter(chunks)]
+
+    assert behalten == ["1_pdf_a", "4_web_d"]
+    assert dedup.mapping == {"2_web_b": "1_pdf_a", "3_web_c": "1_pdf_a"}
+    assert dedup.stats["exakt"] == 2
+    assert dedup.stats["aehnlich"] == 1
@@ -0,0 +1,71 @@
+"""
+Test utilities for FMGPT embedding cache module.
+"""
+
+import numpy as np
+from scripts.embedding_cache import CachedEmbeddingFunction, EmbeddingCache, encode_cached
+
+
+class _CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_bulk_get_put_and_normalization(tmp_path):
+    """
+    Test that bulk lookups find stored vectors and whitespace differences share a key.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("m", ["Pressing hoch", "Abwehr"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    treffer = cache.get_many("m", ["Pressing  hoch ", "Neu", "Abwehr"])
+    assert treffer[0].tolist() == [1, 2]
+    assert treffer[1] is None
+    assert treffer[2].tolist() == [3, 4]
+    assert cache.get_many("anderes-modell", ["Abwehr"]) == [None]
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    """
+    Test that the cache evicts least recently used entries beyond max_entries.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put_many("m", ["a"], [[1.0]])
+    cache.put_many("m", ["b"], [[2.0]])
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], [[3.0]])
+    assert len(cache) == 2
+    assert cache.get_many("m", ["a", "b", "c"])[1] is None
+
+
+def test_encode_cached_only_encodes_misses(tmp_path):
+    """
+    Test that encode_cached and CachedEmbeddingFunction only call the model for unseen texts.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    model = _CountingModel()
+    encode_cached(model, "m", ["eins", "zwei"], cache)
+    vecs = encode_cached(model, "m", ["zwei", "drei"], cache)
+    assert model.encoded == ["eins", "zwei", "drei"]
+    assert vecs[:, 0].tolist() == [4, 4]
+
+    embed_fn = CachedEmbeddingFunction("m", cache)
+    embed_fn._model = model
+    assert embed_fn("eins")[0].tolist() == [4, 1]
+    assert model.encoded == ["eins", "zwei", "drei"]
+
+
+def test_vorladen_bypasses_cache(tmp_path):
+    """
+    Test that vorladen loads and runs the model even when the text is already cached.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("m", ["Pressing"], [[1.0, 1.0]])
+    model = _CountingModel()
+    embed_fn = CachedEmbeddingFunction("m", cache)
+    embed_fn._lade_modell = lambda: model
+    assert embed_fn.vorladen("Pressing") >= 0
+    assert model.encoded == ["Pressing"]
@@ -0,0 +1,55 @@
+"""
+Test utilities for FMGPT embedding engine module.
+"""
+
+import numpy as np
+from scripts.embedding_engine import embed_to_memmap
+
+
+class _FakeModel:
+    """Encodes a text as [word count, first char code, 1] and records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, batch_size, show_progress_bar, convert_to_numpy):
+        self.batches.append([len(t.split()) for t in texts])
+        return np.array([[len(t.split()), ord(t[0]), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_embed_to_memmap_keeps_input_order(tmp_path):
+    """
+    Test that vectors land at their input position and blocks are sorted by length.
+    """
+    texts = ["a", "b b b b", "c c", "d d d", "e"]
+    model = _FakeModel()
+    out_path = tmp_path / "embeddings.npy"
+    stats = embed_to_memmap(model, texts, str(out_path), dtype="float16", batch_size=2)
+
+    emb = np.load(out_path)
+    assert emb.dtype == np.float16
+    assert emb.shape == (5, 3)
+    assert emb[:, 0].tolist() == [1, 4, 2, 3, 1]
+    assert emb[:, 1].tolist() == [ord(t[0]) for t in texts]
+    assert model.batches[0] == sorted(model.batches[0], reverse=True)
+    assert stats["anzahl"] == 5
+
+
+def test_embed_to_memmap_uses_cache(tmp_path):
+    """
+    Test that cached texts are not encoded again on a rebuild.
+    """
+    from scripts.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    texts = ["a", "b b", "c c c"]
+    embed_to_memmap(_FakeModel(), texts, str(tmp_path / "1.npy"), cache=cache, model_name="fake")
+
+    model = _FakeModel()
+    stats = embed_to_memmap(model, texts + ["d d"], str(tmp_path / "2.npy"), cache=cache, model_name="fake")
+    assert model.batches == [[2]]
+    assert stats["aus_cache"] == 3
+    assert np.load(tmp_path / "2.npy")[:, 0].tolist() == [1, 2, 3, 2]
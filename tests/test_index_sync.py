@@ -0,0 +1,35 @@
+"""
+Test utilities for FMGPT index synchronisation module.
+"""
+
+from scripts.index_sync import lade_vorhandene, plan_sync
+
+
+class _FakeCollection:
+    def __init__(self, eintraege):
+        self.eintraege = eintraege
+
+    def get(self, include, limit, offset):
+        ids = list(self.eintraege)[offset:offset + limit]
+        return {"ids": ids, "metadatas": [self.eintraege[i] for i in ids]}
+
+
+def test_plan_sync():
+    """
+    Test that plan_sync splits chunks into add, update, delete and unchanged.
+    """
+    vorhandene = {"a": {"thema": "Taktik"}, "b": {"thema": "Training"}, "c": {"thema": "Alt"}}
+    neue = {"a": {"thema": "Taktik"}, "b": {"thema": "Training & Moral"}, "d": {"thema": "Neu"}}
+    plan = plan_sync(neue, vorhandene)
+    assert plan.add == ["d"]
+    assert plan.update == ["b"]
+    assert plan.delete == ["c"]
+    assert plan.unchanged == ["a"]
+
+
+def test_lade_vorhandene_pages_through_collection():
+    """
+    Test that lade_vorhandene reads all pages of a collection.
+    """
+    eintraege = {f"id_{i}": {"n": i} for i in range(7)}
+    assert lade_vorhandene(_FakeCollection(eintraege), page_size=3) == eintraege
@@ -0,0 +1,56 @@
+"""
+Test utilities for FMGPT ingestion manifest module.
+"""
+
+import os
+from scripts.ingest_manifest import IngestManifest, NEU, GEAENDERT, WIEDERVERWENDET
+
+
+def _manifest(tmp_path):
+    return IngestManifest(str(tmp_path / "manifest.json"), str(tmp_path / "cache"))
+
+
+def test_pdf_fingerprint_reuse_and_change(tmp_path):
+    """
+    Test that an unchanged PDF is reused and a modified one is detected.
+    """
+    pdf = tmp_path / "guide.pdf"
+    pdf.write_bytes(b"%PDF-1 version A")
+    manifest = _manifest(tmp_path)
+    assert not manifest.pdf_unveraendert("pdf:1", str(pdf))
+    manifest.record_pdf("pdf:1", str(pdf), "Text A")
+    manifest.save()
+    assert manifest.status == {"pdf:1": NEU}
+
+    manifest = _manifest(tmp_path)
+    assert manifest.pdf_unveraendert("pdf:1", str(pdf))
+    # Gleicher Inhalt, neue mtime: Hash entscheidet
+    os.utime(pdf, ns=(1, 1))
+    assert manifest.pdf_unveraendert("pdf:1", str(pdf))
+    assert manifest.reuse("pdf:1") == "Text A"
+
+    pdf.write_bytes(b"%PDF-1 version B")
+    assert not manifest.pdf_unveraendert("pdf:1", str(pdf))
+    manifest.record_pdf("pdf:1", str(pdf), "Text B")
+    assert manifest.zusammenfassung() == {NEU: 0, GEAENDERT: 1, WIEDERVERWENDET: 0}
+
+
+def test_conditional_headers_and_prune(tmp_path):
+    """
+    Test that stored validators become conditional headers and removed sources are pruned.
+    """
+    manifest = _manifest(tmp_path)
+    url = "http://example.invalid/fm"
+    assert manifest.conditional_headers("web:2", url) == {}
+    manifest.record_url("web:2", url, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, "Webtext")
+    manifest.record_url("web:3", url + "/alt", {}, "Alt")
+    manifest.save(aktive=["web:2"])
+
+    manifest = _manifest(tmp_path)
+    assert manifest.conditional_headers("web:2", url) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert manifest.conditional_headers("web:2", url + "/neu") == {}
+    assert "web:3" not in manifest.eintraege
+    assert manifest.reuse("web:2") == "Webtext"
@@ -0,0 +1,53 @@
+"""
+Test utilities for FMGPT lexical BM25 index module.
+"""
+
+from scripts.lexical_index import LexicalIndex, lade_oder_baue, tokenisiere
+
+EINTRAEGE = [
+    {"chunk_id": "a", "text": "Der Regista verteilt die Bälle aus der Tiefe.", "sprache": "de", "typ": "pdf"},
+    {"chunk_id": "b", "text": "Gegenpressing erfordert hohe Ausdauer und Arbeitsrate.", "sprache": "de", "typ": "pdf"},
+    {"chunk_id": "c", "text": "The regista role dictates tempo from deep positions.", "sprache": "en", "typ": "web"},
+    {"chunk_id": "a", "text": "Duplikat", "sprache": "de", "typ": "pdf"},
+]
+
+
+def test_tokenisiere_normalizes_german_and_english():
+    """
+    Test that stopwords are dropped, umlauts folded and simple inflections share a stem.
+    """
+    assert tokenisiere("Die Bälle") == tokenisiere("baelle") == ["baell"]
+    assert tokenisiere("Trainingseinheiten") == tokenisiere("Trainingseinheit")
+    assert tokenisiere("inverted wingers") == tokenisiere("Inverted Winger")
+
+
+def test_suche_ranks_exact_terms_and_filters():
+    """
+    Test that BM25 finds exact terms and respects the language filter.
+    """
+    index = LexicalIndex.bauen(EINTRAEGE)
+    assert len(index) == 3
+    assert {i for i, _ in index.suche("Regista")} == {"a", "c"}
+    assert [i for i, _ in index.suche("Regista", where={"sprache": "en"})] == ["c"]
+    assert index.suche("Gegenpressing Ausdauer", k=1)[0][0] == "b"
+    assert index.suche("Torwart") == []
+
+
+def test_persistence_and_rebuild_on_change(tmp_path):
+    """
+    Test that the index is persisted and rebuilt only when the chunk file changes.
+    """
+    import json
+    import os
+
+    chunk_file = tmp_path / "chunks.jsonl"
+    chunk_file.write_text("\n".join(json.dumps(e) for e in EINTRAEGE[:2]) + "\n", encoding="utf-8")
+    pfad = str(tmp_path / "bm25.npz")
+    index = lade_oder_baue(str(chunk_file), pfad)
+    geladen = lade_oder_baue(str(chunk_file), pfad)
+    assert geladen.ids == index.ids and geladen.suche("Regista") == index.suche("Regista")
+
+    with open(chunk_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(EINTRAEGE[2]) + "\n")
+    os.utime(chunk_file, ns=(0, os.stat(chunk_file).st_mtime_ns + 10**9))
+    assert len(lade_oder_baue(str(chunk_file), pfad)) == 3
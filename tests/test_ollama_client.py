@@ -0,0 +1,204 @@
+"""
+Test utilities for FMGPT Ollama client module.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from scripts.ollama_client import OllamaClient, OllamaFehler, OllamaUeberlastet
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    """
+    Fake-Ollama: streamt je nach Prompt normal, mit Fehler mitten im Stream oder ohne Abschluss;
+    ohne Streaming antwortet es nach `dauer` Sekunden. Zählt gleichzeitige Anfragen und Client-Ports.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep-Alive
+    lock = threading.Lock()
+    aktiv = max_aktiv = 0
+    ports = set()
+    fehlschlaege = {}
+    anfragen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        cls.anfragen.append((self.path, body))
+        if "messages" in body:  # /api/chat: antwortet mit der Zahl der Nachrichten
+            self._json(200, {"message": {"content": str(len(body["messages"]))}, "done": True, "load_duration": 5_000_000, "prompt_eval_duration": 2_000_000})
+            return
+        body.setdefault("prompt", "")
+        with cls.lock:
+            cls.ports.add(self.client_address[1])
+            offen = cls.fehlschlaege.get(body["prompt"], 0)
+            cls.fehlschlaege[body["prompt"]] = max(offen - 1, 0)
+            cls.aktiv += 1
+            cls.max_aktiv = max(cls.max_aktiv, cls.aktiv)
+        try:
+            if offen:
+                self._json(503, {"error": "server busy"})
+            elif not body.get("stream"):
+                time.sleep(float(body.get("dauer", 0)))
+                self._json(200, {"response": f"Antwort auf {body['prompt']}", "done": True})
+            else:
+                self._streame(body)
+        finally:
+            with cls.lock:
+                cls.aktiv -= 1
+
+    def _json(self, status, daten):
+        roh = json.dumps(daten).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(roh)))
+        self.end_headers()
+        self.wfile.write(roh)
+
+    def _streame(self, body):
+        self.close_connection = True  # NDJSON ohne Content-Length: Ende = Verbindungsende
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        zeilen = [{"response": t, "done": False} for t in ("Gegen", "pressing", " hilft")]
+        if body["prompt"] == "fehler":
+            zeilen = zeilen[:1] + [{"error": "model runner has unexpectedly stopped"}]
+        elif body["prompt"] != "abgeschnitten":
+            zeilen.append({"response": "", "done": True, "prompt_eval_count": 12, "eval_count": 3})
+        try:
+            for zeile in zeilen:
+                self.wfile.write((json.dumps(zeile) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(float(body.get("pause", 0)))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def ollama_url():
+    _FakeOllama.aktiv = _FakeOllama.max_aktiv = 0
+    _FakeOllama.ports = set()
+    _FakeOllama.fehlschlaege = {}
+    _FakeOllama.anfragen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+    server.shutdown()
+
+
+def test_stream_yields_tokens_and_timings(ollama_url):
+    """
+    Test that tokens arrive one by one and TTFT, total time and Ollama metrics are recorded.
+    """
+    stream = OllamaClient(ollama_url).stream({"model": "m", "prompt": "ok"})
+    assert list(stream) == ["Gegen", "pressing", " hilft"]
+    assert stream.fertig and not stream.abgebrochen and stream.text == "Gegenpressing hilft"
+    assert 0 < stream.ttft_ms <= stream.gesamt_ms
+    assert stream.zusammenfassung()["prompt_tokens"] == 12
+
+
+def test_stream_errors_mid_stream(ollama_url):
+    """
+    Test that an error line or a stream without done raises and keeps the partial text.
+    """
+    stream = OllamaClient(ollama_url).stream({"model": "m", "prompt": "fehler"})
+    with pytest.raises(OllamaFehler, match="unexpectedly stopped"):
+        list(stream)
+    assert stream.text == "Gegen" and stream.fehler and not stream.abgebrochen
+
+    with pytest.raises(OllamaFehler):
+        list(OllamaClient(ollama_url).stream({"model": "m", "prompt": "abgeschnitten"}))
+
+
+def test_stream_cancellation(ollama_url):
+    """
+    Test that leaving the stream early and the cancel event both mark it as cancelled.
+    """
+    stream = OllamaClient(ollama_url).stream({"model": "m", "prompt": "ok", "pause": 0.2})
+    for _ in stream:
+        break
+    stream.schliessen()
+    assert stream.abgebrochen and not stream.fertig and stream.text == "Gegen"
+
+    abbruch = threading.Event()
+    abbruch.set()
+    stream = OllamaClient(ollama_url).stream({"model": "m", "prompt": "ok"}, abbruch=abbruch)
+    assert list(stream) == ["Gegen"] and stream.abgebrochen
+
+
+def test_concurrent_load_is_capped_and_reuses_connections(ollama_url):
+    """
+    Test that concurrent requests never exceed max_inflight and share pooled keep-alive connections.
+    """
+    client = OllamaClient(ollama_url, max_inflight=2, pool_size=2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        antworten = list(pool.map(lambda i: client.generate({"model": "m", "prompt": f"f{i}", "dauer": 0.05})["response"], range(16)))
+    assert antworten == [f"Antwort auf f{i}" for i in range(16)]
+    assert _FakeOllama.max_aktiv == 2
+    assert len(_FakeOllama.ports) <= 2
+    assert client.stats["aktiv"] == 0 and client.stats["anfragen"] == 16
+
+
+def test_retries_timeouts_and_overload(ollama_url):
+    """
+    Test that 503 is retried with backoff, a read timeout fails fast without retry, and a full client
+    raises OllamaUeberlastet after the queue timeout.
+    """
+    _FakeOllama.fehlschlaege = {"wackelig": 2, "kaputt": 5}
+    client = OllamaClient(ollama_url, retries=2, backoff_s=0.01, read_timeout=0.2, queue_timeout=0.1, max_inflight=1)
+    assert client.generate({"model": "m", "prompt": "wackelig"})["response"] == "Antwort auf wackelig"
+    assert client.stats["wiederholungen"] == 2
+    with pytest.raises(OllamaFehler, match="503"):
+        client.generate({"model": "m", "prompt": "kaputt"})
+
+    start = time.perf_counter()
+    with pytest.raises(OllamaFehler, match="Zeitüberschreitung"):
+        client.generate({"model": "m", "prompt": "langsam", "dauer": 1})
+    assert time.perf_counter() - start < 0.8
+
+    with client.platz():
+        with pytest.raises(OllamaUeberlastet):
+            client.generate({"model": "m", "prompt": "x"})
+    assert client.stats["ueberlastet"] == 1
+
+    with pytest.raises(OllamaFehler, match="nicht erreichbar"):
+        OllamaClient("http://127.0.0.1:9/api/generate", retries=1, backoff_s=0.01).generate({"model": "m", "prompt": "x"})
+
+
+def test_async_api(ollama_url):
+    """
+    Test that the async API shares the concurrency cap and streams tokens.
+    """
+    client = OllamaClient(ollama_url, max_inflight=2)
+
+    async def lauf():
+        antworten = await asyncio.gather(*(client.agenerate({"model": "m", "prompt": f"a{i}", "dauer": 0.05}) for i in range(6)))
+        tokens = [t async for t in client.astream({"model": "m", "prompt": "ok"})]
+        return [a["response"] for a in antworten], tokens
+
+    antworten, tokens = asyncio.run(lauf())
+    assert antworten == [f"Antwort auf a{i}" for i in range(6)]
+    assert tokens == ["Gegen", "pressing", " hilft"]
+    assert _FakeOllama.max_aktiv <= 2
+
+
+def test_keep_alive_and_preload(ollama_url):
+    """
+    Test that requests carry keep_alive and preloading sends the system text to /api/chat with the given options.
+    """
+    client = OllamaClient(ollama_url, keep_alive="1h")
+    client.generate({"model": "m", "prompt": "x"})
+    zeiten = client.vorladen("m", {"num_ctx": 4096}, system="Du bist ...")
+    pfad, body = _FakeOllama.anfragen[-1]
+    assert _FakeOllama.anfragen[0][1]["keep_alive"] == "1h"
+    assert pfad == "/api/chat" and body["messages"] == [{"role": "system", "content": "Du bist ..."}]
+    assert body["options"] == {"num_ctx": 4096, "num_predict": 1} and body["keep_alive"] == "1h"
+    assert zeiten["load_ms"] == 5.0 and zeiten["prefill_ms"] == 2.0
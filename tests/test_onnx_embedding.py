@@ -0,0 +1,85 @@
+"""
+Test utilities for FMGPT ONNX embedding backend.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from scripts.embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+from scripts.onnx_embedding import OnnxEmbedder, pruefe_pakete
+
+
+class _FakeTokenizer:
+    def encode_batch(self, texts):
+        # Ein Token pro Wort, auf die längste Sequenz aufgefüllt
+        laenge = max(len(t.split()) for t in texts)
+        return [
+            SimpleNamespace(
+                ids=[i + 1 for i in range(len(t.split()))] + [0] * (laenge - len(t.split())),
+                attention_mask=[1] * len(t.split()) + [0] * (laenge - len(t.split())),
+                type_ids=[0] * laenge,
+            )
+            for t in texts
+        ]
+
+
+class _FakeSession:
+    def __init__(self):
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, _, feeds):
+        self.feeds.append(feeds)
+        ids = feeds["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def test_encode_mean_pooling_ignores_padding():
+    """
+    Test that mean pooling skips padded tokens and only known inputs are fed to the session.
+    """
+    session = _FakeSession()
+    embedder = OnnxEmbedder(session, _FakeTokenizer(), {"dim": 2, "pooling": "mean", "normalize": False})
+    vecs = embedder.encode(["a b c", "a"])
+    assert vecs.dtype == np.float32
+    assert vecs.tolist() == [[2.0, 1.0], [1.0, 1.0]]
+    assert set(session.feeds[0]) == {"input_ids", "attention_mask"}
+
+
+def test_encode_normalizes_and_batches():
+    """
+    Test that vectors are L2-normalized and texts are split into batches.
+    """
+    session = _FakeSession()
+    embedder = OnnxEmbedder(session, _FakeTokenizer(), {"dim": 2, "pooling": "mean", "normalize": True})
+    vecs = embedder.encode(["a b c", "a", "a b"], batch_size=2)
+    assert len(session.feeds) == 2
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0)
+    assert embedder.encode([]).shape == (0, 2)
+
+
+def test_onnx_backend_uses_separate_cache_keys(tmp_path):
+    """
+    Test that ONNX and PyTorch vectors of the same model do not share cache entries.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    torch_fn = CachedEmbeddingFunction("m", cache=cache)
+    onnx_fn = CachedEmbeddingFunction("m", cache=cache, backend="onnx")
+    assert torch_fn.cache_name != onnx_fn.cache_name
+    cache.put_many(torch_fn.cache_name, ["Pressing"], [[1.0, 0.0]])
+    assert cache.get_many(onnx_fn.cache_name, ["Pressing"]) == [None]
+
+
+def test_missing_onnx_packages_fail_clearly(monkeypatch):
+    """
+    Test that the ONNX backend names the missing packages and the extras file instead of failing later.
+    """
+    import importlib.util
+
+    echt = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *a: None if name == "onnx" else echt(name, *a))
+    with pytest.raises(ImportError, match="requirements-onnx.txt"):
+        pruefe_pakete(export=True)
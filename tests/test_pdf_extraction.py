@@ -0,0 +1,105 @@
+"""
+Test utilities for FMGPT PDF extraction module.
+"""
+
+from concurrent.futures import Future
+
+import fitz
+from scripts import pdf_extraction
+from scripts.pdf_extraction import iter_pdf_texts, page_ranges
+
+
+def _make_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def _reference_text(path):
+    with fitz.open(str(path)) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def test_page_ranges(tmp_path):
+    """
+    Test that page_ranges splits a document into bounded page ranges.
+    """
+    pdf = tmp_path / "guide.pdf"
+    _make_pdf(pdf, [f"Seite {i}" for i in range(5)])
+    assert page_ranges(str(pdf), 2) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_iter_pdf_texts_matches_sequential(tmp_path):
+    """
+    Test that the process pool yields the same texts as sequential extraction, in input order.
+    """
+    paths = []
+    for n, pages in enumerate((7, 1, 3)):
+        pdf = tmp_path / f"doc_{n}.pdf"
+        _make_pdf(pdf, [f"Dokument {n} Seite {i}" for i in range(pages)])
+        paths.append(str(pdf))
+    paths.append(str(tmp_path / "fehlt.pdf"))
+
+    texte = list(iter_pdf_texts(paths, workers=2, pages_per_task=2))
+
+    assert texte[:3] == [_reference_text(p) for p in paths[:3]]
+    assert texte[3].startswith("Error reading PDF:")
+    assert list(iter_pdf_texts(paths, workers=1, pages_per_task=2)) == texte
+
+
+class _LazyFuture(Future):
+    """Läuft erst, wenn jemand auf das Ergebnis wartet."""
+
+    def __init__(self, fn, args):
+        super().__init__()
+        self.fn, self.args = fn, args
+
+    def _run(self):
+        if not self.done():
+            try:
+                self.set_result(self.fn(*self.args))
+            except Exception as e:
+                self.set_exception(e)
+
+    def result(self, timeout=None):
+        self._run()
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        self._run()
+        return super().exception(timeout)
+
+
+class _CountingExecutor:
+    """Ersatz für den Prozesspool: merkt sich die maximale Zahl offener Teilaufträge."""
+
+    max_offen = 0
+
+    def __init__(self, max_workers):
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        self.futures.append(_LazyFuture(fn, args))
+        _CountingExecutor.max_offen = max(_CountingExecutor.max_offen, sum(not f.done() for f in self.futures))
+        return self.futures[-1]
+
+
+def test_single_large_pdf_is_bounded(tmp_path, monkeypatch):
+    """
+    Test that one document with more page ranges than 2 * workers never has more than 2 * workers ranges in flight.
+    """
+    pdf = tmp_path / "handbuch.pdf"
+    _make_pdf(pdf, [f"Seite {i}" for i in range(9)])
+    monkeypatch.setattr(pdf_extraction, "ProcessPoolExecutor", _CountingExecutor)
+    _CountingExecutor.max_offen = 0
+    assert list(iter_pdf_texts([str(pdf)], workers=2, pages_per_task=1)) == [_reference_text(pdf)]
+    assert _CountingExecutor.max_offen == 4
@@ -0,0 +1,60 @@
+"""
+Test utilities for FMGPT prompt builder module.
+"""
+
+from scripts.prompt_builder import (
+    TokenZaehler, Verlaufszusammenfassung, baue_prompt, dedupliziere_chunks, kuerze,
+)
+
+
+def _woerter(text):
+    return len(text.split())
+
+
+def test_prompt_fits_budget_and_drops_duplicates():
+    """
+    Test that the prompt stays within num_ctx minus the answer reserve and duplicate chunks are dropped.
+    """
+    chunks = ["Pressing " * 50, "pressing  " * 50, "Training " * 50, "Moral " * 400]
+    prompt = baue_prompt("Wie presse ich?", chunks, [], Verlaufszusammenfassung(), _woerter, num_ctx=300, antwort_tokens=50)
+    assert prompt.tokens["gesamt"] <= 250
+    assert prompt.chunks == [chunks[0], chunks[2]]
+    assert prompt.chunks_verworfen == 2
+    assert prompt.text.rstrip().endswith("ANTWORT:")
+
+
+def test_old_turns_are_folded_in_blocks_with_stable_prefix():
+    """
+    Test that older turns are folded into the session summary once, in blocks, so the chat message
+    prefix stays identical while the verbatim history only grows at the end.
+    """
+    verlauf = [(f"Frage{i}", f"Antwort{i} erster Satz. Zweiter Satz {'x ' * 30}") for i in range(6)]
+    zusammenfassung = Verlaufszusammenfassung()
+    kwargs = dict(num_ctx=2000, antwort_tokens=100, runden=2)
+    prompt = baue_prompt("Neu?", [], verlauf, zusammenfassung, _woerter, **kwargs)
+    assert prompt.runden_wortlaut == 1
+    assert "Frage 6: Frage5" in prompt.text and "Frage 5:" not in prompt.text
+    assert zusammenfassung.bis == 5 and len(zusammenfassung.zeilen) == 5
+    assert "- Frage0 → Antwort0 erster Satz." in prompt.text and "Zweiter Satz" not in zusammenfassung.zeilen[0]
+
+    verlauf.append(("Frage6", "Antwort6."))
+    naechster = baue_prompt("Noch eine?", [], verlauf, zusammenfassung, _woerter, **kwargs)
+    assert zusammenfassung.bis == 5 and naechster.runden_wortlaut == 2
+    assert naechster.nachrichten[:3] == prompt.nachrichten[:3]  # System + Runde 6 unverändert
+    assert [n["role"] for n in naechster.nachrichten] == ["system", "user", "assistant", "user", "assistant", "user"]
+    assert naechster.nachrichten[-1]["content"].startswith("KONTEXT:")
+
+    verlauf.append(("Frage7", "Antwort7."))
+    baue_prompt("Und noch eine?", [], verlauf, zusammenfassung, _woerter, **kwargs)
+    assert zusammenfassung.bis == 7 and len(zusammenfassung.zeilen) == 7
+
+
+def test_helpers():
+    """
+    Test chunk deduplication, truncation and the estimating token counter fallback.
+    """
+    assert dedupliziere_chunks(["A b", "a  B", "c"]) == ["A b", "c"]
+    assert kuerze("eins zwei drei vier", 3, _woerter) == "eins zwei …"
+    zaehler = TokenZaehler("/gibt/es/nicht")
+    assert zaehler("x" * 64) > 0 and zaehler.geschaetzt
+    assert zaehler("x" * 64) > TokenZaehler("/gibt/es/nicht", aufschlag=1.0)("x" * 64)
@@ -0,0 +1,70 @@
+"""
+Test utilities for FMGPT query cache module.
+"""
+
+import time
+
+from scripts.query_cache import QueryCache, normalisiere_frage, verlauf_schluessel
+
+
+def test_l1_exact_match_on_normalized_text():
+    """
+    Test that L1 ignores case, whitespace and trailing punctuation.
+    """
+    cache = QueryCache()
+    cache.put("Wie funktioniert Pressing?", [1.0, 0.0], ["a", "b"], "Antwort", "v1")
+    assert normalisiere_frage("  wie  funktioniert PRESSING ") == normalisiere_frage("Wie funktioniert Pressing?")
+    assert cache.get_exakt("wie funktioniert   pressing", "v1") == "Antwort"
+    assert cache.stats["l1_treffer"] == 1
+
+
+def test_l2_requires_similarity_and_same_chunks():
+    """
+    Test that L2 hits only above the cosine threshold and with identical chunk IDs.
+    """
+    cache = QueryCache(threshold=0.95)
+    cache.put("Wie funktioniert Pressing?", [1.0, 0.0], ["a", "b"], "Antwort", "v1")
+    assert cache.get_semantisch([0.99, 0.05], ["b", "a"], "v1") == "Antwort"
+    assert cache.get_semantisch([0.99, 0.05], ["a", "c"], "v1") is None
+    assert cache.get_semantisch([0.5, 0.5], ["a", "b"], "v1") is None
+    assert cache.stats["l2_treffer"] == 1 and cache.stats["fehlend"] == 2
+
+
+def test_version_change_ttl_and_lru():
+    """
+    Test that a new collection version clears the cache, expired entries are dropped and LRU evicts the oldest.
+    """
+    cache = QueryCache(max_entries=2, ttl_s=60)
+    cache.put("eins", [1.0], ["a"], "A1", "v1")
+    assert cache.get_exakt("eins", "v2") is None
+    assert len(cache) == 0 and cache.stats["invalidiert"] == 1
+
+    cache.put("eins", [1.0], ["a"], "A1", "v2")
+    cache.put("zwei", [1.0], ["b"], "A2", "v2")
+    cache.get_exakt("eins", "v2")
+    cache.put("drei", [1.0], ["c"], "A3", "v2")
+    assert cache.get_exakt("zwei", "v2") is None
+    assert cache.get_exakt("eins", "v2") == "A1"
+    assert cache.stats["verdraengt"] == 1
+
+    cache.ttl_s = 0.01
+    time.sleep(0.02)
+    assert cache.get_exakt("eins", "v2") is None
+    assert cache.zusammenfassung()["eintraege"] == 1
+
+
+def test_same_question_with_different_history_misses():
+    """
+    Test that neither level returns an answer generated in a different conversation.
+    """
+    cache = QueryCache(threshold=0.95)
+    verlauf_a = verlauf_schluessel([("Was ist ein Gegenpress?", "Sofortiges Pressing nach Ballverlust.")])
+    verlauf_b = verlauf_schluessel([("Wer ist der beste Stürmer?", "Haaland.")])
+    assert verlauf_schluessel([]) == "" and verlauf_a != verlauf_b
+
+    cache.put("Welche Formation passt dazu?", [1.0, 0.0], ["a"], "Antwort A", "v1", verlauf_a)
+    assert cache.get_exakt("Welche Formation passt dazu?", "v1", verlauf_b) is None
+    assert cache.get_exakt("Welche Formation passt dazu?", "v1") is None
+    assert cache.get_semantisch([1.0, 0.0], ["a"], "v1", verlauf_b) is None
+    assert cache.get_exakt("welche formation passt dazu", "v1", verlauf_a) == "Antwort A"
+    assert cache.get_semantisch([0.99, 0.05], ["a"], "v1", verlauf_a) == "Antwort A"
@@ -0,0 +1,187 @@
+"""
+Test utilities for FMGPT retrieval service module.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import numpy as np
+from scripts.collection_alias import erhoehe_revision, setze_alias
+from scripts.query_cache import QueryCache
+from scripts.rag_service import RetrievalService, rrf_fusion
+
+
+class _CountingEmbed:
+    def __init__(self):
+        self.aufrufe = 0
+
+    def __call__(self, texts):
+        self.aufrufe += 1
+        return [np.array([len(t), 1.0], dtype=np.float32) for t in texts]
+
+
+def _service(tmp_path, embed_fn):
+    pfad = str(tmp_path / "db")
+    client = chromadb.PersistentClient(path=pfad)
+    for name, sprache in (("chunks_v1", "de"), ("chunks_v2", "en")):
+        client.get_or_create_collection(name).add(
+            ids=[f"{name}_a", f"{name}_b"],
+            embeddings=np.array([[10, 1], [50, 1]], dtype=np.float32),
+            metadatas=[{"sprache": sprache}, {"sprache": sprache}],
+            documents=["Pressing", "Training"],
+        )
+    setze_alias(pfad, "chunks", "chunks_v1")
+    return RetrievalService(pfad, "chunks", client=client, embed_fn=embed_fn), pfad
+
+
+def test_warmup_and_health(tmp_path):
+    """
+    Test that warmup loads the stack once and the health check reports the active collection.
+    """
+    embed = _CountingEmbed()
+    service, _ = _service(tmp_path, embed)
+    assert service.warmup() >= 0
+    status = service.health()
+    assert status["ok"] and status["collection"] == "chunks_v1" and status["chunks"] == 2
+    assert status["embed_ms"] is not None
+    service.health()
+    assert embed.aufrufe == 2  # Warmup: Vorladen + Testabfrage; health bettet nichts ein
+
+
+def test_query_follows_alias_switch(tmp_path):
+    """
+    Test that queries use the collection the alias points to, also after a switch.
+    """
+    service, pfad = _service(tmp_path, _CountingEmbed())
+    assert service.query("x" * 12, n_results=1)["ids"][0] == ["chunks_v1_a"]
+    setze_alias(pfad, "chunks", "chunks_v2")
+    ergebnis = service.query("x" * 12, n_results=1, where={"sprache": "en"})
+    assert ergebnis["ids"][0] == ["chunks_v2_a"]
+
+
+def test_incremental_sync_invalidates_answer_cache(tmp_path):
+    """
+    Test that an in-place sync bumps the revision, so cached answers for the same collection name miss.
+    """
+    service, pfad = _service(tmp_path, _CountingEmbed())
+    cache = QueryCache()
+    version = service.version()
+    assert version == "chunks_v1@0"
+    cache.put("Was ist Pressing?", [1.0, 0.0], ["chunks_v1_a"], "Alte Antwort", version)
+    assert cache.get_exakt("Was ist Pressing?", service.version()) == "Alte Antwort"
+
+    service.client.get_collection("chunks_v1").delete(ids=["chunks_v1_a"])  # wie build_index im Modus incremental
+    erhoehe_revision(pfad, "chunks")
+    assert service.version() == "chunks_v1@1"
+    assert cache.get_exakt("Was ist Pressing?", service.version()) is None
+    assert service.health()["collection"] == "chunks_v1" and service.health()["chunks"] == 1
+
+
+def test_health_reports_missing_collection(tmp_path):
+    """
+    Test that the health check fails softly when the collection does not exist.
+    """
+    service = RetrievalService(str(tmp_path), "fehlt_noch", client=chromadb.PersistentClient(path=str(tmp_path)), embed_fn=_CountingEmbed())
+    status = service.health()
+    assert not status["ok"] and "fehler" in status
+
+
+def test_rrf_fusion_rewards_agreement():
+    """
+    Test that IDs ranked by both retrievers come first.
+    """
+    fusion = rrf_fusion([["a", "b", "c"], ["c", "d"]])
+    assert fusion[0][0] == "c"
+    assert [i for i, _ in fusion] == ["c", "a", "b", "d"]
+
+
+class _SlowLexical:
+    def __init__(self, treffer, pause=0.0):
+        self.treffer = treffer
+        self.pause = pause
+
+    def __len__(self):
+        return len(self.treffer)
+
+    def suche(self, frage, k, where=None):
+        time.sleep(self.pause)
+        return [(i, 1.0) for i in self.treffer]
+
+
+def test_hybrid_query_fuses_and_respects_budget(tmp_path):
+    """
+    Test that lexical hits missing from the vector result are loaded from the collection,
+    and that a slow lexical search is skipped after the budget.
+    """
+    service, _ = _service(tmp_path, _CountingEmbed())
+    service.lexical = _SlowLexical(["chunks_v1_b"])
+    service._pool = ThreadPoolExecutor(max_workers=1)
+    ergebnis = service.hybrid_query("x" * 12, n_results=2, kandidaten=1)
+    assert set(ergebnis["ids"][0]) == {"chunks_v1_a", "chunks_v1_b"}
+    assert "Training" in ergebnis["documents"][0]
+
+    service.lexical = _SlowLexical(["chunks_v1_b"], pause=0.5)
+    ergebnis = service.hybrid_query("x" * 12, n_results=2, kandidaten=1, budget_ms=20)
+    assert ergebnis["ids"][0] == ["chunks_v1_a"]
+    assert service.stats["budget_ueberschritten"] == 1
+
+
+def test_suche_reranks_candidates(tmp_path):
+    """
+    Test that suche reranks the candidate set and keeps documents aligned with IDs.
+    """
+    from scripts.reranker import Reranker
+
+    class _Model:
+        def predict(self, pairs, batch_size=32):
+            return np.array([1.0 if doc == "Training" else 0.0 for _, doc in pairs])
+
+    service, _ = _service(tmp_path, _CountingEmbed())
+    service.reranker = Reranker(model=_Model())
+    ergebnis = service.suche("x" * 12, n_results=1, tiefe=2)
+    assert ergebnis["ids"][0] == ["chunks_v1_b"]
+    assert ergebnis["documents"][0] == ["Training"]
+
+
+def test_numpy_backend_follows_alias(tmp_path):
+    """
+    Test that the NumPy backend loads the store exported for the collection the alias points to.
+    """
+    from scripts.vector_store import exportiere_aus_chroma
+
+    _, pfad = _service(tmp_path, _CountingEmbed())
+    client = chromadb.PersistentClient(path=pfad)
+    for name in ("chunks_v1", "chunks_v2"):
+        exportiere_aus_chroma(client.get_collection(name), str(tmp_path / "stores" / name))
+    service = RetrievalService(pfad, "chunks", embed_fn=_CountingEmbed(), vector_backend="numpy", store_dir=str(tmp_path / "stores"))
+    assert service.query("x" * 12, n_results=1)["ids"][0] == ["chunks_v1_a"]
+    setze_alias(pfad, "chunks", "chunks_v2")
+    assert service.health()["backend"] == "numpy"
+    assert service.query("x" * 12, n_results=1)["ids"][0] == ["chunks_v2_a"]
+
+
+def test_language_filter_routes_to_partitions(tmp_path):
+    """
+    Test that a language filter queries the partition, several languages fan out and merge by distance,
+    and a missing partition falls back to the filtered query.
+    """
+    _, pfad = _service(tmp_path, _CountingEmbed())
+    client = chromadb.PersistentClient(path=pfad)
+    for sprache, vektoren in (("de", [[10, 1], [50, 1]]), ("en", [[12, 1]])):
+        client.get_or_create_collection(f"chunks_v1__{sprache}").add(
+            ids=[f"{sprache}_{i}" for i in range(len(vektoren))],
+            embeddings=np.array(vektoren, dtype=np.float32),
+            metadatas=[{"sprache": sprache}] * len(vektoren),
+            documents=["Text"] * len(vektoren),
+        )
+    service = RetrievalService(pfad, "chunks", client=client, embed_fn=_CountingEmbed(), partitionen=["de", "en"])
+    assert service.query("x" * 12, n_results=1, where={"sprache": "de"})["ids"][0] == ["de_0"]
+    ergebnis = service.query("x" * 12, n_results=2, where={"sprache": {"$in": ["de", "en"]}})
+    assert ergebnis["ids"][0] == ["en_0", "de_0"]
+    assert service.stats["partitioniert"] == 2
+
+    setze_alias(pfad, "chunks", "chunks_v2")  # v2 hat keine Partitionen
+    assert service.query("x" * 12, n_results=1, where={"sprache": "en"})["ids"][0] == ["chunks_v2_a"]
+    assert service.stats["partition_fallback"] == 1
+    assert service.health()["partitionen"] == ["de"]  # "en" fehlt in v2
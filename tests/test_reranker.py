@@ -0,0 +1,99 @@
+"""
+Test utilities for FMGPT cross-encoder reranker module.
+"""
+
+import sys
+import threading
+import types
+
+import numpy as np
+from scripts.reranker import Reranker, frage_schluessel
+
+
+class _LengthModel:
+    """Bewertet nach Textlänge und zählt Forward-Pässe."""
+
+    def __init__(self, warten=None):
+        self.paesse = []
+        self.warten = warten
+
+    def predict(self, pairs, batch_size=32):
+        if self.warten is not None:
+            self.warten.wait(2)
+        self.paesse.append(len(pairs))
+        return np.array([len(doc) for _, doc in pairs], dtype=np.float32)
+
+
+def test_rerank_batches_and_caches_scores():
+    """
+    Test that candidates are scored in one pass, sorted by score and cached per (question, chunk_id).
+    """
+    model = _LengthModel()
+    reranker = Reranker(model=model)
+    auswahl, scores = reranker.rerank("Pressing?", ["a", "b", "c"], ["kurz", "sehr lang", "mittel"], top_n=2)
+    assert auswahl == [1, 2]
+    assert scores.tolist() == [4, 9, 6]
+    assert model.paesse == [3]
+
+    reranker.rerank("  pressing? ", ["a", "d"], ["kurz", "neu"], top_n=2)
+    assert model.paesse == [3, 1]
+    assert reranker.stats["aus_cache"] == 1
+    assert reranker.latenz()["p50_ms"] is not None
+
+
+def test_missing_documents_rank_last():
+    """
+    Test that candidates without text are not sent to the model and end up behind all scored candidates.
+    """
+    model = _LengthModel()
+    reranker = Reranker(model=model)
+    auswahl, scores = reranker.rerank("q", ["a", "b", "c"], [None, "lang", "x"], top_n=3)
+    assert auswahl == [1, 2, 0]
+    assert model.paesse == [2] and scores[0] == float("-inf")
+
+
+def test_rerank_bypassed_under_load():
+    """
+    Test that reranking is skipped when max_inflight reranks are already running.
+    """
+    freigabe = threading.Event()
+    reranker = Reranker(model=_LengthModel(warten=freigabe), max_inflight=1)
+    thread = threading.Thread(target=reranker.rerank, args=("q", ["a"], ["x"], 1))
+    thread.start()
+    while reranker._inflight == 0:
+        pass
+    auswahl, scores = reranker.rerank("q", ["a", "b", "c"], ["x", "yy", "zzz"], top_n=2)
+    freigabe.set()
+    thread.join()
+    assert auswahl == [0, 1] and scores is None
+    assert reranker.stats["umgangen"] == 1
+
+
+def test_model_load_does_not_block_cached_reranks(monkeypatch):
+    """
+    Test that a slow model load does not hold the cache lock: cached pairs and the bypass check still answer.
+    """
+    laden_begonnen, freigabe = threading.Event(), threading.Event()
+
+    class _LangsamerCrossEncoder(_LengthModel):
+        def __init__(self, name, device=None):
+            super().__init__()
+            laden_begonnen.set()
+            freigabe.wait(5)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=_LangsamerCrossEncoder))
+    reranker = Reranker(max_inflight=2)
+    reranker._cache[(frage_schluessel("q"), "a")] = 1.0
+    thread = threading.Thread(target=reranker.rerank, args=("neu", ["b"], ["x"], 1))
+    thread.start()
+    assert laden_begonnen.wait(2)
+    ergebnis = []
+    treffer = threading.Thread(target=lambda: ergebnis.append(reranker.rerank("q", ["a"], ["x"], 1)))
+    treffer.start()
+    treffer.join(1)
+    geblockt = treffer.is_alive()
+    freigabe.set()
+    thread.join()
+    treffer.join()
+    assert not geblockt and ergebnis[0][1].tolist() == [1.0]
+    assert reranker.stats == {"reranks": 2, "umgangen": 0, "paare": 2, "aus_cache": 1}
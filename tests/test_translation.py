@@ -0,0 +1,78 @@
+"""
+Test utilities for FMGPT translation module.
+"""
+
+from scripts.translation import SegmentTranslator, TranslationCache, segmentiere, stub_backend
+
+
+def test_segmentiere_joins_lines_and_packs_sentences():
+    """
+    Test that single line breaks are joined, paragraphs stay separate and sentences are packed up to max_chars.
+    """
+    text = "Erster Absatz mit\numbrochener Zeile und Tren-\nnung.\n\n" + "Ein langer Satz. " * 40 + "\nLetzte Zeile"
+    teile = segmentiere(text, max_chars=100)
+    assert teile[:2] == ["Erster Absatz mit umbrochener Zeile und Trennung.", "\n\n"]
+    assert all(len(t) <= 100 for t in teile)
+    segmente = [t for t in teile[2:] if t.strip()]
+    assert len(segmente) == 8 and segmente[0] == " ".join(["Ein langer Satz."] * 5)
+    assert "".join(teile[2:]) == " ".join(["Ein langer Satz."] * 40) + " Letzte Zeile"
+
+
+def test_segmentiere_splits_long_sentences_at_whitespace():
+    """
+    Test that a sentence longer than max_chars is split between words.
+    """
+    teile = segmentiere("wort " * 30, max_chars=22)
+    assert [t for t in teile if t != " "] == ["wort wort wort wort"] * 7 + ["wort wort"]
+
+
+def test_segment_cache_only_translates_new_text(tmp_path):
+    """
+    Test that a rerun only sends segments to the backend that were not translated before.
+    """
+    gesendet = []
+    stub = stub_backend("en", "de")
+
+    def backend(segmente):
+        gesendet.extend(segmente)
+        return stub(segmente)
+
+    cache_file = str(tmp_path / "cache.jsonl")
+    translator = SegmentTranslator(backend, TranslationCache(cache_file), workers=2, batch_size=2)
+    assert translator.translate("Pressing.\n\nTraining.") == "[de] Pressing.\n\n[de] Training."
+    translator.close()
+
+    gesendet.clear()
+    translator = SegmentTranslator(backend, TranslationCache(cache_file), workers=2, batch_size=2)
+    assert translator.translate("Pressing.\n\nTraining.\n\nRollen.") == "[de] Pressing.\n\n[de] Training.\n\n[de] Rollen."
+    translator.close()
+    assert gesendet == ["Rollen."]
+    assert translator.stats["cache_treffer"] == 2
+
+
+def test_failed_batch_falls_back_per_segment(tmp_path):
+    """
+    Test that a failing backend keeps the original text and caches nothing.
+    """
+    def backend(segmente):
+        raise RuntimeError("limit")
+
+    cache = TranslationCache(str(tmp_path / "cache.jsonl"))
+    translator = SegmentTranslator(backend, cache)
+    assert translator.translate("Hello world.") == "Hello world."
+    translator.close()
+    assert len(cache) == 0
+
+
+def test_failed_segment_does_not_discard_batch(tmp_path):
+    """
+    Test that one failing segment keeps its original text while the rest of the batch is translated and cached.
+    """
+    def backend(segmente):
+        return [None if s == "Kaputt." else f"[de] {s}" for s in segmente]
+
+    cache = TranslationCache(str(tmp_path / "cache.jsonl"))
+    translator = SegmentTranslator(backend, cache, batch_size=16)
+    assert translator.translate("Eins.\n\nKaputt.\n\nZwei.") == "[de] Eins.\n\nKaputt.\n\n[de] Zwei."
+    translator.close()
+    assert len(cache) == 2 and translator.stats["fehler"] == 1 and translator.stats["uebersetzt"] == 2
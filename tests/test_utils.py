@@ -39,3 +39,17 @@ def test_log_event(caplog):
     assert "Warn" in logs
     assert "Error" in logs
     assert "Debug" in logs
+
+def test_chunk_id_is_content_based():
+    """
+    Test that chunk_id depends on content only and disambiguates repeated chunks.
+    """
+    a = utils.chunk_id("7", "pdf", "Pressing  hoch\nansetzen")
+    assert a == utils.chunk_id("7", "pdf", "Pressing hoch ansetzen")
+    assert a.startswith("7_pdf_")
+    assert a != utils.chunk_id("7", "pdf", "Pressing tief ansetzen")
+
+    vergeben = {}
+    ids = [utils.chunk_id("7", "web", t, vergeben) for t in ("Menü", "Text", "Menü")]
+    assert ids[2] == ids[0] + "_2"
+    assert len(set(ids)) == 3
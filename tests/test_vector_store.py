@@ -0,0 +1,64 @@
+"""
+Test utilities for FMGPT vector store module.
+"""
+
+import chromadb
+import numpy as np
+import pytest
+from scripts.vector_store import ChromaStore, NumpyStore, exportiere_aus_chroma, schreibe_numpy_store
+
+VECS = np.array([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+IDS = ["a", "b", "c", "d"]
+METAS = [{"sprache": "de"}, {"sprache": "en"}, {"sprache": "de"}, {"sprache": "de"}]
+DOCS = ["Pressing", "Pressing en", "Training", "Moral"]
+
+
+def test_numpy_store_exact_topk_and_filter(tmp_path):
+    """
+    Test that the NumPy store returns exact cosine top-k, applies metadata masks and reads by ID.
+    """
+    for dtype in ("float32", "float16"):
+        pfad = str(tmp_path / dtype)
+        schreibe_numpy_store(pfad, IDS, VECS * 3, DOCS, METAS, dtype)
+        store = NumpyStore.laden(pfad)
+        assert store.vectors.dtype == np.dtype(dtype)
+        ergebnis = store.query([1, 0, 0], n_results=2)
+        assert ergebnis["ids"][0] == ["a", "b"]
+        assert abs(ergebnis["distances"][0][0]) < 1e-3
+        assert store.query([1, 0.5, 0], n_results=2, where={"sprache": "de"})["ids"][0] == ["a", "c"]
+        assert store.get(["c", "x"])["documents"] == ["Training"]
+        assert store.count() == 4
+
+
+def test_export_from_chroma_matches_chroma_results(tmp_path):
+    """
+    Test that a store exported from Chroma answers like the Chroma backend.
+    """
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).get_or_create_collection("chunks_test")
+    collection.add(ids=IDS, embeddings=VECS, metadatas=METAS, documents=DOCS)
+    assert exportiere_aus_chroma(collection, str(tmp_path / "store"), page_size=3) == 4
+    numpy_store = NumpyStore.laden(str(tmp_path / "store"))
+    chroma_store = ChromaStore(collection)
+    filter_ = (
+        None, {"sprache": "de"}, {"sprache": {"$eq": "en"}}, {"sprache": {"$ne": "en"}},
+        {"sprache": {"$in": ["de", "en"]}}, {"sprache": {"$nin": ["de"]}},
+        {"$and": [{"sprache": {"$in": ["de", "en"]}}, {"sprache": {"$ne": "en"}}]},
+    )
+    for where in filter_:
+        a = chroma_store.query([0, 0.95, 0.05], n_results=2, where=where)
+        b = numpy_store.query([0, 0.95, 0.05], n_results=2, where=where)
+        assert a["ids"] == b["ids"] and a["documents"] == b["documents"]
+
+
+def test_unsupported_filter_and_empty_export(tmp_path):
+    """
+    Test that unknown filter operators raise and an empty collection exports to an empty store.
+    """
+    schreibe_numpy_store(str(tmp_path / "store"), IDS, VECS, DOCS, METAS)
+    with pytest.raises(ValueError):
+        NumpyStore.laden(str(tmp_path / "store")).query([1, 0, 0], where={"sprache": {"$gt": "a"}})
+
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).get_or_create_collection("chunks_leer")
+    assert exportiere_aus_chroma(collection, str(tmp_path / "leer")) == 0
+    leer = NumpyStore.laden(str(tmp_path / "leer"))
+    assert leer.count() == 0 and leer.query([1, 0, 0], n_results=2, where={"sprache": "de"})["ids"] == [[]]
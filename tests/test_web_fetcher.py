@@ -0,0 +1,91 @@
+"""
+Test utilities for FMGPT web fetcher module.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from scripts.web_fetcher import WebFetcher
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Local stand-in for a web source: /slow/<ms>, /flaky and /page/<n>."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+        try:
+            if self.path.startswith("/slow/"):
+                time.sleep(int(self.path.split("?")[0].rsplit("/", 1)[1]) / 1000)
+            if self.path == "/flaky" and hits < 3:
+                self._send(503, "busy")
+                return
+            self._send(200, f"<html><body><p>{self.path}</p></body></html>")
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    httpd.lock = threading.Lock()
+    httpd.active = 0
+    httpd.max_active = 0
+    httpd.hits = {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _base(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def test_map_keeps_input_order(server):
+    """
+    Test that map returns results in input order even if later URLs finish first.
+    """
+    urls = [f"{_base(server)}/slow/{ms}" for ms in (120, 60, 0, 30)]
+    with WebFetcher(max_workers=4, per_host_limit=4) as fetcher:
+        texte = fetcher.map(lambda url: fetcher.get(url).text, urls)
+    assert [t.split("<p>")[1].split("</p>")[0] for t in texte] == [u[len(_base(server)):] for u in urls]
+
+
+def test_per_host_limit(server):
+    """
+    Test that no more than per_host_limit requests hit the same host at once.
+    """
+    urls = [f"{_base(server)}/slow/50?{i}" for i in range(8)]
+    with WebFetcher(max_workers=8, per_host_limit=2) as fetcher:
+        fetcher.map(fetcher.get, urls)
+    assert server.max_active <= 2
+
+
+def test_retry_with_backoff(server):
+    """
+    Test that retryable status codes are retried until the source answers.
+    """
+    with WebFetcher(retries=3, backoff=0.01) as fetcher:
+        response = fetcher.get(f"{_base(server)}/flaky")
+    assert response.status_code == 200
+    assert server.hits["/flaky"] == 3